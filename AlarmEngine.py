@@ -0,0 +1,207 @@
+# AlarmEngine.py - Rolling-window telemetry alarms, evaluated with NumPy
+#
+# Rules are plain dicts, e.g.
+#   {"name": "Fast descent", "channel": "*/depth", "kind": "rate", "window": 5, "op": ">", "limit": 0.5}
+# kind:
+#   threshold      latest value; a sample beyond the limit inside a batch that
+#                  the latest one is already back from still reports the
+#                  alarm (raised and cleared in the same push)
+#   average        moving average over `window` seconds
+#   rate           slope of a linear fit over `window` seconds (units per second)
+#   time_to_empty  seconds until the linear fit reaches `empty` (default 0),
+#                  e.g. battery: {"kind": "time_to_empty", "op": "<", "limit": 600}
+# channel may use wildcards ("*/battery") and expands to one rule per channel.
+#
+# Samples arrive in batches and go into a ring buffer shared by all channels.
+# Statistics are computed once per distinct window for every channel at the
+# same time, then every rule is a lookup + comparison in one array operation,
+# so the cost barely depends on the number of rules.
+import fnmatch
+import json
+import time
+
+import numpy as np
+
+KINDS = {"threshold": 0, "average": 1, "rate": 2, "time_to_empty": 3}
+OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+DEFAULT_RULES = [
+    {"name": "Too deep", "channel": "*/depth", "kind": "threshold", "op": ">", "limit": 90},
+    {"name": "Fast descent", "channel": "*/depth", "kind": "rate", "window": 5, "op": ">", "limit": 1.0},
+    {"name": "Fast ascent", "channel": "*/depth", "kind": "rate", "window": 5, "op": "<", "limit": -1.0},
+    {"name": "Overheating", "channel": "*/temperature", "kind": "average", "window": 10, "op": ">", "limit": 28},
+    {"name": "Battery low", "channel": "*/battery", "kind": "threshold", "op": "<", "limit": 25},
+    {"name": "Battery running out", "channel": "*/battery", "kind": "time_to_empty",
+     "window": 60, "op": "<", "limit": 600, "empty": 0},
+]
+
+
+def load_rules(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class AlarmEngine:
+    def __init__(self, channels, rules=None, capacity=4096, min_samples=3):
+        """
+        channels: channel names, the order of values in every pushed sample
+        capacity: samples kept per channel (enough for the longest window)
+        """
+        self.channels = list(channels)
+        self.capacity = capacity
+        self.min_samples = min_samples
+        # every sample is stored twice (i and i + capacity) so the last
+        # `capacity` samples are always one contiguous, ordered slice
+        self.times = np.zeros(2 * capacity)
+        self.values = np.zeros((len(self.channels), 2 * capacity))
+        self.count = 0     # samples stored so far (max capacity)
+        self.head = 0      # next write position
+        self.set_rules(DEFAULT_RULES if rules is None else rules)
+
+    def set_rules(self, rules):
+        """Expand wildcard rules and compile them into flat arrays"""
+        expanded = []
+        for rule in rules:
+            for index, channel in enumerate(self.channels):
+                if fnmatch.fnmatch(channel, rule["channel"]):
+                    expanded.append((rule, index, channel))
+        self.rules = expanded
+
+        n = len(expanded)
+        self.rule_channel = np.array([c for _, c, _ in expanded], dtype=np.intp)
+        self.rule_kind = np.array([KINDS[r["kind"]] for r, _, _ in expanded], dtype=np.intp)
+        self.rule_limit = np.array([float(r["limit"]) for r, _, _ in expanded])
+        self.rule_empty = np.array([float(r.get("empty", 0)) for r, _, _ in expanded])
+        windows = [float(r.get("window", 0)) for r, _, _ in expanded]
+        self.windows = sorted(set(windows))
+        self.rule_window = np.array([self.windows.index(w) for w in windows], dtype=np.intp)
+        self.op_masks = {op: np.array([r["op"] == op for r, _, _ in expanded], dtype=bool) for op in OPS}
+        self.active = np.zeros(n, dtype=bool)
+        self.rule_value = np.full(n, np.nan)
+
+    # ============================================================
+    # Input
+    # ============================================================
+
+    def push(self, times, values):
+        """
+        Add a batch of samples and evaluate every rule once.
+        times: (n,) seconds, values: (n, channels). Returns the alarm changes.
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        n = len(times)
+        if n > self.capacity:
+            times, values, n = times[-self.capacity:], values[-self.capacity:], self.capacity
+
+        pos = (self.head + np.arange(n)) % self.capacity
+        for p in (pos, pos + self.capacity):
+            self.times[p] = times
+            self.values[:, p] = values.T
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+        return self.evaluate(times[-1], new=n)
+
+    # ============================================================
+    # Evaluation
+    # ============================================================
+
+    def evaluate(self, now=None, new=1):
+        """new: samples pushed since the last evaluation, checked by threshold rules"""
+        if self.count == 0 or len(self.rules) == 0:
+            return []
+        if now is None:
+            now = time.time()
+
+        times, values = self._ordered()
+        latest = values[:, -1]
+
+        # stats[kind, window, channel]
+        stats = np.full((len(KINDS), len(self.windows), len(self.channels)), np.nan)
+        slopes = np.full((len(self.windows), len(self.channels)), np.nan)
+        intercepts = np.full_like(slopes, np.nan)
+        stats[KINDS["threshold"]] = latest
+        for w, seconds in enumerate(self.windows):
+            start = np.searchsorted(times, now - seconds, side="left") if seconds > 0 else len(times) - 1
+            t = times[start:]
+            v = values[:, start:]
+            stats[KINDS["average"], w] = v.mean(axis=1)
+            if len(t) >= self.min_samples:
+                # least-squares line for all channels at once
+                tm = t.mean()
+                dt = t - tm
+                denom = np.dot(dt, dt)
+                if denom > 0:
+                    vm = v.mean(axis=1)
+                    slopes[w] = (v - vm[:, None]) @ dt / denom
+                    intercepts[w] = vm - slopes[w] * (tm - now)   # fitted value at `now`
+        stats[KINDS["rate"]] = slopes
+
+        # per-rule values, one gather for all rules
+        value = stats[self.rule_kind, self.rule_window, self.rule_channel]
+        tte = self.rule_kind == KINDS["time_to_empty"]
+        if tte.any():
+            slope = slopes[self.rule_window[tte], self.rule_channel[tte]]
+            level = intercepts[self.rule_window[tte], self.rule_channel[tte]]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                seconds_left = (self.rule_empty[tte] - level) / slope
+            # not draining (or no fit yet) -> never empties
+            value[tte] = np.where(slope < 0, seconds_left, np.inf)
+        self.rule_value = value
+
+        triggered = np.zeros(len(self.rules), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for op, mask in self.op_masks.items():
+                if mask.any():
+                    triggered[mask] = OPS[op](value[mask], self.rule_limit[mask])
+
+        # threshold excursions between the previous and the latest sample
+        missed = np.zeros(len(self.rules), dtype=bool)
+        peak = np.full(len(self.rules), np.nan)
+        threshold = np.flatnonzero((self.rule_kind == KINDS["threshold"]) & ~triggered & ~self.active)
+        new = min(new, self.count)
+        if new > 1 and len(threshold):
+            recent = values[self.rule_channel[threshold], -new:]
+            upward = self.op_masks[">"][threshold] | self.op_masks[">="][threshold]
+            peak[threshold] = np.where(upward, recent.max(axis=1), recent.min(axis=1))
+            with np.errstate(invalid="ignore"):
+                for op, mask in self.op_masks.items():
+                    rules = threshold[mask[threshold]]
+                    missed[rules] = OPS[op](peak[rules], self.rule_limit[rules])
+
+        changed = np.flatnonzero(triggered != self.active)
+        self.active = triggered
+        events = [self._event(i, now) for i in changed]
+        for i in np.flatnonzero(missed):
+            events.append(dict(self._event(i, now), value=float(peak[i]), active=True))
+            events.append(self._event(i, now))
+        return events
+
+    def active_alarms(self):
+        return [self._event(i, None) for i in np.flatnonzero(self.active)]
+
+    def _ordered(self):
+        end = self.head + self.capacity
+        return self.times[end - self.count:end], self.values[:, end - self.count:end]
+
+    def _event(self, i, now):
+        rule, _, channel = self.rules[i]
+        return {
+            "name": rule["name"],
+            "channel": channel,
+            "kind": rule["kind"],
+            "value": float(self.rule_value[i]),
+            "limit": float(self.rule_limit[i]),
+            "active": bool(self.active[i]),
+            "time": now,
+        }
+
+
+def format_alarm(alarm):
+    if alarm["kind"] == "time_to_empty":
+        value = f"{alarm['value'] / 60:.1f} min left"
+    elif alarm["kind"] == "rate":
+        value = f"{alarm['value']:+.2f}/s"
+    else:
+        value = f"{alarm['value']:.1f}"
+    return f"{alarm['name']} - {alarm['channel']} ({value})"
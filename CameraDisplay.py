@@ -1,23 +1,49 @@
 # camera_worker.py - Simple camera display without CV processing
-import cv2
 from datetime import datetime
 import os
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
+from NetworkSource import source_name
+from CaptureCore import CaptureCore
+from FramePool import release_frame
+from FrameImage import DisplayBuffers
+from RawCapture import start_transcode
 
 class CameraWorker(QThread):
     image_data = pyqtSignal(QImage)
     file_saved = pyqtSignal(str)
+    status_changed = pyqtSignal(str)
+
+    # Recording settings
+    record_fourcc = "XVID"
+    record_container = "avi"
+    record_fps = 20.0
+    segment_seconds = 60
+    # with record_container "raw", compress the raw files in the background
+    # once recording stops
+    transcode_raw = True
 
     def __init__(self, camera_index=0):
+        """
+        camera_index: int (local camera) or str (network URL, e.g. "mjpeg+tcp://192.168.2.2:5600")
+        """
         super().__init__()
         self.camera_index = camera_index
-        self.thread_active = True
         self.is_frozen = False
-        self.is_recording = False
-        self.video_writer = None  
-        self.current_frame = None
         self.frozen_frame = None
+        # frames the GUI hasn't drawn yet, shown as BGR without conversion
+        self.display = DisplayBuffers()
+        # DisplayFanout that scales frames for each label (image_data isn't emitted then)
+        self.fanout = None
+        self.transcodes = []    # background compression of raw recordings
+
+        # Capture, reconnects and recording live in CaptureCore; this thread
+        # only turns frames into QImages
+        self.core = CaptureCore(camera_index,
+                                on_frame=self.on_frame,
+                                on_paused=self.on_paused,
+                                on_status=self.status_changed.emit,
+                                on_file=self.segment_started)
         
         # Create folders for saving files
         self.image_folder = "captured_images"
@@ -25,88 +51,97 @@ class CameraWorker(QThread):
         os.makedirs(self.image_folder, exist_ok=True)
         os.makedirs(self.video_folder, exist_ok=True)
 
+    @property
+    def is_recording(self):
+        return self.core.recording
+
     def run(self):
-        cap = cv2.VideoCapture(self.camera_index)
+        # display lives in the GUI thread: queued behind the GUI's slots, so it
+        # runs once the frame was drawn
+        self.image_data.connect(self.display.displayed)
+        self.core.run()
 
-        if not cap.isOpened():
-            print(f"Error: Cannot open camera {self.camera_index}")
+    def on_frame(self, frame, timestamp):
+        # NO COMPUTER VISION - Just display raw frame
+        if self.fanout is not None:
+            self.fanout.submit(frame)
             return
+        self.show_frame(frame)
 
-        while self.thread_active:
-            if not self.is_frozen:
-                ret, frame = cap.read()
-                if not ret:
-                    continue
+    def on_paused(self):
+        # Show the frozen frame once, the core sleeps until unfreeze/stop
+        if self.fanout is not None:
+            if self.frozen_frame is not None:
+                self.fanout.submit(self.frozen_frame)
+        elif self.frozen_frame is not None:
+            self.show_frame(self.frozen_frame)
 
-                # NO COMPUTER VISION - Just display raw frame
-                self.current_frame = frame.copy()
-                
-                # Write to video if recording
-                if self.is_recording and self.video_writer is not None:
-                    self.video_writer.write(frame)
-                
-                # Convert to QImage and emit
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb.shape
-                bytes_per_line = ch * w
-                qimg = QImage(rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                self.image_data.emit(qimg)
-            else:
-                # Display frozen frame
-                if self.frozen_frame is not None:
-                    rgb = cv2.cvtColor(self.frozen_frame, cv2.COLOR_BGR2RGB)
-                    h, w, ch = rgb.shape
-                    bytes_per_line = ch * w
-                    qimg = QImage(rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                    self.image_data.emit(qimg)
-
-        cap.release()
-        if self.video_writer is not None:
-            self.video_writer.release()
+    def show_frame(self, frame):
+        """Emit a QImage over the frame's own buffer, kept until it was drawn"""
+        qimg = self.display.image(frame)
+        if qimg is None:
+            return  # GUI is still drawing older frames, skip this one
+        self.image_data.emit(qimg)
 
     def toggle_freeze(self):
         """Freeze or unfreeze the camera feed"""
-        self.is_frozen = not self.is_frozen
-        if self.is_frozen and self.current_frame is not None:
-            self.frozen_frame = self.current_frame.copy()
+        frozen_frame, self.frozen_frame = self.frozen_frame, None
+        release_frame(frozen_frame)
+        if not self.is_frozen:
+            # keep the buffer alive instead of copying it
+            self.frozen_frame = self.core.current()
+            self.is_frozen = True
+            self.core.pause()
+        else:
+            self.is_frozen = False
+            self.core.resume()
 
     def capture_frame(self):
         """Save current frame as image"""
-        if self.current_frame is not None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"cam{self.camera_index}_capture_{timestamp}.jpg"
-            filepath = os.path.join(self.image_folder, filename)
-            cv2.imwrite(filepath, self.current_frame)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"cam{source_name(self.camera_index)}_capture_{timestamp}.jpg"
+        filepath = os.path.join(self.image_folder, filename)
+        if self.core.snapshot(filepath):
             self.file_saved.emit(filepath)
             print(f"Frame saved: {filepath}")
 
     def toggle_recording(self):
         """Start or stop video recording"""
         if not self.is_recording:
-            # Start recording
+            # Start recording, split into segments with a timestamp index each
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"cam{self.camera_index}_video_{timestamp}.avi"
-            filepath = os.path.join(self.video_folder, filename)
+            prefix = f"cam{source_name(self.camera_index)}_video_{timestamp}"
             
-            if self.current_frame is not None:
-                height, width = self.current_frame.shape[:2]
-                fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                self.video_writer = cv2.VideoWriter(filepath, fourcc, 20.0, (width, height))
-                self.is_recording = True
+            if self.core.current_frame is not None:
+                filepath = self.core.start_recording(
+                    self.video_folder, prefix, self.record_fps, self.segment_seconds,
+                    self.record_fourcc, self.record_container)
                 print(f"Recording started: {filepath}")
                 return filepath
         else:
             # Stop recording
-            if self.video_writer is not None:
-                self.video_writer.release()
-                self.video_writer = None
-            self.is_recording = False
+            recorder = self.core.stop_recording()
             print("Recording stopped")
+            if self.record_container == "raw" and self.transcode_raw and recorder is not None:
+                self.transcodes.append(start_transcode(recorder.paths, self.record_fourcc,
+                                                       on_done=self.file_saved.emit))
         return None
 
+    def segment_started(self, filepath, index):
+        """Recorder rolled over to a new file (the first one is returned by toggle_recording)"""
+        if index > 0:
+            self.file_saved.emit(filepath)
+
     def stop(self):
-        self.thread_active = False
-        if self.is_recording and self.video_writer is not None:
-            self.video_writer.release()
+        if self.is_recording:
+            self.toggle_recording()    # a raw recording still gets compressed
+        self.core.stop()
         self.quit()
-        self.wait()
\ No newline at end of file
+        self.wait()
+        release_frame(self.frozen_frame)
+        self.frozen_frame = None
+        # transcoding runs on daemon threads, don't let the app exit mid-file
+        for thread in self.transcodes:
+            if thread.is_alive():
+                print("Waiting for raw recordings to be compressed...")
+            thread.join()
@@ -0,0 +1,206 @@
+# CameraHealth.py - Keeps a camera alive through read failures and stalls
+#
+# CameraHealthMonitor wraps whatever open_capture() returns and looks like a
+# cv2.VideoCapture itself. On failed reads it backs off instead of spinning,
+# after repeated failures or a stall it reopens the camera with exponential
+# backoff, and it reports status changes ("ok", "degraded", "stalled",
+# "reconnecting", "offline") through a callback so the UI can show them.
+import random
+import threading
+import time
+
+
+class RateLimitedLog:
+    """print() that shows each kind of message at most once per interval"""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last = {}
+        self.suppressed = {}
+
+    def log(self, key, message):
+        now = time.time()
+        if now - self.last.get(key, 0) < self.interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return
+        count = self.suppressed.pop(key, 0)
+        if count:
+            message += f" ({count} similar messages suppressed)"
+        self.last[key] = now
+        print(message)
+
+
+class CameraHealthMonitor:
+    OK = "ok"
+    DEGRADED = "degraded"
+    STALLED = "stalled"
+    RECONNECTING = "reconnecting"
+    OFFLINE = "offline"
+
+    def __init__(self, opener, name="camera", on_status=None, should_stop=None,
+                 max_failures=10, stall_timeout=3.0, backoff_min=0.5, backoff_max=15.0,
+                 log_interval=5.0):
+        """
+        opener(): returns a new capture object (cv2.VideoCapture-like)
+        on_status(status, message): called on every status change
+        should_stop(): lets backoff sleeps end early when the worker stops
+        max_failures: consecutive failed reads before reconnecting
+        stall_timeout: seconds without a good frame before reconnecting
+        """
+        self.opener = opener
+        self.name = name
+        self.on_status = on_status
+        self.should_stop = should_stop or (lambda: False)
+        self.max_failures = max_failures
+        self.stall_timeout = stall_timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.logger = RateLimitedLog(log_interval)
+
+        self.cap = None
+        self.status = None
+        self.failures = 0
+        self.backoff = backoff_min
+        self.last_frame_time = None
+        self.paused = False         # no reads on purpose (frozen view), not a stall
+        self.fps = 0.0
+        self.stats = {"frames": 0, "failed_reads": 0, "reconnects": 0, "stalls": 0}
+
+        # notices stalls while read() is blocked inside the driver
+        self.watchdog = None
+        self.watchdog_active = False
+
+    # ============================================================
+    # cv2.VideoCapture-like API
+    # ============================================================
+
+    def open(self):
+        """Open the camera, retrying with backoff until it works or we're stopped"""
+        if self.watchdog is None or not self.watchdog.is_alive():
+            self.watchdog_active = True
+            self.watchdog = threading.Thread(target=self._watch, daemon=True)
+            self.watchdog.start()
+        while not self.should_stop():
+            try:
+                self.cap = self.opener()
+            except Exception as e:
+                self.logger.log("open", f"{self.name}: open failed: {e}")
+                self.cap = None
+            if self.cap is not None and self.cap.isOpened():
+                # backoff only resets on a good frame (read()): a camera that
+                # opens but never delivers keeps backing off
+                self.failures = 0
+                self.last_frame_time = time.time()
+                return True
+
+            self._release_cap()
+            self._set_status(self.OFFLINE, f"not available, retrying in {self.backoff:.1f}s")
+            self._sleep(self.backoff)
+            self.backoff = min(self.backoff * 2, self.backoff_max) * random.uniform(0.9, 1.1)
+        return False
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self, image=None):
+        if self.cap is None and not self.open():
+            return False, None
+
+        ret, frame = self.cap.read(image) if image is not None else self.cap.read()
+        now = time.time()
+
+        if ret and frame is not None:
+            if self.last_frame_time is not None and self.status == self.OK:
+                dt = now - self.last_frame_time
+                if dt > 0:
+                    self.fps += 0.1 * (1.0 / dt - self.fps)
+            self.last_frame_time = now
+            self.failures = 0
+            self.backoff = self.backoff_min
+            self.stats["frames"] += 1
+            self._set_status(self.OK)
+            return True, frame
+
+        self.failures += 1
+        self.stats["failed_reads"] += 1
+        self.logger.log("read", f"{self.name}: failed to grab frame")
+
+        stalled = self.last_frame_time is not None and now - self.last_frame_time > self.stall_timeout
+        if self.failures >= self.max_failures or stalled:
+            self.reconnect("stalled" if stalled else f"{self.failures} failed reads")
+        else:
+            if self.failures >= 3:  # single dropped frames aren't worth a status change
+                self._set_status(self.DEGRADED, f"{self.failures} failed reads")
+            # short pause instead of spinning on a dead camera
+            self._sleep(min(0.01 * self.failures, 0.2))
+        return False, None
+
+    def reconnect(self, reason=""):
+        self.stats["reconnects"] += 1
+        self._set_status(self.RECONNECTING, reason)
+        self.logger.log("reconnect", f"{self.name}: reconnecting ({reason}) in {self.backoff:.1f}s")
+        self._release_cap()
+        self._sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+        self.open()
+
+    def get(self, prop):
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value) if self.cap is not None else False
+
+    def release(self):
+        self.watchdog_active = False
+        self._release_cap()
+
+    def pause(self):
+        """Reads stop on purpose: the watchdog doesn't count the silence as a stall"""
+        self.paused = True
+
+    def resume(self):
+        # the stall timeout starts over, not from the frame before the pause
+        self.last_frame_time = time.time()
+        self.paused = False
+
+    def status_text(self):
+        if self.status == self.OK:
+            return f"{self.name}: OK {self.fps:.0f} fps"
+        return f"{self.name}: {self.status}"
+
+    # ============================================================
+    # Internals
+    # ============================================================
+
+    def _release_cap(self):
+        cap, self.cap = self.cap, None
+        if cap is not None:
+            try:
+                cap.release()
+            except Exception:
+                pass
+
+    def _set_status(self, status, message=""):
+        if status == self.status:
+            return
+        self.status = status
+        if status == self.STALLED:
+            self.stats["stalls"] += 1
+        text = f"{self.name}: {status}" + (f" ({message})" if message else "")
+        if status != self.OK:
+            self.logger.log("status", text)
+        if self.on_status is not None:
+            self.on_status(status, text)
+
+    def _sleep(self, seconds):
+        end = time.time() + seconds
+        while time.time() < end and not self.should_stop():
+            time.sleep(min(0.05, max(end - time.time(), 0)))
+
+    def _watch(self):
+        while self.watchdog_active and not self.should_stop():
+            time.sleep(0.5)
+            last = self.last_frame_time
+            if (self.status == self.OK and not self.paused and last is not None
+                    and time.time() - last > self.stall_timeout):
+                self._set_status(self.STALLED, f"no frame for {time.time() - last:.1f}s")
@@ -0,0 +1,226 @@
+# CaptureCore.py - Camera capture, recording and snapshots without any widgets
+#
+# The Qt workers (cameraW, CameraWorker), the capture process and the headless
+# runtime all run this loop; they only differ in what they do with each frame
+# (the on_frame callback). Frames come from a FramePool; a callback that keeps
+# a frame beyond the call must retain_frame() it and release it later.
+# With an enhancer set, display, snapshots and current() get the enhanced
+# frame while recordings keep the raw one. read_time is the time.monotonic()
+# of the frame being handed to on_frame, taken right after the read, so
+# comparing cameras (MultiCapture) isn't skewed by per-camera processing.
+import os
+import threading
+import time
+
+import cv2
+
+from CameraHealth import CameraHealthMonitor
+from FramePool import FramePool, frame_array, release_frame, retain_frame
+from NetworkSource import open_capture, source_name
+from PipelineStats import PIPELINE
+from SegmentedRecorder import SegmentedRecorder
+from RawCapture import RawRecorder
+
+
+class CaptureCore:
+    def __init__(self, source=0, api=None, on_frame=None, on_status=None, on_paused=None,
+                 on_file=None, name=None):
+        """
+        source: camera index, video file or network URL (see open_capture)
+        on_frame(frame, timestamp): every captured frame (PooledFrame or ndarray)
+        on_status(text): camera health changes
+        on_paused(): once each time capture is paused
+        on_file(path): a new recording segment was started
+        """
+        self.source = source
+        self.api = api
+        self.name = name or f"Camera {source_name(source)}"
+        self.on_frame = on_frame
+        self.on_status = on_status
+        self.on_paused = on_paused
+        self.on_file = on_file
+
+        self.active = True
+        self.paused = False
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.current_frame = None
+        self.recorder = None
+        self.thread = None
+        self.frames = 0
+        self.read_time = None       # monotonic time the current on_frame frame was read
+        self.enhancer = None        # Enhancer, can be set/cleared while running
+        self.enhanced_pool = None
+
+        self.cap = CameraHealthMonitor(lambda: open_capture(self.source, self.api), name=self.name,
+                                       on_status=self._status, should_stop=lambda: not self.active)
+
+    # ============================================================
+    # Loop
+    # ============================================================
+
+    def run(self):
+        """Capture until stop(); blocks, call from the thread that should do the work"""
+        if not self.cap.open():
+            return
+
+        pool = None
+        paused_reported = False
+        while self.active:
+            if self.paused:
+                if not paused_reported and self.on_paused is not None:
+                    self.on_paused()
+                paused_reported = True
+                # nothing to do until resume()/stop()
+                self.wake.wait(1.0)
+                self.wake.clear()
+                continue
+            paused_reported = False
+
+            # Read straight into a recycled buffer
+            buf = pool.acquire() if pool is not None else None
+            ret, frame = self.cap.read(buf.array) if buf is not None else self.cap.read()
+            if not ret:
+                release_frame(buf)
+                continue  # the monitor already waited and logged
+            read_time = time.monotonic()
+            timestamp = time.time()
+
+            if buf is None or frame is not buf.array:
+                release_frame(buf)
+                if pool is None or not pool.matches(frame):
+                    # first frame or the camera changed resolution
+                    pool = FramePool(frame.shape)
+                    buf = pool.acquire()
+                    buf.array[...] = frame
+                else:
+                    buf = frame  # pool exhausted (recorder behind), use the new array
+
+            self.frames += 1
+            shown = buf
+            enhancer = self.enhancer
+            if enhancer is not None:
+                shown = self._enhance(enhancer, buf)
+            self._set_current(retain_frame(shown))
+
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.write(retain_frame(buf), timestamp)
+
+            if self.on_frame is not None:
+                self.read_time = read_time
+                self.on_frame(shown, timestamp)
+            release_frame(buf)
+            if shown is not buf:
+                release_frame(shown)
+
+        self.cap.release()
+        self.stop_recording()
+        self._set_current(None)
+
+    def start(self):
+        """Run the loop in a background thread (headless use)"""
+        self.thread = threading.Thread(target=self.run, daemon=True, name=self.name)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.active = False
+        self.wake.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+
+    def pause(self):
+        self.paused = True
+        self.cap.pause()
+        self.wake.set()
+
+    def resume(self):
+        self.cap.resume()
+        self.paused = False
+        self.wake.set()
+
+    # ============================================================
+    # Frames
+    # ============================================================
+
+    def _enhance(self, enhancer, frame):
+        """Enhanced copy of the frame in a pooled buffer (one reference)"""
+        start = time.perf_counter()
+        bgr = frame_array(frame)
+        if self.enhanced_pool is None or not self.enhanced_pool.matches(bgr):
+            self.enhanced_pool = FramePool(bgr.shape)
+        out = self.enhanced_pool.acquire()
+        if out is None:
+            out = enhancer.apply(bgr)   # pool exhausted, use a new array
+        else:
+            enhancer.apply(bgr, out.array)
+        PIPELINE.add(f"{self.name} enhance", time.perf_counter() - start)
+        return out
+
+    def _set_current(self, frame):
+        with self.lock:
+            old, self.current_frame = self.current_frame, frame
+        release_frame(old)
+
+    def current(self):
+        """Newest frame with a reference taken (release_frame() it when done)"""
+        with self.lock:
+            return retain_frame(self.current_frame)
+
+    def snapshot(self, filepath):
+        """Save the newest frame as an image"""
+        frame = self.current()
+        if frame is None:
+            return False
+        try:
+            return cv2.imwrite(filepath, frame_array(frame))
+        finally:
+            release_frame(frame)
+
+    @property
+    def fps(self):
+        return self.cap.fps
+
+    # ============================================================
+    # Recording
+    # ============================================================
+
+    def start_recording(self, folder, prefix, fps=None, segment_seconds=60, fourcc="mp4v", container="mp4"):
+        """
+        Start segmented recording; returns the first segment's path.
+        container "raw" records every frame losslessly into memory-mapped
+        files (RawCapture), fourcc is then only used when transcoding.
+        """
+        if fps is None:
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            if not fps or fps <= 0 or fps > 120:
+                fps = 30.0
+        os.makedirs(folder, exist_ok=True)
+        if container == "raw":
+            recorder = RawRecorder(folder, prefix, fps, segment_seconds, on_segment=self._segment_started)
+        else:
+            recorder = SegmentedRecorder(folder, prefix, fps, segment_seconds, fourcc, container,
+                                         on_segment=self._segment_started)
+        recorder.start()
+        self.stop_recording()
+        self.recorder = recorder
+        return recorder.segment_path(0)
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+        return recorder
+
+    @property
+    def recording(self):
+        return self.recorder is not None
+
+    def _segment_started(self, path, index):
+        if self.on_file is not None:
+            self.on_file(path, index)
+
+    def _status(self, state, text):
+        if self.on_status is not None:
+            self.on_status(text)
@@ -0,0 +1,252 @@
+# CrabDetector.py - Green crab detection (HSV threshold + morphology + contours)
+#
+# Shared by the detection widgets (ObjectDetectionWorker, objectW) and the
+# headless runtime, so the same parameters give the same counts everywhere.
+#
+# detect() returns plain data (boxes, contours, labels, count) that the GUI
+# draws as an overlay at display resolution (DetectionOverlay). Drawing into
+# the pixels (annotate/process) is only for exporting annotated video:
+#   python CrabDetector.py dive.mp4 dive_annotated.mp4
+#
+# "scale" < 1 runs colour segmentation and morphology on a downscaled frame
+# (kernels and area limits scaled to match) and maps the contours back to
+# full resolution; "refine" then re-segments each found box at full
+# resolution for exact outlines. See benchmarks/bench_pyramid.py.
+#
+# threads > 1 segments the frame as horizontal bands on a thread pool (OpenCV
+# releases the GIL). Each band is read with a halo as wide as the morphology
+# reaches, so the band cores stitched together are exactly the single-pass
+# mask; contours are found once on the whole mask, so blobs crossing a seam
+# come out whole and the counts are identical. See benchmarks/bench_tiles.py.
+import argparse
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# bump when the detection logic changes
+DETECTOR_VERSION = 1
+
+DEFAULT_PARAMS = {
+    "lower_green": (25, 30, 20),
+    "upper_green": (95, 255, 255),
+    "open_kernel": 7,
+    "open_iterations": 2,
+    "close_kernel": 5,
+    "close_iterations": 2,
+    "min_area": 500,
+    "max_area": 50000,
+    "scale": 1.0,
+    "refine": False,
+}
+
+
+def scaled_kernel(size, scale):
+    """Odd kernel size covering the same area at a different scale"""
+    return max(1, int(round(size * scale)) | 1)
+
+
+class CrabDetector:
+    # bands smaller than this aren't worth a task
+    min_band_rows = 128
+
+    def __init__(self, params=None, threads=1):
+        """threads: segment in parallel bands (same results, not a parameter)"""
+        self.threads = max(1, int(threads))
+        self.pool = None
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        p = self.params
+        self.lower_green = np.array(p["lower_green"])
+        self.upper_green = np.array(p["upper_green"])
+        self.kernel_open = np.ones((p["open_kernel"], p["open_kernel"]), np.uint8)
+        self.kernel_close = np.ones((p["close_kernel"], p["close_kernel"]), np.uint8)
+
+        self.set_scale(p["scale"])
+
+    def set_scale(self, scale):
+        """Change the processing scale (e.g. QualityGovernor under load)"""
+        p = self.params
+        p["scale"] = scale
+        # the kernels at processing scale
+        self.scale = min(float(scale), 1.0)
+        k = scaled_kernel(p["open_kernel"], self.scale)
+        self.small_kernel_open = np.ones((k, k), np.uint8)
+        k = scaled_kernel(p["close_kernel"], self.scale)
+        self.small_kernel_close = np.ones((k, k), np.uint8)
+
+    def segment(self, frame, kernel_open=None, kernel_close=None):
+        """Binary mask of crab-coloured pixels after morphology"""
+        p = self.params
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, self.lower_green, self.upper_green)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel_open if kernel_open is None else kernel_open,
+                                iterations=p["open_iterations"])
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel_close if kernel_close is None else kernel_close,
+                                iterations=p["close_iterations"])
+        return mask
+
+    def segment_tiled(self, frame, kernel_open=None, kernel_close=None):
+        """segment() in horizontal bands on the thread pool, the same mask"""
+        kernel_open = self.kernel_open if kernel_open is None else kernel_open
+        kernel_close = self.kernel_close if kernel_close is None else kernel_close
+        bands = min(self.threads, frame.shape[0] // self.min_band_rows)
+        if bands < 2:
+            return self.segment(frame, kernel_open, kernel_close)
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.threads, thread_name_prefix="crab-tiles")
+
+        # how far the result at a pixel depends on its neighbours: every
+        # erode/dilate pass reaches half a kernel
+        p = self.params
+        halo = (2 * p["open_iterations"] * (max(kernel_open.shape) // 2)
+                + 2 * p["close_iterations"] * (max(kernel_close.shape) // 2))
+        height = frame.shape[0]
+        mask = np.empty(frame.shape[:2], np.uint8)
+
+        def band(i):
+            y0, y1 = height * i // bands, height * (i + 1) // bands
+            top, bottom = max(y0 - halo, 0), min(y1 + halo, height)
+            part = self.segment(frame[top:bottom], kernel_open, kernel_close)
+            mask[y0:y1] = part[y0 - top:y1 - top]
+
+        for done in [self.pool.submit(band, i) for i in range(bands)]:
+            done.result()
+        return mask
+
+    def mask(self, frame, kernel_open=None, kernel_close=None):
+        if self.threads > 1:
+            return self.segment_tiled(frame, kernel_open, kernel_close)
+        return self.segment(frame, kernel_open, kernel_close)
+
+    def find(self, frame):
+        """Contours of the crabs in a BGR frame"""
+        min_area, max_area = self.params["min_area"], self.params["max_area"]
+        if self.scale >= 1.0:
+            contours, _ = cv2.findContours(self.mask(frame), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            return [c for c in contours if min_area < cv2.contourArea(c) < max_area]
+
+        small = self.downscale(frame)
+        sx, sy = small.shape[1] / frame.shape[1], small.shape[0] / frame.shape[0]
+        mask = self.mask(small, self.small_kernel_open, self.small_kernel_close)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        area_scale = sx * sy
+        crabs = []
+        for c in contours:
+            if not min_area * area_scale < cv2.contourArea(c) < max_area * area_scale:
+                continue
+            # pixel centres back to full resolution
+            c = c.astype(np.float32) + 0.5
+            c[..., 0] /= sx
+            c[..., 1] /= sy
+            c = np.round(c - 0.5).astype(np.int32)
+            if self.params["refine"]:
+                c = self.refine(frame, c)
+                if c is None:
+                    continue
+            crabs.append(c)
+        return crabs
+
+    def downscale(self, frame):
+        """Frame at processing scale: halvings (INTER_AREA's fast 2x2 path),
+        then a linear resize for what's left. A single INTER_AREA resize by a
+        non-2 factor costs more than detecting at full resolution."""
+        small, left = frame, self.scale
+        while left <= 0.5 + 1e-6:
+            small = cv2.resize(small, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+            left *= 2
+        if left < 1.0 - 1e-6:
+            small = cv2.resize(small, None, fx=left, fy=left, interpolation=cv2.INTER_LINEAR)
+        return small
+
+    def refine(self, frame, contour):
+        """Full-resolution outline of the crab around a back-projected contour"""
+        p = self.params
+        x, y, w, h = cv2.boundingRect(contour)
+        # room for the scale error plus what the morphology reaches into
+        reach = p["open_kernel"] * p["open_iterations"] + p["close_kernel"] * p["close_iterations"]
+        pad = int(math.ceil(1.0 / self.scale)) + reach
+        fh, fw = frame.shape[:2]
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1, y1 = min(x + w + pad, fw), min(y + h + pad, fh)
+        contours, _ = cv2.findContours(self.segment(frame[y0:y1, x0:x1]), cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        if not contours:
+            return None
+        # the blob that covers the coarse detection's centre, else the biggest
+        cx, cy = x + w / 2.0, y + h / 2.0
+        inside = [c for c in contours if cv2.pointPolygonTest(c, (cx, cy), False) >= 0]
+        best = max(inside or contours, key=cv2.contourArea)
+        if not p["min_area"] < cv2.contourArea(best) < p["max_area"]:
+            return None
+        return best
+
+    def count(self, frame):
+        return len(self.find(frame))
+
+    def detect(self, frame):
+        """Structured result for one BGR frame, nothing is drawn"""
+        crabs = self.find(frame)
+        return {
+            "count": len(crabs),
+            "boxes": [cv2.boundingRect(c) for c in crabs],
+            "contours": crabs,
+            "labels": [f'Crab {i}' for i in range(1, len(crabs) + 1)],
+            "shape": frame.shape[:2],
+        }
+
+    def annotate(self, image, result):
+        """Burn a detect() result into image (in place), for exported video"""
+        for (x, y, w, h), label, c in zip(result["boxes"], result["labels"], result["contours"]):
+            cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            cv2.putText(image, label, (x, y-10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            cv2.drawContours(image, [c], -1, (255, 0, 0), 2)
+
+        cv2.putText(image, f'Count: {result["count"]}', (20, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+        if "unique" in result:
+            cv2.putText(image, f'Total: {result["unique"]}', (20, 90),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+        return image
+
+    def process(self, frame):
+        """Detect and return an annotated copy of the frame"""
+        return self.annotate(frame.copy(), self.detect(frame))
+
+
+def export_annotated(source, path, params=None, fourcc="mp4v"):
+    """Write a copy of a video with the detections burned in"""
+    detector = CrabDetector(params)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: Cannot open source {source}")
+        return 0
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    writer = None
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if writer is None:
+            h, w = frame.shape[:2]
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+        # the frame is ours, draw straight into it
+        writer.write(detector.annotate(frame, detector.detect(frame)))
+        frames += 1
+    cap.release()
+    if writer is not None:
+        writer.release()
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a video with crab detections burned in")
+    parser.add_argument("source")
+    parser.add_argument("output")
+    parser.add_argument("--fourcc", default="mp4v")
+    args = parser.parse_args()
+    print(f"{export_annotated(args.source, args.output, fourcc=args.fourcc)} frames written to {args.output}")
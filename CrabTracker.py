@@ -0,0 +1,278 @@
+# CrabTracker.py - Stable crab IDs across frames and unique-individual totals
+#
+# CrabTracker sits on top of a detector (anything with detect(frame)) and
+# associates each frame's boxes with the existing tracks by IoU against
+# where the tracks are predicted to be (last box + velocity). Unmatched
+# detections start new tracks; a track becomes "confirmed" after min_hits
+# detections and only confirmed tracks count towards the unique total, so a
+# single false detection doesn't add a crab. Tracks are dropped after
+# max_misses frames without a detection. Crabs that touch come out of the
+# detector as one blob; tracks covered by such a blob coast on their velocity
+# until the crabs separate again, so they keep their ids.
+#
+# With detect_every=N the detector only runs every Nth frame. In between,
+# tracks are moved by sparse optical flow (Lucas-Kanade on a half-size grey
+# frame, median motion of the points inside each box), falling back to the
+# track's velocity when the flow fails.
+#
+# update() returns a detect()-style result with "Crab <id>" labels and the
+# unique total in "unique".
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def covered(a, b):
+    """Fraction of box a that lies inside box b"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    return w * h / float(aw * ah)
+
+
+class Track:
+    def __init__(self, track_id, box, contour):
+        self.id = track_id
+        self.box = np.array(box, np.float32)       # x, y, w, h (current estimate)
+        self.detected = self.box.copy()            # where it was last detected
+        self.velocity = np.zeros(2, np.float32)    # px per frame
+        self.contour = contour
+        self.hits = 1
+        self.misses = 0
+        self.unseen = 0                            # frames since `detected`, before this one
+        self.points = None                         # LK feature points (half-size frame)
+
+    def predicted(self):
+        """Box one frame ahead"""
+        box = self.box.copy()
+        box[:2] += self.velocity
+        return box
+
+    def move(self, shift):
+        self.box[:2] += shift
+        self.contour = self.contour + np.round(shift).astype(np.int32)
+
+    def correct(self, box, contour, frames):
+        """A detection matched: update the box and smooth the velocity"""
+        box = np.array(box, np.float32)
+        measured = (box[:2] - self.detected[:2]) / max(self.unseen + frames, 1)
+        # a jump of more than half a body length per frame is a bad match or a
+        # box that changed shape, not speed
+        limit = 0.5 * box[2:]
+        measured = np.clip(measured, -limit, limit)
+        self.velocity = 0.5 * self.velocity + 0.5 * measured if self.hits > 1 else measured
+        self.box = box
+        self.detected = box.copy()
+        self.contour = contour
+        self.hits += 1
+        self.misses = 0
+        self.unseen = 0
+
+
+class CrabTracker:
+    def __init__(self, detector, detect_every=1, iou_threshold=0.2, max_misses=10, min_hits=3,
+                 flow_scale=0.5):
+        self.detector = detector
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.flow_scale = flow_scale
+
+        self.tracks = []
+        self.next_id = 1
+        self.confirmed = set()       # ids that count towards the unique total
+        self.frames = 0
+        self.detections_run = 0
+        self.since_detection = 0
+        self.prev_gray = None
+        self.shape = None
+
+    @property
+    def unique(self):
+        return len(self.confirmed)
+
+    def reset(self):
+        self.tracks = []
+        self.confirmed = set()
+        self.next_id = 1
+        self.prev_gray = None
+
+    def update(self, frame, result=None):
+        """
+        Track one frame. result: a detect() result when one is already
+        available (e.g. replayed from the DetectionStore), otherwise the
+        detector runs on every detect_every-th frame.
+        """
+        self.frames += 1
+        self.since_detection += 1
+        self.shape = frame.shape[:2]
+        need_flow = result is None and self.detect_every > 1
+        gray = self._small_gray(frame) if need_flow else None
+
+        if result is None and (self.since_detection >= self.detect_every or self.frames == 1):
+            result = self.detector.detect(frame)
+            self.detections_run += 1
+
+        if result is not None:
+            self._associate(result, self.since_detection)
+            self.since_detection = 0
+            if need_flow:
+                self._pick_points(gray)
+        else:
+            self._propagate(gray)
+        self.prev_gray = gray
+        return self.result()
+
+    # ============================================================
+    # Association
+    # ============================================================
+
+    def _associate(self, result, frames):
+        boxes, contours = result["boxes"], result["contours"]
+        predicted = [t.predicted() for t in self.tracks]
+        matches = []
+        used_t, used_d = set(), set()
+
+        # crabs touching each other come out as one blob: when a detection
+        # covers most of two or more tracks, they all coast through it instead
+        # of one track jumping to the blob and the others being lost
+        for di, box in enumerate(boxes):
+            inside = [ti for ti, p in enumerate(predicted) if covered(p, box) > 0.5]
+            if len(inside) >= 2:
+                used_d.add(di)
+                for ti in inside:
+                    used_t.add(ti)
+                    self.tracks[ti].move(self.tracks[ti].velocity)
+                    self.tracks[ti].unseen += frames
+
+        pairs = sorted(((box_iou(predicted[ti], b), ti, di)
+                        for ti in range(len(self.tracks)) if ti not in used_t
+                        for di, b in enumerate(boxes) if di not in used_d), reverse=True)
+        for score, ti, di in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti not in used_t and di not in used_d:
+                matches.append((ti, di))
+                used_t.add(ti)
+                used_d.add(di)
+
+        # second chance for tracks that lost overlap (occlusion, merged blobs):
+        # nearest centre within the track's own size, growing with the misses
+        pairs = []
+        for ti, t in enumerate(self.tracks):
+            if ti in used_t:
+                continue
+            px, py, pw, ph = predicted[ti]
+            reach = max(pw, ph) * (1.0 + 0.25 * min(t.misses, 8))
+            for di, (x, y, w, h) in enumerate(boxes):
+                if di in used_d:
+                    continue
+                dist = np.hypot(px + pw / 2 - x - w / 2, py + ph / 2 - y - h / 2)
+                if dist < reach:
+                    pairs.append((dist / reach, ti, di))
+        for _, ti, di in sorted(pairs):
+            if ti not in used_t and di not in used_d:
+                matches.append((ti, di))
+                used_t.add(ti)
+                used_d.add(di)
+
+        for ti, di in matches:
+            track = self.tracks[ti]
+            track.correct(boxes[di], contours[di], frames)
+            if track.hits >= self.min_hits:
+                self.confirmed.add(track.id)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_t:
+                track.misses += frames
+                track.unseen += frames
+                track.move(track.velocity)   # coast
+        for di, box in enumerate(boxes):
+            if di not in used_d:
+                self.tracks.append(Track(self.next_id, box, contours[di]))
+                self.next_id += 1
+                if self.min_hits <= 1:
+                    self.confirmed.add(self.next_id - 1)
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+    # ============================================================
+    # Propagation between detections
+    # ============================================================
+
+    def _small_gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.flow_scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _pick_points(self, gray):
+        s = self.flow_scale
+        for track in self.tracks:
+            x, y, w, h = (track.box * s).astype(int)
+            x, y = max(x, 0), max(y, 0)
+            roi = gray[y:y + max(h, 1), x:x + max(w, 1)]
+            track.points = None
+            if roi.size < 16:
+                continue
+            points = cv2.goodFeaturesToTrack(roi, 12, 0.01, 3)
+            if points is not None:
+                track.points = points + np.array([[x, y]], np.float32)
+
+    def _propagate(self, gray):
+        tracked = [t for t in self.tracks if t.points is not None and len(t.points)]
+        if tracked and self.prev_gray is not None and gray is not None:
+            counts = [len(t.points) for t in tracked]
+            points = np.concatenate([t.points for t in tracked]).astype(np.float32)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None,
+                                                        winSize=(15, 15), maxLevel=2)
+            start = 0
+            for track, n in zip(tracked, counts):
+                ok = status[start:start + n, 0] == 1
+                if ok.sum() >= 2:
+                    shift = np.median(moved[start:start + n][ok] - points[start:start + n][ok], axis=0)
+                    shift = shift.reshape(2) / self.flow_scale
+                    track.move(shift)
+                    track.points = moved[start:start + n][ok].reshape(-1, 1, 2)
+                else:
+                    track.points = None
+                    track.move(track.velocity)
+                start += n
+        for track in self.tracks:
+            if track not in tracked:
+                track.move(track.velocity)
+
+    # ============================================================
+    # Output
+    # ============================================================
+
+    def result(self):
+        visible = [t for t in self.tracks if t.misses == 0 and t.id in self.confirmed]
+        return {
+            "count": len(visible),
+            "boxes": [tuple(int(round(v)) for v in t.box) for t in visible],
+            "contours": [t.contour for t in visible],
+            "labels": [f'Crab {t.id}' for t in visible],
+            "ids": [t.id for t in visible],
+            "unique": self.unique,
+            "shape": self.shape,
+        }
+
+    def summary(self):
+        if not self.detections_run:
+            return f"Tracker: {self.unique} unique crabs in {self.frames} frames (given detections)"
+        rate = self.detections_run / self.frames
+        return f"Tracker: {self.unique} unique crabs, detection ran on {100 * rate:.0f}% of {self.frames} frames"
@@ -0,0 +1,51 @@
+# DetectionOverlay.py - Draws CrabDetector results on top of a displayed frame
+#
+# The frame is scaled to the label first and the boxes, contours and labels
+# are drawn as vectors at that size, so nothing touches the full-resolution
+# pixels and line widths/text stay readable whatever the camera resolution.
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QFont, QPainter, QPen, QPixmap, QPolygonF
+
+BOX_COLOR = QColor(0, 255, 0)
+CONTOUR_COLOR = QColor(0, 0, 255)     # the old burned-in contours were BGR (255, 0, 0)
+
+
+def draw_detections(painter, result, scale_x, scale_y):
+    """Paint a detect() result with frame coordinates scaled to the painter's"""
+    painter.setRenderHint(QPainter.Antialiasing)
+    font = QFont()
+    font.setPointSize(9)
+    font.setBold(True)
+    painter.setFont(font)
+
+    for (x, y, w, h), label, contour in zip(result["boxes"], result["labels"], result["contours"]):
+        painter.setPen(QPen(CONTOUR_COLOR, 1.5))
+        points = contour.reshape(-1, 2)
+        painter.drawPolygon(QPolygonF([QPointF(px * scale_x, py * scale_y) for px, py in points]))
+
+        rect = QRectF(x * scale_x, y * scale_y, w * scale_x, h * scale_y)
+        painter.setPen(QPen(BOX_COLOR, 2))
+        painter.drawRect(rect)
+        painter.drawText(rect.topLeft() + QPointF(0, -4), label)
+
+    font.setPointSize(14)
+    painter.setFont(font)
+    painter.setPen(QPen(BOX_COLOR))
+    painter.drawText(QPointF(12, 28), f'Count: {result["count"]}')
+    if "unique" in result:
+        painter.drawText(QPointF(12, 52), f'Total: {result["unique"]}')
+
+
+def overlay_pixmap(qimg, result, size=None):
+    """Pixmap of qimg scaled to fit `size` (QSize) with the detections drawn on it"""
+    pixmap = QPixmap.fromImage(qimg)
+    if size is not None and size.width() > 0 and size.height() > 0:
+        pixmap = pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    if result is None:
+        return pixmap
+
+    frame_h, frame_w = result["shape"]
+    painter = QPainter(pixmap)
+    draw_detections(painter, result, pixmap.width() / frame_w, pixmap.height() / frame_h)
+    painter.end()
+    return pixmap
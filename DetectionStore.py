@@ -0,0 +1,262 @@
+# DetectionStore.py - Per-frame detection results cached on disk
+#
+# Results of running the detector over a video are saved in one .npz per
+# (video content, detector version, parameters):
+#   detections/<fingerprint>_<params hash>.npz
+# The fingerprint hashes the file size and 16 evenly spaced 64 KB samples,
+# so renamed/copied videos hit the cache and a multi-GB file is fingerprinted
+# without reading it all.
+#
+# Per frame we keep the video time, the wall-clock time (from the recorder's
+# sidecar index when there is one), the count, and the boxes, areas and contour
+# points packed into flat arrays with offsets. Count range queries ("max
+# crabs between 10:00 and 12:00") use per-block maxima/sums, so they touch at
+# most two partial blocks plus one value per block in between.
+#
+#   python DetectionStore.py query dive.mp4 --from 10:00 --to 12:00
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from CrabDetector import CrabDetector, DETECTOR_VERSION
+
+BLOCK = 256
+SAMPLES = 16
+SAMPLE_SIZE = 64 * 1024
+
+
+def fingerprint(path):
+    """Content fingerprint from the size and sampled chunks of a file"""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode(), digest_size=12)
+    with open(path, "rb") as f:
+        for i in range(SAMPLES):
+            f.seek(max(0, (size - SAMPLE_SIZE) * i // (SAMPLES - 1)))
+            h.update(f.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+
+def params_key(params):
+    text = json.dumps({"version": DETECTOR_VERSION, "params": params}, sort_keys=True, default=list)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def sidecar_times(path):
+    """Capture timestamp of every frame of a recorded segment, if it has an index"""
+    from SegmentedRecorder import read_index
+    index_path = os.path.splitext(path)[0] + ".csv"
+    if not os.path.exists(index_path):
+        return None
+    times = {}
+    for out_frame, ts, _, _ in read_index(index_path):
+        times.setdefault(out_frame, ts)
+    return times
+
+
+class DetectionResults:
+    """Detections of every frame of one video"""
+
+    def __init__(self, times, counts, box_offsets, boxes, areas, point_offsets, points,
+                 shape, wall_times=None):
+        self.times = times                # video seconds per frame
+        self.counts = counts
+        self.box_offsets = box_offsets    # boxes of frame i: box_offsets[i]:box_offsets[i+1]
+        self.boxes = boxes                # (n, 4) x, y, w, h
+        self.areas = areas
+        self.point_offsets = point_offsets  # contour j: point_offsets[j]:point_offsets[j+1]
+        self.points = points
+        self.shape = tuple(shape)
+        self.wall_times = wall_times if wall_times is not None and len(wall_times) else None
+        self._blocks()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _blocks(self):
+        n = len(self.counts)
+        padded = np.zeros(-(-n // BLOCK) * BLOCK, np.int64)
+        padded[:n] = self.counts
+        self.block_max = padded.reshape(-1, BLOCK).max(axis=1) if n else padded
+        self.block_sum = padded.reshape(-1, BLOCK).sum(axis=1) if n else padded
+
+    def result(self, i):
+        """Frame i in the same form as CrabDetector.detect()"""
+        a, b = self.box_offsets[i], self.box_offsets[i + 1]
+        contours = [self.points[self.point_offsets[j]:self.point_offsets[j + 1]].reshape(-1, 1, 2)
+                    for j in range(a, b)]
+        return {
+            "count": int(self.counts[i]),
+            "boxes": [tuple(int(v) for v in box) for box in self.boxes[a:b]],
+            "contours": contours,
+            "labels": [f'Crab {k}' for k in range(1, b - a + 1)],
+            "areas": self.areas[a:b].tolist(),
+            "shape": self.shape,
+        }
+
+    # ============================================================
+    # Range queries
+    # ============================================================
+
+    def frame_range(self, start, end, clock=False):
+        """Frames [i, j) with time in [start, end]; clock=True uses wall-clock times"""
+        times = self.wall_times if clock else self.times
+        if times is None:
+            raise ValueError("no wall-clock times for this video")
+        return int(np.searchsorted(times, start, "left")), int(np.searchsorted(times, end, "right"))
+
+    def _reduce(self, i, j, blocks, reduce):
+        if i >= j:
+            return None
+        bi, bj = -(-i // BLOCK), j // BLOCK
+        if bi >= bj:
+            return reduce(self.counts[i:j])
+        parts = [blocks[bi:bj]]
+        if i < bi * BLOCK:
+            parts.append(self.counts[i:bi * BLOCK])
+        if bj * BLOCK < j:
+            parts.append(self.counts[bj * BLOCK:j])
+        return reduce(np.concatenate([np.asarray(p, np.int64) for p in parts]))
+
+    def max_count(self, start, end, clock=False):
+        i, j = self.frame_range(start, end, clock)
+        value = self._reduce(i, j, self.block_max, np.max)
+        return None if value is None else int(value)
+
+    def total_count(self, start, end, clock=False):
+        """Sum of per-frame counts (crab-frames)"""
+        i, j = self.frame_range(start, end, clock)
+        value = self._reduce(i, j, self.block_sum, np.sum)
+        return 0 if value is None else int(value)
+
+    def mean_count(self, start, end, clock=False):
+        i, j = self.frame_range(start, end, clock)
+        return self.total_count(start, end, clock) / (j - i) if j > i else 0.0
+
+    # ============================================================
+    # Storage
+    # ============================================================
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, times=self.times, counts=self.counts, box_offsets=self.box_offsets,
+                            boxes=self.boxes, areas=self.areas, point_offsets=self.point_offsets,
+                            points=self.points, shape=np.array(self.shape),
+                            wall_times=self.wall_times if self.wall_times is not None else np.zeros(0))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["times"], data["counts"], data["box_offsets"], data["boxes"], data["areas"],
+                   data["point_offsets"], data["points"], data["shape"], data["wall_times"])
+
+
+class DetectionRecorder:
+    """Collects detect() results frame by frame while a video is processed"""
+
+    def __init__(self):
+        self.times, self.counts, self.box_offsets = [], [], [0]
+        self.boxes, self.areas, self.point_offsets, self.points = [], [], [0], []
+        self.shape = (0, 0)
+
+    def add(self, video_time, result):
+        self.times.append(video_time)
+        self.counts.append(result["count"])
+        self.shape = result["shape"]
+        for box, contour in zip(result["boxes"], result["contours"]):
+            self.boxes.append(box)
+            self.areas.append(cv2.contourArea(contour))
+            pts = contour.reshape(-1, 2)
+            self.points.append(pts)
+            self.point_offsets.append(self.point_offsets[-1] + len(pts))
+        self.box_offsets.append(len(self.boxes))
+
+    def results(self, wall_times=None):
+        points = np.concatenate(self.points).astype(np.int32) if self.points else np.zeros((0, 2), np.int32)
+        return DetectionResults(
+            np.array(self.times, np.float64), np.array(self.counts, np.int16),
+            np.array(self.box_offsets, np.int32), np.array(self.boxes, np.int32).reshape(-1, 4),
+            np.array(self.areas, np.float32), np.array(self.point_offsets, np.int32), points,
+            self.shape, wall_times)
+
+
+class DetectionStore:
+    def __init__(self, folder="detections"):
+        self.folder = folder
+
+    def path_for(self, video, params):
+        return os.path.join(self.folder, f"{fingerprint(video)}_{params_key(params)}.npz")
+
+    def load(self, video, params):
+        """Cached results for video with these parameters, or None"""
+        try:
+            path = self.path_for(video, params)
+            return DetectionResults.load(path) if os.path.exists(path) else None
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Detection cache for {video} unreadable: {e}")
+            return None
+
+    def save(self, video, params, recorder):
+        """Store a complete pass over video"""
+        times = sidecar_times(video)
+        wall = None
+        if times:
+            wall = np.array([times.get(i, np.nan) for i in range(len(recorder.counts))])
+            if np.isnan(wall).any():
+                wall = None  # index doesn't cover every frame, don't guess
+        results = recorder.results(wall)
+        os.makedirs(self.folder, exist_ok=True)
+        results.save(self.path_for(video, params))
+        return results
+
+
+def parse_clock(text, reference):
+    """'HH:MM[:SS]' on the local day of the epoch time `reference`"""
+    parts = [int(p) for p in text.split(":")] + [0]
+    day = datetime.fromtimestamp(reference).replace(hour=parts[0], minute=parts[1], second=parts[2],
+                                                    microsecond=0)
+    return day.timestamp()
+
+
+def parse_video_time(text):
+    """'MM:SS' or 'HH:MM:SS' or seconds -> seconds"""
+    value = 0.0
+    for part in text.split(":"):
+        value = value * 60 + float(part)
+    return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query cached detection results")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("query")
+    p.add_argument("video")
+    p.add_argument("--from", dest="start", default="0")
+    p.add_argument("--to", dest="end")
+    p.add_argument("--video-time", action="store_true",
+                   help="times are positions in the video even if wall-clock times are stored")
+    p.add_argument("--store", default="detections")
+    args = parser.parse_args()
+
+    # same settings as the detection tab
+    from MotionGate import GatedDetector
+    results = DetectionStore(args.store).load(args.video, GatedDetector(CrabDetector()).params)
+    if results is None:
+        print("No cached detections for this video, play it in the detection tab first")
+    else:
+        clock = results.wall_times is not None and not args.video_time
+        if clock:
+            start = parse_clock(args.start, results.wall_times[0]) if ":" in args.start else results.wall_times[0]
+            end = parse_clock(args.end, results.wall_times[0]) if args.end else results.wall_times[-1]
+        else:
+            start = parse_video_time(args.start)
+            end = parse_video_time(args.end) if args.end else results.times[-1]
+        i, j = results.frame_range(start, end, clock)
+        print(f"{j - i} frames ({'wall clock' if clock else 'video time'})")
+        print(f"max count:  {results.max_count(start, end, clock)}")
+        print(f"mean count: {results.mean_count(start, end, clock):.2f}")
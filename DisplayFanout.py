@@ -0,0 +1,232 @@
+# DisplayFanout.py - One camera frame scaled once per label, off the GUI thread
+#
+# Instead of handing every label the full-resolution QImage (a full-size
+# QPixmap conversion per label per frame, then Qt scales it while painting),
+# the capture thread submit()s its frame here and this thread makes one image
+# per label at the label's current size:
+#   - views are produced largest first and each one is scaled from the
+#     smallest image already made that still covers it (thumbnails come from
+#     the main view, not from the 1080p frame)
+#   - every view has its own frame-rate budget, e.g. the main view at the
+#     camera rate and thumbnails at 10 fps; a view that isn't due is skipped
+#   - output buffers come from a per-view FramePool and are recycled once the
+#     GUI has drawn the next image of that view (the label's pixmap shares the
+#     buffer until then); a view whose GUI side is behind skips the frame
+#   - only the newest submitted frame is kept, a slow GUI never queues frames
+#   - views are BGRX (Format_RGB32, see FrameImage), shown without conversion
+#   - a view set hidden (ViewScheduler: other tab, minimized window) costs
+#     nothing; it is due again on the first frame after it is shown
+#
+# camera_fanouts() sets up the windows' camera labels: the first one shows the
+# main camera, the others a camera of their own each (captured together in a
+# MultiCapture) or, when there are fewer cameras than labels, the main one.
+import threading
+import time
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from FrameImage import bgrx_qimage
+from FramePool import FramePool, frame_array, release_frame, retain_frame
+from MultiCapture import MultiCapture, camera_source
+from PipelineStats import PIPELINE
+
+
+def fit(src, width, height, dst=None):
+    """Resize src to width x height: INTER_AREA halvings while the image is at
+    least twice the target (its fast 2x2 path), then one linear resize.
+    A single INTER_AREA resize by an odd factor costs 5-20x more."""
+    while src.shape[1] >= 2 * width and src.shape[0] >= 2 * height:
+        src = cv2.resize(src, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    return cv2.resize(src, (width, height), dst=dst, interpolation=cv2.INTER_LINEAR)
+
+
+class View:
+    def __init__(self, label, fps=None):
+        self.label = label
+        self.interval = 1.0 / fps if fps else 0.0
+        self.size = (0, 0)          # label size, updated from the GUI thread
+        self.last = 0.0             # when the last image was made
+        self.pool = None
+        self.in_flight = []         # buffers emitted, not drawn yet
+        self.on_screen = None       # buffer behind the label's current pixmap
+        self.visible = True
+        self.shown = 0
+        self.skipped = 0
+
+
+class DisplayFanout(QThread):
+    # view index, image at that view's size (points into a pooled buffer)
+    frame_ready = pyqtSignal(int, QImage)
+
+    def __init__(self, labels, fps=None):
+        """
+        labels: QLabels to fill (with scaledContents, as in the .ui files)
+        fps: budget per label, None (or a None entry) for every frame
+        """
+        super().__init__()
+        fps = fps or [None] * len(labels)
+        self.views = [View(label, rate) for label, rate in zip(labels, fps)]
+        for view in self.views:
+            self._read_size(view)
+
+        self.active = True
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = None          # (frame, is_rgb), newest submitted frame
+        self.frames = 0
+        self.dropped = 0
+        self.scale_time = 0.0
+
+        # GUI thread: put the image on the label
+        self.frame_ready.connect(self._show)
+
+    # ============================================================
+    # Input (any thread)
+    # ============================================================
+
+    def submit(self, frame, rgb=False):
+        """
+        Newest camera frame (ndarray or PooledFrame, BGR unless rgb=True).
+        Pooled frames are retained until scaled; plain arrays must not be
+        written to before the next submit().
+        """
+        with self.lock:
+            old, self.pending = self.pending, (retain_frame(frame), rgb)
+        if old is not None:
+            release_frame(old[0])
+            self.dropped += 1
+        self.wake.set()
+
+    def set_fps(self, index, fps):
+        """Change a view's budget (None = every frame), e.g. QualityGovernor"""
+        self.views[index].interval = 1.0 / fps if fps else 0.0
+
+    def set_visible(self, index, visible):
+        """Skip a view while it can't be seen (e.g. ViewScheduler callback)"""
+        view = self.views[index]
+        if visible and not view.visible:
+            self._read_size(view)
+            view.last = 0.0      # due on the next frame, not after its interval
+        view.visible = visible
+
+    # ============================================================
+    # Scaling thread
+    # ============================================================
+
+    def run(self):
+        # Connected after _show, so it runs once the image was drawn
+        self.frame_ready.connect(self._displayed)
+        while self.active:
+            self.wake.wait(0.5)
+            self.wake.clear()
+            with self.lock:
+                pending, self.pending = self.pending, None
+            if pending is None:
+                continue
+            frame, rgb = pending
+            try:
+                self._fan_out(frame_array(frame), rgb)
+            finally:
+                release_frame(frame)
+        with self.lock:
+            pending, self.pending = self.pending, None
+        if pending is not None:
+            release_frame(pending[0])
+
+    def _fan_out(self, frame, rgb):
+        now = time.time()
+        start = time.perf_counter()
+        self.frames += 1
+        # largest first so smaller views can be made from larger ones
+        due = [(i, v) for i, v in enumerate(self.views)
+               if v.visible and v.size[0] > 0 and v.size[1] > 0 and now - v.last >= v.interval]
+        if not due:
+            return
+        due.sort(key=lambda e: e[1].size[0] * e[1].size[1], reverse=True)
+
+        made = []   # images made for this frame (3 channels), largest first
+        for index, view in due:
+            w, h = view.size
+            shape = (h, w, 4)
+            if view.pool is None or view.pool.shape != shape:
+                view.pool = FramePool(shape, size=3, max_size=4)
+            buf = view.pool.acquire()
+            if buf is None:
+                view.skipped += 1   # GUI hasn't drawn the previous ones yet
+                continue
+
+            src = frame
+            for image in made:
+                if image.shape[1] >= w and image.shape[0] >= h:
+                    src = image
+            small = src if src.shape[:2] == (h, w) else fit(src, w, h)
+            cv2.cvtColor(small, cv2.COLOR_RGB2BGRA if rgb else cv2.COLOR_BGR2BGRA, dst=buf.array)
+            made.append(small)
+
+            view.last = now
+            view.shown += 1
+            view.in_flight.append(buf)
+            self.frame_ready.emit(index, bgrx_qimage(buf.array))
+        self.scale_time += time.perf_counter() - start
+        PIPELINE.add("display scale", time.perf_counter() - start)
+
+    # ============================================================
+    # GUI thread
+    # ============================================================
+
+    def _read_size(self, view):
+        size = view.label.size()
+        view.size = (size.width(), size.height())
+
+    def _show(self, index, qimg):
+        view = self.views[index]
+        view.label.setPixmap(QPixmap.fromImage(qimg))
+        self._read_size(view)   # a resized label gets the new size next frame
+
+    def _displayed(self, index, qimg):
+        view = self.views[index]
+        if view.in_flight:
+            previous, view.on_screen = view.on_screen, view.in_flight.pop(0)
+            release_frame(previous)
+
+    def stop(self):
+        self.active = False
+        self.wake.set()
+        self.quit()
+        self.wait()
+
+    def stats(self):
+        per_frame = 1000 * self.scale_time / self.frames if self.frames else 0.0
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "scale_ms": per_frame,
+            "views": [{"size": v.size, "shown": v.shown, "skipped": v.skipped, "visible": v.visible}
+                      for v in self.views],
+        }
+
+
+def camera_fanouts(labels, sources=(), fps=10, **camera_args):
+    """
+    Fanouts for a main view (every frame) and smaller views (fps each).
+    sources: cameras for labels[1:] (camera_source() text), opened in a
+    MultiCapture with camera_args; labels without one show the main camera.
+    Returns (fanouts, label_views, multi): fanouts[0] takes the main camera's
+    frames, label_views[i] is labels[i]'s (fanout, view index), multi is None
+    without sources. Nothing is started.
+    """
+    sources = list(sources)[:len(labels) - 1]
+    shared = [labels[0]] + list(labels[1 + len(sources):])
+    main = DisplayFanout(shared, [None] + [fps] * (len(shared) - 1))
+    fanouts = [main]
+    label_views = [(main, 0)]
+    multi = MultiCapture(tolerance=0.03) if sources else None
+    for label, source in zip(labels[1:], sources):
+        fanout = DisplayFanout([label], [fps])
+        multi.add(camera_source(source), on_frame=lambda frame, ts, f=fanout: f.submit(frame), **camera_args)
+        fanouts.append(fanout)
+        label_views.append((fanout, 0))
+    label_views += [(main, i) for i in range(1, len(shared))]
+    return fanouts, label_views, multi
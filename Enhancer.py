@@ -0,0 +1,175 @@
+# Enhancer.py - Cheap underwater image enhancement for display and detection
+#
+# Murky water pulls everything towards a blue-green haze: red is weak, the
+# darkest pixels aren't dark and contrast is flat. Every few frames a small
+# (160 px wide) copy of the frame is analysed:
+#   dehaze         dark-channel prior with a single global transmission:
+#                  J = (I - A) / t + A, A = colour of the haziest pixels
+#   white balance  per-channel percentile stretch; gains are capped so a
+#                  nearly empty red channel or a flat scene isn't blown up
+#                  into noise
+#   gamma          brings the mean brightness towards mid-grey
+# Dehaze and white balance are per-channel gain + offset, so together they are
+# one 3x4 colour matrix (cv2.transform); gamma and the contrast curve are one
+# shared 256-entry lookup table. Estimates are smoothed between samples so
+# the picture doesn't flicker.
+#
+# Local contrast is an optional detail boost against a 1/8-size base image:
+# out = I + detail * (I - base).
+#
+# On this kind of machine a single 3-channel cv2.LUT costs several times more
+# than the colour matrix, so only the shared tone curve goes through a LUT.
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_PARAMS = {
+    "sample_every": 15,       # frames between estimates
+    "sample_width": 160,
+    "smoothing": 0.3,         # weight of a new estimate
+    "dehaze": 0.8,            # 0 = off, 1 = full dark-channel correction
+    "white_balance": True,
+    "clip_percent": 1.0,      # percentiles stretched to 0 / 255
+    "max_gain": 3.0,
+    "gamma": True,
+    "target_mean": 0.45,
+    "contrast": 0.15,         # S-curve strength in the tone table
+    "detail": 0.0,            # local contrast, 0 = off (about +4 ms at 1080p)
+}
+
+
+def sample(frame, width):
+    """Small copy of the frame: INTER_AREA halvings, then one linear resize"""
+    small = frame
+    while small.shape[1] >= 2 * width:
+        small = cv2.resize(small, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    scale = width / float(small.shape[1])
+    if scale < 1.0:
+        small = cv2.resize(small, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    return small
+
+
+class Enhancer:
+    def __init__(self, params=None):
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.gain = np.ones(3, np.float32)        # per channel (BGR)
+        self.offset = np.zeros(3, np.float32)
+        self.gamma = 1.0
+        self.matrix = None
+        self.lut = None
+        self.frames = 0
+        self.estimates = 0
+        self.busy = 0.0
+        self.last = 0.0           # seconds the last apply() took
+        self.estimate_time = 0.0
+        self._build()
+
+    # ============================================================
+    # Per frame
+    # ============================================================
+
+    def apply(self, frame, out=None):
+        """Enhanced copy of a BGR frame (into `out` when given)"""
+        start = time.perf_counter()
+        if self.frames % self.params["sample_every"] == 0:
+            self.estimate(frame)
+        self.frames += 1
+
+        out = cv2.transform(frame, self.matrix, dst=out)
+        cv2.LUT(out, self.lut, dst=out)
+        detail = self.params["detail"]
+        if detail > 0:
+            base = sample(out, max(out.shape[1] // 8, 1))
+            base = cv2.resize(base, (out.shape[1], out.shape[0]), interpolation=cv2.INTER_LINEAR)
+            cv2.addWeighted(out, 1.0 + detail, base, -detail, 0, dst=out)
+        self.last = time.perf_counter() - start
+        self.busy += self.last
+        return out
+
+    # ============================================================
+    # Estimation (every sample_every frames, on a small copy)
+    # ============================================================
+
+    def estimate(self, frame):
+        start = time.perf_counter()
+        p = self.params
+        small = sample(frame, p["sample_width"]).reshape(-1, 3).astype(np.float32)
+
+        gain = np.ones(3, np.float32)
+        offset = np.zeros(3, np.float32)
+        if p["dehaze"] > 0:
+            dark = small.min(axis=1)
+            # airlight: mean colour of the haziest 1% (brightest dark channel)
+            haziest = dark >= np.percentile(dark, 99)
+            airlight = np.maximum(small[haziest].mean(axis=0), 1.0)
+            # one transmission for the whole frame from the typical dark channel
+            t = 1.0 - p["dehaze"] * float(np.median((small / airlight).min(axis=1)))
+            t = max(t, 0.35)
+            gain /= t
+            offset = airlight * (1.0 - 1.0 / t)
+            small = small * gain + offset
+
+        if p["white_balance"]:
+            # stretch each channel's percentiles to the full range; a channel
+            # whose gain would pass max_gain is capped and centred instead
+            low = np.percentile(small, p["clip_percent"], axis=0)
+            high = np.percentile(small, 100 - p["clip_percent"], axis=0)
+            scale = 255.0 / np.maximum(high - low, 1.0)
+            cap = p["max_gain"] / gain     # total, including the dehaze gain
+            capped = scale > cap
+            scale = np.minimum(scale, cap)
+            shift = np.where(capped, 127.5 - scale * (low + high) / 2, -scale * low)
+            gain = gain * scale
+            offset = offset * scale + shift
+            small = small * scale + shift
+
+        gamma = 1.0
+        if p["gamma"]:
+            mean = float(np.clip(small.mean(), 1.0, 254.0)) / 255.0
+            gamma = float(np.clip(np.log(p["target_mean"]) / np.log(mean), 0.5, 2.0))
+
+        # smooth towards the new estimate
+        a = p["smoothing"] if self.estimates else 1.0
+        self.gain += a * (gain - self.gain)
+        self.offset += a * (offset - self.offset)
+        self.gamma += a * (gamma - self.gamma)
+        self.estimates += 1
+        self._build()
+        self.estimate_time += time.perf_counter() - start
+
+    def _build(self):
+        """Colour matrix (gain + offset per channel) and the shared tone table"""
+        self.matrix = np.zeros((3, 4), np.float32)
+        self.matrix[[0, 1, 2], [0, 1, 2]] = self.gain
+        self.matrix[:, 3] = self.offset
+
+        x = np.arange(256, dtype=np.float32) / 255.0
+        y = x ** self.gamma
+        c = self.params["contrast"]
+        if c > 0:
+            # smoothstep S-curve blended in by `contrast`
+            y = (1 - c) * y + c * y * y * (3 - 2 * y)
+        self.lut = np.clip(y * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+    # ============================================================
+    # Stats
+    # ============================================================
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "ms": 1000 * self.busy / frames,
+            "estimates": self.estimates,
+            "estimate_ms": 1000 * self.estimate_time / max(self.estimates, 1),
+            "gain": [round(float(g), 2) for g in self.gain],
+            "gamma": round(self.gamma, 2),
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Enhancer: {s['ms']:.2f} ms/frame over {s['frames']} frames, "
+                f"gains B/G/R {s['gain']}, gamma {s['gamma']}")
@@ -0,0 +1,103 @@
+# FaultySource.py - Fake camera that misbehaves on purpose
+#
+# Opened through open_capture() with a fake:// URL, e.g.
+#   fake://?fail=0.05&stall_every=200&stall=4&drop_every=500&down=3
+# fail         probability that a single read fails
+# stall_every  every N frames the camera hangs inside read() for `stall` seconds
+# drop_every   every N frames the "cable is pulled": reads fail and reopening
+#              fails for `down` seconds
+# video        play a file instead of synthetic frames
+# fps, width, height  for synthetic frames
+import random
+import time
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+
+# when each fake camera comes back after a pulled cable, shared between reopens
+_down_until = {}
+
+
+class FaultySource:
+    def __init__(self, url):
+        self.url = url
+        query = {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+        self.fail = float(query.get("fail", 0))
+        self.stall_every = int(query.get("stall_every", 0))
+        self.stall = float(query.get("stall", 3))
+        self.drop_every = int(query.get("drop_every", 0))
+        self.down = float(query.get("down", 3))
+        self.fps = float(query.get("fps", 30))
+        self.width = int(query.get("width", 640))
+        self.height = int(query.get("height", 480))
+        self.video = query.get("video")
+
+        self.frames = 0
+        self.connected = time.time() >= _down_until.get(url, 0)
+        self.next_time = time.time()
+        self.cap = cv2.VideoCapture(self.video) if self.video and self.connected else None
+
+    def isOpened(self):
+        return self.connected
+
+    def read(self, image=None):
+        if not self.connected:
+            time.sleep(0.01)
+            return False, None
+
+        self.next_time += 1.0 / self.fps
+        sleep = self.next_time - time.time()
+        if sleep > 0:
+            time.sleep(sleep)
+        else:
+            self.next_time = time.time()
+
+        self.frames += 1
+        if self.drop_every and self.frames % self.drop_every == 0:
+            _down_until[self.url] = time.time() + self.down
+            self.connected = False
+            return False, None
+        if self.stall_every and self.frames % self.stall_every == 0:
+            time.sleep(self.stall)
+            self.next_time = time.time()
+        if self.fail and random.random() < self.fail:
+            return False, None
+
+        frame = self._frame()
+        if image is not None and image.shape == frame.shape:
+            image[...] = frame
+            return True, image
+        return True, frame
+
+    def _frame(self):
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+            if ret:
+                return frame
+        frame = np.zeros((self.height, self.width, 3), np.uint8)
+        cv2.putText(frame, f"fake {self.frames}", (20, self.height // 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 3)
+        return frame
+
+    def get(self, prop):
+        if self.cap is not None and prop != cv2.CAP_PROP_FPS:
+            return self.cap.get(prop)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.connected = False
+        if self.cap is not None:
+            self.cap.release()
@@ -0,0 +1,95 @@
+# FrameImage.py - Getting BGR frames on screen without hidden conversions
+#
+# Qt's raster paint engine works in Format_RGB32, which on little-endian
+# machines is B, G, R, X in memory: OpenCV's BGR order with a pad byte.
+# Widening BGR to BGRX is a plain byte shuffle (no channel swap) and the
+# resulting image goes through QPixmap.fromImage without any conversion.
+# Every other format is converted inside fromImage on the GUI thread -
+# including Format_BGR888 (Qt 5.14+), which takes a slow generic path there
+# (see benchmarks/bench_bgr_display.py).
+#
+# A QImage made from a NumPy buffer doesn't own the memory, and a queued
+# signal only copies the QImage header. A pixmap made from a Format_RGB32
+# image even keeps pointing at the same memory. So whoever emits one keeps the
+# buffer in DisplayBuffers until the GUI has drawn the *next* image (the label
+# has let go of the pixmap by then) and only then releases it: no defensive
+# copy per frame. DisplayBuffers is a QObject created on the GUI thread, so
+# the signal reaches its displayed() slot queued, behind the GUI's own slots;
+# a plain object's method would run on the emitting thread at emit time.
+from collections import deque
+
+import cv2
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QImage
+
+from FramePool import FramePool, frame_array, release_frame, retain_frame
+
+BGR_NATIVE = hasattr(QImage, "Format_BGR888")
+
+
+def bgrx_qimage(array):
+    """QImage over an (h, w, 4) BGRX array, no copy (only while the array is alive)"""
+    h, w = array.shape[:2]
+    return QImage(array.data, w, h, array.strides[0], QImage.Format_RGB32)
+
+
+def bgr_qimage(array):
+    """QImage over a BGR array, no copy; needs BGR_NATIVE"""
+    h, w = array.shape[:2]
+    return QImage(array.data, w, h, array.strides[0], QImage.Format_BGR888)
+
+
+def rgb_qimage(array):
+    """QImage over an RGB array, no copy"""
+    h, w = array.shape[:2]
+    return QImage(array.data, w, h, array.strides[0], QImage.Format_RGB888)
+
+
+class DisplayBuffers(QObject):
+    """
+    Owns the buffers behind emitted QImages. Create it on the GUI thread (e.g.
+    in a QThread's __init__). The emitting thread calls image(frame) and emits
+    the result; displayed() must be connected to the same signal after the
+    GUI's slots (so it runs once the image was drawn); it releases the buffer
+    of the image shown before.
+    """
+
+    def __init__(self, max_in_flight=4, direct=False):
+        """
+        direct: hand the BGR buffer itself to Qt (Format_BGR888, nothing to do
+        in this thread, but fromImage converts on the GUI thread); by default
+        frames are widened into pooled BGRX buffers
+        """
+        super().__init__()
+        self.max_in_flight = max_in_flight
+        self.direct = direct and BGR_NATIVE
+        self.in_flight = deque()
+        self.on_screen = None     # buffer of the image drawn last, the label's pixmap uses it
+        self.pool = None
+
+    def image(self, frame, rgb=False):
+        """QImage for a BGR (or rgb=True: RGB) frame, ndarray or PooledFrame,
+        or None if the GUI is behind"""
+        if len(self.in_flight) >= self.max_in_flight:
+            return None   # skip this frame rather than queue it
+        bgr = frame_array(frame)
+        if self.direct and not rgb:
+            self.in_flight.append(retain_frame(frame))
+            return bgr_qimage(bgr)
+
+        shape = bgr.shape[:2] + (4,)
+        if self.pool is None or self.pool.shape != shape:
+            # first frame or the camera changed resolution
+            self.pool = FramePool(shape, size=3, max_size=self.max_in_flight + 1)
+        bgrx = self.pool.acquire()
+        if bgrx is None:
+            return None
+        cv2.cvtColor(bgr, cv2.COLOR_RGB2BGRA if rgb else cv2.COLOR_BGR2BGRA, dst=bgrx.array)
+        self.in_flight.append(bgrx)
+        return bgrx_qimage(bgrx.array)
+
+    def displayed(self, *args):
+        """GUI thread: the oldest emitted image has been drawn"""
+        if self.in_flight:
+            previous, self.on_screen = self.on_screen, self.in_flight.popleft()
+            release_frame(previous)
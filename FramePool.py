@@ -0,0 +1,120 @@
+# FramePool.py - Recycled, preallocated frame buffers with reference counting
+#
+# Capture reads straight into a pooled buffer (cap.read(buf.array)) and color
+# conversion writes into another one (cv2.cvtColor(..., dst=buf.array)), so in
+# steady state no frame memory is allocated at all. Whoever keeps a frame
+# (display, recorder, freeze) calls retain(), and release() when done; the
+# buffer goes back to the pool when the last reference is released.
+#
+# FrameQueue hands frames to a writer thread and is bounded by the memory the
+# queued frames hold, not their count: 120 frames are 750 MB at 1080p.
+import queue
+import threading
+
+import numpy as np
+
+
+class PooledFrame:
+    def __init__(self, pool, array):
+        self.pool = pool
+        self.array = array
+        self.refs = 0
+
+    def retain(self):
+        with self.pool.lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.pool.lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            self.refs = 0
+            if self.pool.shape == self.array.shape:
+                self.pool.free.append(self)
+
+
+class FramePool:
+    def __init__(self, shape, dtype=np.uint8, size=4, max_size=32):
+        """
+        size: buffers allocated up front
+        max_size: the pool grows up to this when every buffer is in use,
+                  after that acquire() returns None
+        """
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.free = [PooledFrame(self, np.empty(self.shape, dtype)) for _ in range(size)]
+        self.allocated = size
+        self.misses = 0
+
+    def acquire(self):
+        """Get a free buffer with one reference, or None if the pool is exhausted"""
+        with self.lock:
+            if self.free:
+                item = self.free.pop()
+            elif self.allocated < self.max_size:
+                item = PooledFrame(self, np.empty(self.shape, self.dtype))
+                self.allocated += 1
+            else:
+                self.misses += 1
+                return None
+            item.refs = 1
+            return item
+
+    def matches(self, array):
+        return array is not None and array.shape == self.shape and array.dtype == self.dtype
+
+    def stats(self):
+        with self.lock:
+            return {"allocated": self.allocated, "free": len(self.free), "misses": self.misses}
+
+
+def frame_array(frame):
+    """The NumPy array behind a frame that may or may not be pooled"""
+    return frame.array if isinstance(frame, PooledFrame) else frame
+
+
+def retain_frame(frame):
+    """Take another reference if the frame is pooled; returns the frame"""
+    if isinstance(frame, PooledFrame):
+        frame.retain()
+    return frame
+
+
+def release_frame(frame):
+    if isinstance(frame, PooledFrame):
+        frame.release()
+
+
+class FrameQueue:
+    """Queue of (frame, ...) items bounded by the bytes of the queued frames"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+
+    def put(self, frame, *rest):
+        """False if the frame doesn't fit; an empty queue always takes one frame"""
+        size = frame_array(frame).nbytes
+        with self.lock:
+            if self.bytes and self.bytes + size > self.max_bytes:
+                return False
+            self.bytes += size
+        self.queue.put((frame,) + rest)
+        return True
+
+    def close(self):
+        """get() returns None once the frames before it are taken"""
+        self.queue.put(None)
+
+    def get(self):
+        item = self.queue.get()
+        if item is not None:
+            with self.lock:
+                self.bytes -= frame_array(item[0]).nbytes
+        return item
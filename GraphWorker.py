@@ -18,6 +18,9 @@ class GraphWorker(QThread):
         # For FPS calculation
         self.last_time = time.time()
         self.update_interval_ms = update_interval_ms
+        # the GUI redraws on every emit; QualityGovernor can space them out
+        self.emit_interval = 0.0
+        self.last_emit = 0.0
 
     def run(self):
         self.timer = QTimer()
@@ -62,7 +65,12 @@ class GraphWorker(QThread):
             }
         }
 
-        self.graph_data_ready.emit(graph_payload)
+        if now - self.last_emit >= self.emit_interval:
+            self.last_emit = now
+            self.graph_data_ready.emit(graph_payload)
+
+    def set_emit_interval(self, seconds):
+        self.emit_interval = seconds
 
     def stop(self):
         if self.timer:
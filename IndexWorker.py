@@ -0,0 +1,65 @@
+# IndexWorker.py - Media index updates and queries off the GUI thread
+#
+# Hashing new files and answering "similar"/"duplicates" both take long on a
+# large index (clusters() looks up every hash, similar() on a file that isn't
+# indexed yet hashes the whole video), so the GUI only asks and gets the
+# answer by signal. A query interrupts a running update; the files it didn't
+# get to are picked up right after the answer.
+import queue
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class IndexWorker(QThread):
+    """Keeps the media index up to date and answers queries in the background"""
+    progress = pyqtSignal(int, int)
+    updated = pyqtSignal()                   # files were hashed or forgotten
+    similar_ready = pyqtSignal(str, list)    # path, [(path, frame, distance)]
+    clusters_ready = pyqtSignal(list)        # [[path, ...], ...]
+
+    def __init__(self, index, folders, interval=10.0):
+        super().__init__()
+        self.index = index
+        self.folders = folders
+        self.interval = interval
+        self.queries = queue.Queue()
+        self.active = True
+
+    def find_similar(self, path, radius=6):
+        self.queries.put(("similar", path, radius))
+
+    def find_duplicates(self, radius=3):
+        self.queries.put(("clusters", radius))
+
+    def run(self):
+        next_update = 0.0
+        while self.active:
+            try:
+                query = self.queries.get(timeout=min(max(next_update - time.time(), 0.0), 0.5))
+            except queue.Empty:
+                query = None
+            if not self.active:
+                break
+            if query is not None:
+                self._answer(query)
+            elif time.time() >= next_update:
+                stop = lambda: not self.active or not self.queries.empty()
+                if self.index.update(self.folders, self.progress.emit, stop):
+                    self.updated.emit()
+                # interrupted by a query: carry on once it's answered
+                next_update = time.time() + (0.0 if not self.queries.empty() else self.interval)
+
+    def _answer(self, query):
+        try:
+            if query[0] == "similar":
+                self.similar_ready.emit(query[1], self.index.similar(query[1], query[2]))
+            else:
+                self.clusters_ready.emit(self.index.clusters(query[1]))
+        except Exception as e:
+            print(f"Media index query failed: {e}")
+
+    def stop(self):
+        self.active = False
+        self.queries.put(None)
+        self.wait()
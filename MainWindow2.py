@@ -1,9 +1,10 @@
 import sys
 import os
+from datetime import datetime
 from PyQt5 import uic
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QListWidgetItem
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import QUrl
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QListWidgetItem, QLabel, QMenu, QCheckBox
+from PyQt5.QtGui import QPixmap, QColor
+from PyQt5.QtCore import QUrl, Qt, QTimer
 from PyQt5.QtGui import QDesktopServices
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -11,6 +12,25 @@ from Threads.CameraDisplay import CameraWorker
 from Threads.GraphWorker import GraphWorker
 from Threads.Tableworker import TableWorker
 from Threads.ObjectDetectionWorker import ObjectDetectionWorker
+from Threads.ProcessCapture import SharedCameraWorker
+from Threads.AlarmEngine import format_alarm
+from Threads.StallMonitor import install_stall_monitor
+from Threads.DetectionOverlay import overlay_pixmap
+from Threads.MediaIndex import MediaIndex
+from Threads.IndexWorker import IndexWorker
+from Threads.DisplayFanout import camera_fanouts
+from Threads.Enhancer import Enhancer
+from Threads.PipelineStats import PIPELINE
+from Threads.ViewScheduler import ViewScheduler
+from Threads.QualityGovernor import QualityGovernor, Knob
+
+# Capture each camera in its own process and pass frames through shared memory
+USE_PROCESS_CAPTURE = os.environ.get("ROV_PROCESS_CAPTURE") == "1"
+# Record every frame losslessly (RawCapture), compressed after recording stops
+USE_RAW_RECORDING = os.environ.get("ROV_RAW_RECORDING") == "1"
+# Cameras for the two small views, e.g. ROV_EXTRA_CAMERAS="1,2" (indexes, URLs
+# or video files); views without one show the main camera
+EXTRA_CAMERAS = [s for s in os.environ.get("ROV_EXTRA_CAMERAS", "").split(",") if s.strip()]
 
 
 # Matplotlib canvas for graph
@@ -33,6 +53,8 @@ class MainWindow(QMainWindow):
         self.canvas = MplCanvas(self, width=5, height=4, dpi=100)
         self.graph_layout.addWidget(self.canvas)
 
+        self.graph_data = None       # newest data, drawn when the graph is visible
+        self.graph_visible = True
         self.graph_worker = GraphWorker()
         self.graph_worker.graph_data_ready.connect(self.update_graph)
         self.graph_worker.start()
@@ -43,37 +65,109 @@ class MainWindow(QMainWindow):
         self.camera_workers = []
         self.camera_labels = [self.MainCamera, self.Camera2, self.Camera3]
         # Use only one CameraWorker for the real camera
-        worker = CameraWorker(camera_index=0)
-        # Send the same frame to all 3 labels
-        worker.image_data.connect(lambda qimg: [self.update_camera_display(idx, qimg) for idx in range(3)])
+        if USE_PROCESS_CAPTURE:
+            worker = SharedCameraWorker(camera_index=0)
+        else:
+            worker = CameraWorker(camera_index=0)
+        # Every label gets the frame scaled to its size (main view at the
+        # camera rate, the other two at 10 fps). The extra cameras run in a
+        # MultiCapture, which also lines them up with the main one for
+        # synchronized snapshots; views without one show the main camera.
+        self.display_fanouts, self.label_views, self.multi_capture = camera_fanouts(
+            self.camera_labels, EXTRA_CAMERAS, on_status=worker.status_changed.emit)
+        if self.multi_capture is not None and getattr(worker, "core", None) is not None:
+            self.multi_capture.attach(worker.core)   # not with process capture
+        for fanout in self.display_fanouts:
+            fanout.start()
+        worker.fanout = self.display_fanouts[0]
+        if USE_RAW_RECORDING:
+            worker.record_container = "raw"
         worker.file_saved.connect(self.add_file_to_list)
+        worker.status_changed.connect(self.update_camera_status)
         worker.start()
         self.camera_workers.append(worker)
-        # for i in range(3):
-        #     worker = CameraWorker(camera_index=0)
-        #     worker.image_data.connect(lambda qimg, idx=0: self.update_camera_display(idx, qimg))
-        #     worker.file_saved.connect(self.add_file_to_list)
-        #     worker.start()
-        #     self.camera_workers.append(worker)
+        self.camera_status = {}
+        if self.multi_capture is not None:
+            self.multi_capture.start()
 
         self.freezeBtn.clicked.connect(self.freeze_camera)
         self.captureBtn.clicked.connect(self.capture_frame)
         self.recordBtn.clicked.connect(self.toggle_recording)
 
+        # murky-water enhancement for the live view and detection
+        self.enhance_box = QCheckBox("Enhance")
+        self.enhance_box.toggled.connect(self.toggle_enhance)
+        self.statusBar().addPermanentWidget(self.enhance_box)
+        # per-stage timings (enhance, display, detection) in the status bar
+        self.pipeline_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.pipeline_label)
+        self.pipeline_timer = QTimer(self)
+        self.pipeline_timer.timeout.connect(
+            lambda: self.pipeline_label.setText(f"{PIPELINE.summary()}   {self.governor.summary()}"
+                                                + (f"   {self.multi_capture.summary()}" if self.multi_capture else "")))
+        self.pipeline_timer.start(2000)
+
         # ======================================================
         # Table setup
         # ======================================================
+        self.table_data = None
+        self.table_visible = True
         self.table_worker = TableWorker()
         self.table_worker.data_ready.connect(self.update_table)
+        self.table_worker.alarms_changed.connect(self.update_alarms)
+        self.active_alarms = []
+        self.alarm_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.alarm_label)
         self.table_worker.start()
 
         # File system
         self.load_existing_files()
         self.fileListWidget.itemDoubleClicked.connect(self.open_file)
+        # right click: similar frames / duplicate clusters from the hash index
+        self.media_index = MediaIndex()
+        self.index_worker = IndexWorker(self.media_index, ["captured_images", "recorded_videos"])
+        self.index_worker.similar_ready.connect(self.list_similar)
+        self.index_worker.clusters_ready.connect(self.list_duplicates)
+        self.index_worker.updated.connect(self.refresh_index_view)
+        self.index_query = None      # what the file list shows, None for all files
+        self.index_worker.start()
+        self.fileListWidget.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.fileListWidget.customContextMenuRequested.connect(self.file_list_menu)
         self.od_worker = None
+        self.od_result = None
+        self.od_visible = True
         self.odStartBtn.clicked.connect(self.start_od_detection)
         self.load_od_files()
 
+        # ======================================================
+        # Views on hidden tabs or in a minimized window aren't drawn;
+        # capture, recording, telemetry and alarms keep running
+        # ======================================================
+        self.views = ViewScheduler(self)
+        for i, label in enumerate(self.camera_labels):
+            fanout, index = self.label_views[i]
+            self.views.register(f"camera {i}", label,
+                                lambda visible, f=fanout, index=index: f.set_visible(index, visible))
+        self.views.register("graph", self.canvas, self.set_graph_visible)
+        self.views.register("table", self.tableWidget, self.set_table_visible)
+        self.views.register("detection", self.odDisplayLabel, self.set_od_visible)
+
+        # ======================================================
+        # Under CPU overload give up graph rate, thumbnail refresh, then
+        # detection rate and resolution; recording and the main view keep
+        # their frame rate
+        # ======================================================
+        self.governor = QualityGovernor([
+            Knob("graph interval", [0, 2, 5], self.graph_worker.set_emit_interval),
+            Knob("thumbnail fps", [10, 5, 2], self.set_thumbnail_fps),
+            Knob("detect every", [1, 2, 4], lambda n: self.od_worker and self.od_worker.set_detect_every(n)),
+            Knob("detect scale", [1.0, 0.75, 0.5], lambda s: self.od_worker and self.od_worker.set_detect_scale(s)),
+        ], budgets={"od detect": 40, "od detect+track": 40, "display scale": 15},
+            log_path="quality.log").start()
+
+        # logs what blocks the GUI thread, Ctrl+Shift+P records a profile
+        install_stall_monitor(self)
+
     # ============================================================
     # Camera
     # ============================================================
@@ -83,6 +177,12 @@ class MainWindow(QMainWindow):
         label = self.camera_labels[idx]
         label.setPixmap(QPixmap.fromImage(qimg))
 
+    def update_camera_status(self, text):
+        """Show the health of every camera in the status bar"""
+        name = text.split(":")[0]
+        self.camera_status[name] = text
+        self.statusBar().showMessage("   |   ".join(self.camera_status.values()))
+
     def freeze_camera(self):
         cam = self.camera_workers[0]
         cam.toggle_freeze()
@@ -90,6 +190,21 @@ class MainWindow(QMainWindow):
 
     def capture_frame(self):
         self.camera_workers[0].capture_frame()
+        if self.multi_capture is not None:
+            # the newest aligned set as well, one image per camera
+            prefix = f"set_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            for path in self.multi_capture.snapshot(self.camera_workers[0].image_folder, prefix):
+                self.add_file_to_list(path)
+
+    def toggle_enhance(self, on):
+        for worker in self.camera_workers:
+            core = getattr(worker, "core", None)   # not available with process capture
+            if core is not None:
+                core.enhancer = Enhancer() if on else None
+
+    def set_thumbnail_fps(self, fps):
+        for fanout, index in self.label_views[1:]:
+            fanout.set_fps(index, fps)
 
     def toggle_recording(self):
         cam = self.camera_workers[0]
@@ -109,6 +224,16 @@ class MainWindow(QMainWindow):
     # ============================================================
 
     def update_graph(self, data):
+        self.graph_data = data
+        if self.graph_visible:
+            self.draw_graph(data)
+
+    def set_graph_visible(self, visible):
+        self.graph_visible = visible
+        if visible and self.graph_data is not None:
+            self.draw_graph(self.graph_data)
+
+    def draw_graph(self, data):
         """Draw graph using worker-processed FPS data."""
         style = data["style"]
 
@@ -148,14 +273,46 @@ class MainWindow(QMainWindow):
     # ============================================================
 
     def update_table(self, sensor_data):
+        self.table_data = sensor_data
+        if self.table_visible:
+            self.fill_table(sensor_data)
+
+    def set_table_visible(self, visible):
+        self.table_visible = visible
+        if visible and self.table_data is not None:
+            self.fill_table(self.table_data)
+
+    def fill_table(self, sensor_data):
         """Update 3x3 table with sensor data"""
         self.tableWidget.setRowCount(len(sensor_data))
         self.tableWidget.setColumnCount(3)
         self.tableWidget.setHorizontalHeaderLabels(["Depth (m)", "Temperature (°C)", "Battery (%)"])
 
+        # cells with an active alarm are highlighted
+        alarmed = {}
+        for alarm in self.active_alarms:
+            alarmed.setdefault(alarm["channel"], []).append(format_alarm(alarm))
+
         for row_index, row_data in enumerate(sensor_data):
             for col_index, value in enumerate(row_data):
-                self.tableWidget.setItem(row_index, col_index, QTableWidgetItem(str(value)))
+                item = QTableWidgetItem(str(value))
+                channel = f"{self.table_worker.sensor_labels[row_index]}/{self.table_worker.fields[col_index]}"
+                if channel in alarmed:
+                    item.setBackground(QColor("#c62828"))
+                    item.setToolTip("\n".join(alarmed[channel]))
+                self.tableWidget.setItem(row_index, col_index, item)
+
+    def update_alarms(self, changes, active):
+        """Show raised alarms in the status bar"""
+        self.active_alarms = active
+        for alarm in changes:
+            state = "ALARM" if alarm["active"] else "cleared"
+            print(f"{state}: {format_alarm(alarm)}")
+        if active:
+            self.alarm_label.setText("⚠ " + "; ".join(format_alarm(a) for a in active))
+            self.alarm_label.setStyleSheet("color: #ff5252; font-weight: bold;")
+        else:
+            self.alarm_label.setText("")
     # ============================================================
     # File Handling
     # ============================================================
@@ -204,8 +361,74 @@ class MainWindow(QMainWindow):
     def open_file(self, item):
         """Open file when double-clicked"""
         filepath = item.data(256)
-        if os.path.exists(filepath):
+        if filepath and os.path.exists(filepath):
             QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.abspath(filepath)))
+
+    def file_list_menu(self, pos):
+        menu = QMenu(self)
+        item = self.fileListWidget.itemAt(pos)
+        similar = menu.addAction("Find similar") if item is not None and item.data(256) else None
+        duplicates = menu.addAction("Show duplicates")
+        show_all = menu.addAction("Show all files")
+        chosen = menu.exec_(self.fileListWidget.mapToGlobal(pos))
+        if chosen is None:
+            return
+        if chosen is similar:
+            self.show_similar(item.data(256))
+        elif chosen is duplicates:
+            self.show_duplicates()
+        elif chosen is show_all:
+            self.index_query = None
+            self.load_existing_files()
+
+    def show_similar(self, filepath):
+        """Ask the index worker for the files that look like filepath"""
+        self.index_query = ("similar", filepath)
+        self.fileListWidget.clear()
+        self.fileListWidget.addItem(f"Searching for files like {os.path.basename(filepath)}...")
+        self.index_worker.find_similar(filepath)
+
+    def show_duplicates(self):
+        """Ask the index worker for the near-duplicate clusters"""
+        self.index_query = ("duplicates",)
+        self.fileListWidget.clear()
+        self.fileListWidget.addItem("Searching for duplicates...")
+        self.index_worker.find_duplicates()
+
+    def refresh_index_view(self):
+        """New files were indexed: run the query on screen again"""
+        if self.index_query is None:
+            return
+        if self.index_query[0] == "similar":
+            self.index_worker.find_similar(self.index_query[1])
+        else:
+            self.index_worker.find_duplicates()
+
+    def list_similar(self, filepath, results):
+        """List the files that look like filepath, closest first"""
+        if self.index_query != ("similar", filepath):
+            return      # the list shows something else by now
+        self.fileListWidget.clear()
+        self.fileListWidget.addItem(f"Similar to {os.path.basename(filepath)} ({len(results)})")
+        for path, frame, dist in results:
+            where = f" @ frame {frame}" if frame >= 0 else ""
+            item = QListWidgetItem(f"   {os.path.basename(path)}{where}  (distance {dist})")
+            item.setData(256, path)
+            self.fileListWidget.addItem(item)
+
+    def list_duplicates(self, groups):
+        """List near-duplicate files grouped by cluster"""
+        if self.index_query != ("duplicates",):
+            return
+        self.fileListWidget.clear()
+        self.fileListWidget.addItem(f"{len(groups)} duplicate groups")
+        for n, group in enumerate(groups, 1):
+            self.fileListWidget.addItem(f"Group {n} ({len(group)} files)")
+            for path in group:
+                item = QListWidgetItem(f"   {os.path.basename(path)}")
+                item.setData(256, path)
+                self.fileListWidget.addItem(item)
+
 # Keep a reference to the worker so it doesn't get garbage collected
     
 
@@ -242,12 +465,32 @@ class MainWindow(QMainWindow):
             self.od_worker = None
 
         # Start new worker
-        self.od_worker = ObjectDetectionWorker(filepath)
-        self.od_worker.image_data.connect(
-            lambda qimg: self.odDisplayLabel.setPixmap(QPixmap.fromImage(qimg))
-        )
+        self.od_worker = ObjectDetectionWorker(filepath, enhance=self.enhance_box.isChecked(),
+                                               detect_threads=os.cpu_count() or 1)
+        self.od_worker.visible = self.od_visible
+        # start at the quality the governor settled on
+        if self.governor.value("detect every") > 1:
+            self.od_worker.set_detect_every(self.governor.value("detect every"))
+        if self.governor.value("detect scale") < 1.0:
+            self.od_worker.set_detect_scale(self.governor.value("detect scale"))
+        self.od_result = None
+        self.od_worker.detections.connect(self.update_od_result)
+        self.od_worker.image_data.connect(self.update_od_display)
         self.od_worker.start()
 
+    def set_od_visible(self, visible):
+        self.od_visible = visible
+        if self.od_worker is not None:
+            self.od_worker.visible = visible
+
+    def update_od_result(self, result):
+        # arrives right before the frame it belongs to
+        self.od_result = result
+
+    def update_od_display(self, qimg):
+        """Show the frame with the detections drawn at label size"""
+        self.odDisplayLabel.setPixmap(overlay_pixmap(qimg, self.od_result, self.odDisplayLabel.size()))
+
 
 
 
@@ -259,10 +502,17 @@ class MainWindow(QMainWindow):
         # Stop all cameras
         for worker in self.camera_workers:
             worker.stop()
+        if self.multi_capture is not None:
+            self.multi_capture.stop()
+        for fanout in self.display_fanouts:
+            fanout.stop()
+        self.governor.stop()
 
         # Stop graph + table workers
         self.graph_worker.stop()
         self.table_worker.stop()
+        self.stall_monitor.stop()
+        self.index_worker.stop()
 
         event.accept()
 
@@ -0,0 +1,337 @@
+# MediaIndex.py - Perceptual hashes of captured images and video frames
+#
+# Every image (and a frame every `video_step` seconds of every video) gets a
+# 64-bit difference hash (dHash): similar looking frames have hashes that differ
+# in few bits, whatever the resolution or JPEG quality.
+#
+# Lookup uses multi-index hashing: the hash is split into 8 bytes and each
+# byte value has a bucket of entries. Two hashes within Hamming distance r <= 7
+# share at least one byte exactly (pigeonhole), so only entries in the 8
+# matching buckets are compared instead of the whole index.
+#
+# The index lives in one .npz file (hashes, file ids, frame numbers and the
+# file list with mtime/size so unchanged files aren't hashed again). The GUI
+# updates and queries it through IndexWorker, off the GUI thread.
+#
+#   python MediaIndex.py update captured_images recorded_videos files
+#   python MediaIndex.py similar captured_images/cam0_capture_20250101_120000.jpg
+#   python MediaIndex.py duplicates
+#   python MediaIndex.py dedupe captured_images --apply
+import argparse
+import os
+import shutil
+import threading
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+BANDS = 8
+MAX_RADIUS = BANDS - 1
+
+# number of set bits for every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image):
+    """64-bit difference hash of a BGR or grey image"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(hashes, h):
+    """Bit distance between every hash in an array and h"""
+    x = np.bitwise_xor(hashes, np.uint64(h))
+    return _POPCOUNT[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def sharpness(path):
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    return cv2.Laplacian(image, cv2.CV_64F).var() if image is not None else 0.0
+
+
+class MediaIndex:
+    def __init__(self, path="media_index.npz", video_step=2.0, max_video_frames=200):
+        self.path = path
+        self.video_step = video_step
+        self.max_video_frames = max_video_frames
+        self.files = []           # [path, mtime, size]
+        self.hashes = np.zeros(0, np.uint64)
+        self.file_ids = np.zeros(0, np.int32)
+        self.frames = np.zeros(0, np.int32)   # -1 for images
+        self.buckets = None
+        # the background indexer changes the arrays while the GUI queries them
+        self.lock = threading.RLock()
+        if os.path.exists(path):
+            self.load()
+
+    # ============================================================
+    # Storage
+    # ============================================================
+
+    def load(self):
+        try:
+            data = np.load(self.path)
+            self.files = [[str(p), float(m), int(s)] for p, m, s in
+                          zip(data["paths"], data["mtimes"], data["sizes"])]
+            self.hashes = data["hashes"]
+            self.file_ids = data["file_ids"]
+            self.frames = data["frames"]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Media index {self.path} unreadable, rebuilding: {e}")
+            self.files = []
+        self.buckets = None
+
+    def save(self):
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp,
+                 paths=np.array([f[0] for f in self.files], dtype=str),
+                 mtimes=np.array([f[1] for f in self.files], dtype=np.float64),
+                 sizes=np.array([f[2] for f in self.files], dtype=np.int64),
+                 hashes=self.hashes, file_ids=self.file_ids, frames=self.frames)
+        os.replace(tmp, self.path)
+
+    # ============================================================
+    # Indexing
+    # ============================================================
+
+    def scan(self, folders):
+        """Paths of all media files in folders that aren't indexed or changed"""
+        known = {f[0]: (f[1], f[2]) for f in self.files}
+        found, todo = set(), []
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                    continue
+                path = os.path.join(folder, filename)
+                st = os.stat(path)
+                found.add(path)
+                if known.get(path) != (st.st_mtime, st.st_size):
+                    todo.append(path)
+        removed = [f[0] for f in self.files if f[0] not in found
+                   and any(os.path.dirname(f[0]) == os.path.normpath(d) for d in folders)]
+        return todo, removed
+
+    def hash_file(self, path):
+        """[(frame, hash)] for an image (frame -1) or sampled video frames"""
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+            return [(-1, dhash(image))] if image is not None else []
+
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, int(round(fps * self.video_step)))
+        if total > 0:
+            step = max(step, total // self.max_video_frames)
+        out = []
+        index = 0
+        while len(out) < self.max_video_frames:
+            # grab() skips decoding of the frames in between
+            if not cap.grab():
+                break
+            if index % step == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    out.append((index, dhash(frame)))
+            index += 1
+        cap.release()
+        return out
+
+    def add(self, path, entries):
+        with self.lock:
+            self._add(path, entries)
+
+    def _add(self, path, entries):
+        self.remove([path])
+        st = os.stat(path)
+        self.files.append([path, st.st_mtime, st.st_size])
+        file_id = len(self.files) - 1
+        if entries:
+            self.hashes = np.concatenate([self.hashes, np.array([h for _, h in entries], np.uint64)])
+            self.file_ids = np.concatenate([self.file_ids, np.full(len(entries), file_id, np.int32)])
+            self.frames = np.concatenate([self.frames, np.array([f for f, _ in entries], np.int32)])
+        self.buckets = None
+
+    def remove(self, paths):
+        with self.lock:
+            self._remove(paths)
+
+    def _remove(self, paths):
+        paths = set(paths)
+        drop = {i for i, f in enumerate(self.files) if f[0] in paths}
+        if not drop:
+            return
+        keep = np.isin(self.file_ids, list(drop), invert=True)
+        # renumber file ids after dropping files
+        new_id = np.cumsum([0] + [0 if i in drop else 1 for i in range(len(self.files))])[:-1]
+        self.hashes, self.frames = self.hashes[keep], self.frames[keep]
+        self.file_ids = new_id[self.file_ids[keep]].astype(np.int32)
+        self.files = [f for i, f in enumerate(self.files) if i not in drop]
+        self.buckets = None
+
+    def update(self, folders, progress=None, should_stop=None):
+        """Hash new/changed files, forget deleted ones; returns files hashed"""
+        todo, removed = self.scan(folders)
+        self.remove(removed)
+        for i, path in enumerate(todo):
+            if should_stop is not None and should_stop():
+                break
+            try:
+                self.add(path, self.hash_file(path))
+            except (OSError, cv2.error) as e:
+                print(f"Cannot index {path}: {e}")
+            if progress is not None:
+                progress(i + 1, len(todo))
+        if todo or removed:
+            with self.lock:
+                self.save()
+        return len(todo)
+
+    # ============================================================
+    # Queries
+    # ============================================================
+
+    def _build_buckets(self):
+        band_values = self.hashes.view(np.uint8).reshape(-1, BANDS) if len(self.hashes) else \
+            np.zeros((0, BANDS), np.uint8)
+        self.buckets = []
+        for band in range(BANDS):
+            values = band_values[:, band]
+            order = np.argsort(values, kind="stable")
+            starts = np.searchsorted(values[order], np.arange(257))
+            self.buckets.append((order, starts))
+
+    def candidates(self, h):
+        """Entries sharing at least one byte with h"""
+        if self.buckets is None:
+            self._build_buckets()
+        bytes_ = np.array([h], np.uint64).view(np.uint8)
+        found = [order[starts[b]:starts[b + 1]] for (order, starts), b in zip(self.buckets, bytes_)]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, np.intp)
+
+    def near(self, h, radius=6):
+        """[(entry, distance)] within `radius` bits of h, closest first"""
+        radius = min(radius, MAX_RADIUS)
+        ids = self.candidates(h)
+        if len(ids) == 0:
+            return []
+        dist = hamming(self.hashes[ids], h)
+        hit = dist <= radius
+        return sorted(zip(ids[hit].tolist(), dist[hit].tolist()), key=lambda e: e[1])
+
+    def entry(self, i):
+        """(path, frame) of an index entry"""
+        return self.files[self.file_ids[i]][0], int(self.frames[i])
+
+    def similar(self, path, radius=6):
+        """[(path, frame, distance)] similar to any indexed frame of path"""
+        with self.lock:
+            ids = [i for i, f in enumerate(self.files) if f[0] == path]
+            hashes = self.hashes[self.file_ids == ids[0]] if ids else None
+        if hashes is None:
+            # not indexed yet: hash it without holding up the indexer
+            hashes = [h for _, h in self.hash_file(path)]
+        with self.lock:
+            return self._similar(path, hashes, radius)
+
+    def _similar(self, path, hashes, radius):
+        best = {}
+        for h in hashes:
+            for i, d in self.near(int(h), radius):
+                key = self.entry(i)
+                if key[0] != path and d < best.get(key, radius + 1):
+                    best[key] = d
+        return sorted(((p, f, d) for (p, f), d in best.items()), key=lambda e: (e[2], e[0], e[1]))
+
+    def clusters(self, radius=3, images_only=False):
+        """Groups of files whose frames are near-duplicates (largest first)"""
+        with self.lock:
+            return self._clusters(radius, images_only)
+
+    def _clusters(self, radius, images_only):
+        parent = list(range(len(self.files)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(self.hashes)):
+            if images_only and self.frames[i] != -1:
+                continue
+            for j, _ in self.near(int(self.hashes[i]), radius):
+                if images_only and self.frames[j] != -1:
+                    continue
+                a, b = find(int(self.file_ids[i])), find(int(self.file_ids[j]))
+                if a != b:
+                    parent[b] = a
+
+        groups = {}
+        for i, f in enumerate(self.files):
+            groups.setdefault(find(i), []).append(f[0])
+        return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+    def dedupe(self, folder, radius=3, apply=False, move_to=None):
+        """
+        Keep the sharpest image of every duplicate cluster in folder and move
+        the others to folder/duplicates (nothing is deleted). Returns the moves.
+        """
+        folder = os.path.normpath(folder)
+        move_to = move_to or os.path.join(folder, "duplicates")
+        moves = []
+        for group in self.clusters(radius, images_only=True):
+            group = [p for p in group if os.path.dirname(os.path.normpath(p)) == folder]
+            if len(group) < 2:
+                continue
+            keep = max(group, key=sharpness)
+            moves.extend((p, os.path.join(move_to, os.path.basename(p))) for p in group if p != keep)
+        if apply and moves:
+            os.makedirs(move_to, exist_ok=True)
+            for src, dst in moves:
+                shutil.move(src, dst)
+            self.remove([src for src, _ in moves])
+            self.save()
+        return moves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perceptual-hash index of captured media")
+    parser.add_argument("--index", default="media_index.npz")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("update")
+    p.add_argument("folders", nargs="*", default=["captured_images", "recorded_videos", "files"])
+    p = sub.add_parser("similar")
+    p.add_argument("path")
+    p.add_argument("--radius", type=int, default=6)
+    p = sub.add_parser("duplicates")
+    p.add_argument("--radius", type=int, default=3)
+    p = sub.add_parser("dedupe")
+    p.add_argument("folder")
+    p.add_argument("--radius", type=int, default=3)
+    p.add_argument("--apply", action="store_true", help="move the duplicates (default: only list them)")
+    args = parser.parse_args()
+
+    index = MediaIndex(args.index)
+    if args.command == "update":
+        count = index.update(args.folders, lambda i, n: print(f"\r{i}/{n}", end="", flush=True))
+        print(f"\rIndexed {count} files, {len(index.files)} files / {len(index.hashes)} hashes in total")
+    elif args.command == "similar":
+        for path, frame, dist in index.similar(args.path, args.radius):
+            print(f"{dist:2d}  {path}" + (f" @ frame {frame}" if frame >= 0 else ""))
+    elif args.command == "duplicates":
+        for group in index.clusters(args.radius):
+            print(f"{len(group)} files:")
+            for path in group:
+                print(f"   {path}")
+    elif args.command == "dedupe":
+        moves = index.dedupe(args.folder, args.radius, apply=args.apply)
+        for src, dst in moves:
+            print(f"{'moved' if args.apply else 'would move'} {src} -> {dst}")
+        print(f"{len(moves)} duplicates")
@@ -0,0 +1,125 @@
+# MotionGate.py - Skip detection while the scene doesn't change
+#
+# MotionGate compares a small grayscale copy of each frame with the one the
+# last full detection ran on. Only when enough pixels changed (or every
+# `refresh_every` frames regardless) is detection worth running again.
+# Comparing against the last detected frame, not the previous one, means slow
+# drift still adds up and triggers a refresh.
+#
+# GatedDetector wraps a CrabDetector with a gate and reuses the previous
+# result on static frames. Every `audit_every`-th skipped frame is detected
+# anyway and compared, which gives a running estimate of what skipping costs
+# in accuracy (count agreement) next to the skip rate.
+import time
+
+import cv2
+
+
+class MotionGate:
+    def __init__(self, width=96, pixel_threshold=18, changed_fraction=0.005, refresh_every=15):
+        """
+        width: width of the comparison image (height keeps the aspect ratio)
+        pixel_threshold: grey level difference for a pixel to count as changed
+        changed_fraction: fraction of changed pixels that means "the scene moved"
+        refresh_every: run detection at least every N frames
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.refresh_every = refresh_every
+        self.reference = None
+        self.since_refresh = 0
+        self.last_change = 0.0
+
+    def small(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, round(self.width * h / w))
+        # shrink first: a linear resize only reads a few pixels per output pixel,
+        # INTER_AREA (or a full-size grey conversion) costs as much as detection
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def changed(self, frame):
+        """True when frame needs a full detection; it then becomes the reference"""
+        small = self.small(frame)
+        self.since_refresh += 1
+        if self.reference is None or self.reference.shape != small.shape:
+            self.last_change = 1.0
+        else:
+            diff = cv2.absdiff(small, self.reference)
+            self.last_change = cv2.countNonZero(
+                cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+        if (self.last_change >= self.changed_fraction or self.reference is None
+                or self.since_refresh >= self.refresh_every):
+            self.reference = small
+            self.since_refresh = 0
+            return True
+        return False
+
+    def reset(self):
+        self.reference = None
+
+
+class GatedDetector:
+    def __init__(self, detector, gate=None, audit_every=20):
+        self.detector = detector
+        self.gate = gate or MotionGate()
+        self.audit_every = audit_every
+        self.result = None
+        self.frames = 0
+        self.detected = 0
+        self.skipped = 0
+        self.audits = 0
+        self.audit_agree = 0
+        self.audit_error = 0
+        self.gate_time = 0.0
+        self.detect_time = 0.0
+
+    @property
+    def params(self):
+        """Detector parameters plus the gate settings (results depend on both)"""
+        params = dict(self.detector.params)
+        params["motion_gate"] = [self.gate.width, self.gate.pixel_threshold,
+                                 self.gate.changed_fraction, self.gate.refresh_every]
+        return params
+
+    def detect(self, frame):
+        self.frames += 1
+        start = time.perf_counter()
+        # the gate sees every frame, so the first one becomes its reference too
+        run = self.gate.changed(frame) or self.result is None
+        self.gate_time += time.perf_counter() - start
+
+        if not run:
+            self.skipped += 1
+            if self.audit_every and self.skipped % self.audit_every == 0:
+                # what would a full detection have said?
+                fresh = self.detector.detect(frame)
+                self.audits += 1
+                self.audit_agree += fresh["count"] == self.result["count"]
+                self.audit_error += abs(fresh["count"] - self.result["count"])
+            return self.result
+
+        start = time.perf_counter()
+        self.result = self.detector.detect(frame)
+        self.detect_time += time.perf_counter() - start
+        self.detected += 1
+        return self.result
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skip_rate": self.skipped / self.frames if self.frames else 0.0,
+            "count_agreement": self.audit_agree / self.audits if self.audits else 1.0,
+            "count_error": self.audit_error / self.audits if self.audits else 0.0,
+            "audits": self.audits,
+            "gate_ms": 1000 * self.gate_time / self.frames if self.frames else 0.0,
+            "detect_ms": 1000 * self.detect_time / self.detected if self.detected else 0.0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Motion gate: skipped {100 * s['skip_rate']:.0f}% of {s['frames']} frames, "
+                f"count agreement {100 * s['count_agreement']:.0f}% over {s['audits']} audits "
+                f"(mean error {s['count_error']:.2f}), gate {s['gate_ms']:.2f} ms, "
+                f"detection {s['detect_ms']:.1f} ms")
@@ -0,0 +1,313 @@
+# MultiCapture.py - Several cameras captured independently, matched by time
+#
+# Every camera runs its own CaptureCore thread at its own rate, so a slow or
+# stalling camera never holds the others up. Frames are stamped with the
+# time.monotonic() CaptureCore took right after reading them (before
+# enhancement or anything else done per camera) and kept in a short buffer
+# per camera. Consumers that only show one camera use on_frame; consumers
+# that need synchronized views get aligned sets from on_set:
+#   - every frame of a reference camera is a candidate anchor: the slowest
+#     camera with missing="drop" (one set per frame of the camera that
+#     limits the rate), the fastest with missing="duplicate"
+#   - every other camera contributes its unused frame closest to the
+#     anchor, if it is within `tolerance` seconds
+#   - a camera without such a frame either drops the set (missing="drop") or
+#     repeats the frame it gave the previous set, if that one is still
+#     within `max_stale` of the anchor (missing="duplicate")
+# An anchor is decided once every camera has a frame after it (later frames
+# can't come closer) or once it is older than the tolerance, so a stalled
+# camera doesn't hold the sets up. A frame is never used for two sets unless
+# it is explicitly duplicated.
+#
+# snapshot() saves the newest set, one image per camera taken at the same
+# moment. stats() reports per-camera rate, the skew of the sets (newest minus
+# oldest frame) and how many sets were made, dropped and filled with
+# duplicates.
+#   python MultiCapture.py left.mp4 right.mp4 down.mp4 --seconds 10
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import quote
+
+import cv2
+
+from CaptureCore import CaptureCore
+from FramePool import frame_array, release_frame, retain_frame
+
+
+def file_camera(path, fps=None):
+    """fake:// URL that plays a video file at its own frame rate, in a loop,
+    like a live camera (a plain file is read as fast as possible)"""
+    if fps is None:
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+    return f"fake://?video={quote(path)}&fps={fps}"
+
+
+def camera_source(text):
+    """Command line / environment text to a CaptureCore source: a camera
+    index, a URL, or a video file played like a camera"""
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    if "://" not in text:
+        return file_camera(text)
+    return text
+
+
+class CameraStream:
+    def __init__(self, name, core, owned, on_frame):
+        self.name = name
+        self.core = core
+        self.owned = owned          # started and stopped by MultiCapture
+        self.on_frame = on_frame
+        self.buffer = deque()       # (monotonic time, frame), oldest first
+        self.arrivals = deque()     # arrival times in the last rate window
+        self.frames = 0
+        self.last_used = None       # (time, frame) given to the previous set
+        self.offsets = deque(maxlen=300)   # frame time - anchor, per set
+
+
+class MultiCapture:
+    def __init__(self, tolerance=0.02, missing="drop", max_stale=0.2, keep=8, on_set=None,
+                 rate_window=2.0):
+        """
+        tolerance: how far from the anchor a camera's frame may be (seconds)
+        missing: "drop" or "duplicate", see above
+        max_stale: oldest a duplicated frame may be relative to the anchor
+        keep: frames buffered per camera
+        on_set(frameset): called from the capture thread that completed the
+        set; frames are valid during the call, retain_frame() to keep them
+        """
+        if missing not in ("drop", "duplicate"):
+            raise ValueError(f"missing must be 'drop' or 'duplicate', not {missing!r}")
+        self.tolerance = tolerance
+        self.missing = missing
+        self.max_stale = max_stale
+        self.keep = keep
+        self.on_set = on_set
+        self.rate_window = rate_window
+        self.streams = []
+        self.lock = threading.Lock()
+        self.last_anchor = None
+        self.sets = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.skews = deque(maxlen=300)
+        self.latest = None          # the newest set, without frames
+        self.latest_frames = {}     # its frames, retained for snapshot()
+
+    # ============================================================
+    # Cameras
+    # ============================================================
+
+    def add(self, source, name=None, on_frame=None, **core_args):
+        """Open a camera with its own CaptureCore; on_frame(frame, timestamp)
+        sees every frame of this camera"""
+        stream = CameraStream(name, None, True, on_frame)
+        stream.core = CaptureCore(source, on_frame=lambda f, ts: self._arrived(stream, f, ts),
+                                  name=name, **core_args)
+        stream.name = stream.core.name
+        self.streams.append(stream)
+        return stream.core
+
+    def attach(self, core, name=None):
+        """Include a camera whose CaptureCore somebody else runs (e.g. a
+        CameraWorker); its own on_frame keeps getting every frame"""
+        stream = CameraStream(name or core.name, core, False, core.on_frame)
+        core.on_frame = lambda f, ts: self._arrived(stream, f, ts)
+        self.streams.append(stream)
+        return core
+
+    def start(self):
+        for stream in self.streams:
+            if stream.owned:
+                stream.core.start()
+        return self
+
+    def stop(self):
+        for stream in self.streams:
+            if stream.owned:
+                stream.core.stop()
+        with self.lock:
+            for stream in self.streams:
+                while stream.buffer:
+                    release_frame(stream.buffer.popleft()[1])
+                if stream.last_used is not None:
+                    release_frame(stream.last_used[1])
+                    stream.last_used = None
+            self._keep_latest({})
+
+    # ============================================================
+    # Capture threads
+    # ============================================================
+
+    def _arrived(self, stream, frame, timestamp):
+        # called on the camera's capture thread, read_time is this frame's
+        read = stream.core.read_time
+        now = time.monotonic()
+        if read is None:
+            read = now
+        if stream.on_frame is not None:
+            stream.on_frame(frame, timestamp)
+        with self.lock:
+            stream.frames += 1
+            stream.arrivals.append(now)
+            while stream.arrivals[0] < now - self.rate_window:
+                stream.arrivals.popleft()
+            stream.buffer.append((read, retain_frame(frame)))
+            while len(stream.buffer) > self.keep:
+                release_frame(stream.buffer.popleft()[1])
+            sets = self._match(now)
+        for frameset in sets:
+            try:
+                if self.on_set is not None:
+                    self.on_set(frameset)
+            finally:
+                for frame in frameset["frames"].values():
+                    release_frame(frame)
+
+    def _reference(self):
+        """The camera whose frames anchor the sets: the slowest one when
+        incomplete sets are dropped, the fastest when gaps are duplicated"""
+        rates = [len(s.arrivals) for s in self.streams]
+        pick = min(rates) if self.missing == "drop" else max(rates)
+        return self.streams[rates.index(pick)]
+
+    def _match(self, now):
+        """Aligned sets that can be decided now (called with the lock held)"""
+        if len(self.streams) < 2:
+            return []
+        ref = self._reference()
+        sets = []
+        for t, frame in list(ref.buffer):
+            if self.last_anchor is not None and t <= self.last_anchor:
+                continue
+            # decided once every camera has passed t, or can't get within
+            # the tolerance of it any more
+            if now <= t + self.tolerance and any(
+                    s is not ref and (not s.buffer or s.buffer[-1][0] < t) for s in self.streams):
+                break
+            self.last_anchor = t
+            frameset = self._make_set(ref, t)
+            if frameset is not None:
+                sets.append(frameset)
+        return sets
+
+    def _make_set(self, ref, anchor):
+        picks = {}
+        duplicated = []
+        for s in self.streams:
+            pick = min(s.buffer, key=lambda e: abs(e[0] - anchor)) if s.buffer else None
+            if pick is None or abs(pick[0] - anchor) > self.tolerance:
+                if (self.missing == "duplicate" and s.last_used is not None
+                        and anchor - s.last_used[0] <= self.max_stale):
+                    picks[s.name] = s.last_used
+                    duplicated.append(s.name)
+                    continue
+                self.dropped += 1
+                return None
+            picks[s.name] = pick
+
+        for s in self.streams:
+            t, frame = picks[s.name]
+            s.offsets.append(t - anchor)
+            if s.name in duplicated:
+                continue
+            # this frame is used now; it and everything older leave the buffer
+            while s.buffer and s.buffer[0][0] <= t:
+                old = s.buffer.popleft()
+                if old[1] is not frame:
+                    release_frame(old[1])
+            if s.last_used is not None:
+                release_frame(s.last_used[1])
+            s.last_used = (t, frame)
+
+        stamps = {name: t for name, (t, _) in picks.items()}
+        skew = max(stamps.values()) - min(stamps.values())
+        self.sets += 1
+        self.duplicated += len(duplicated)
+        self.skews.append(skew)
+        self.latest = {"time": anchor, "reference": ref.name, "stamps": stamps, "skew": skew,
+                       "duplicated": duplicated}
+        self._keep_latest({name: retain_frame(frame) for name, (_, frame) in picks.items()})
+        frames = {name: retain_frame(frame) for name, (_, frame) in picks.items()}
+        return dict(self.latest, frames=frames)
+
+    def _keep_latest(self, frames):
+        old, self.latest_frames = self.latest_frames, frames
+        for frame in old.values():
+            release_frame(frame)
+
+    # ============================================================
+    # Snapshots
+    # ============================================================
+
+    def snapshot(self, folder, prefix):
+        """Save the newest aligned set, one image per camera; returns the paths"""
+        with self.lock:
+            frames = {name: retain_frame(frame) for name, frame in self.latest_frames.items()}
+        paths = []
+        try:
+            for name, frame in frames.items():
+                path = os.path.join(folder, f"{prefix}_{name.replace(' ', '')}.jpg")
+                if cv2.imwrite(path, frame_array(frame)):
+                    paths.append(path)
+        finally:
+            for frame in frames.values():
+                release_frame(frame)
+        return paths
+
+    # ============================================================
+    # Stats
+    # ============================================================
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            cameras = {}
+            for s in self.streams:
+                recent = [t for t in s.arrivals if t >= now - self.rate_window]
+                offsets = list(s.offsets)
+                cameras[s.name] = {
+                    "frames": s.frames,
+                    "fps": len(recent) / self.rate_window,
+                    "offset_ms": 1000 * sum(offsets) / len(offsets) if offsets else 0.0,
+                }
+            skews = list(self.skews)
+        return {
+            "cameras": cameras,
+            "sets": self.sets,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "skew_ms": 1000 * sum(skews) / len(skews) if skews else 0.0,
+            "max_skew_ms": 1000 * max(skews) if skews else 0.0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        rates = ", ".join(f"{name} {c['fps']:.1f} fps ({c['offset_ms']:+.1f} ms)" for name, c in s["cameras"].items())
+        return (f"Multi-camera: {rates} | {s['sets']} sets, skew {s['skew_ms']:.1f} ms "
+                f"(max {s['max_skew_ms']:.1f}), {s['dropped']} dropped, {s['duplicated']} duplicated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture several cameras (or video files) and align them")
+    parser.add_argument("sources", nargs="+", help="camera index, URL or video file (played in real time)")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--missing", choices=["drop", "duplicate"], default="drop")
+    args = parser.parse_args()
+
+    multi = MultiCapture(args.tolerance, args.missing)
+    for i, text in enumerate(args.sources):
+        multi.add(camera_source(text), name=f"cam{i}")
+    multi.start()
+    end = time.time() + args.seconds
+    while time.time() < end:
+        time.sleep(min(2.0, max(end - time.time(), 0)))
+        print(multi.summary())
+    multi.stop()
@@ -0,0 +1,455 @@
+# NetworkSource.py - Network video source for tethered IP cameras
+#
+# Two kinds of URLs are supported:
+#   mjpeg+udp://host:port   JPEG frames in our own framing (see stream_server.py),
+#   mjpeg+tcp://host:port   with sequence numbers and sender timestamps, so we can
+#                           report lost frames and latency.
+#   udp://, tcp://, rtsp://, http://...
+#                           anything else is handed to OpenCV/FFMPEG (H.264, MPEG-TS,
+#                           plain MJPEG over HTTP). Loss can't be measured there.
+#
+# NetworkSource looks like cv2.VideoCapture (isOpened/read/get/release) so the
+# camera workers can use it as a drop-in replacement. Like VideoCapture's
+# constructor it waits (up to `timeout`) for the stream to connect, and
+# isOpened() is False while it is disconnected.
+#
+# Every connection starts a new stream: a restarted sender numbers its frames
+# from 0 again. A sequence number far behind what was played (more than
+# REORDER_WINDOW frames) also starts one, for a sender that restarted without
+# the connection dropping (UDP).
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+# magic, seq, sender time, chunk index, chunk count, payload length
+HEADER = struct.Struct("!4sIdHHI")
+MAGIC = b"ROVF"
+MAX_CHUNK = 60000
+REORDER_WINDOW = 64
+
+
+def is_network_source(source):
+    return isinstance(source, str) and "://" in source
+
+
+def open_capture(source, api=None):
+    """Open a local camera index, a video file or a network URL"""
+    if isinstance(source, str) and source.startswith("fake://"):
+        from FaultySource import FaultySource  # fault injection for testing
+        return FaultySource(source)
+    if is_network_source(source):
+        return NetworkSource(source)
+    if api is not None:
+        return cv2.VideoCapture(source, api)
+    return cv2.VideoCapture(source)
+
+
+def source_name(source):
+    """File-name friendly name for a camera source (used in saved file names)"""
+    if is_network_source(source):
+        url = urlparse(source)
+        return f"{url.hostname or url.scheme}_{url.port or 0}"
+    if isinstance(source, str):
+        return os.path.splitext(os.path.basename(source))[0]  # video file
+    return str(source)
+
+
+class NetworkSource:
+    def __init__(self, url, jitter_ms=60, latest_only=False, max_buffer=30,
+                 timeout=2.0, reconnect_min=0.5, reconnect_max=5.0):
+        """
+        jitter_ms: how long frames are held back to smooth out network jitter
+        latest_only: latest-frame-wins, lowest latency, older frames are dropped
+        """
+        self.url = url
+        parsed = urlparse(url)
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname or "0.0.0.0"
+        self.port = parsed.port or 5600
+        self.native = self.scheme in ("mjpeg+udp", "mjpeg+tcp")
+
+        self.jitter = 0.0 if latest_only else jitter_ms / 1000.0
+        self.latest_only = latest_only
+        self.max_buffer = 1 if latest_only else max_buffer
+        self.timeout = timeout
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+
+        self.active = True
+        self.connected = False
+        self.opened = threading.Event()   # set once the first connection is up
+        self.lock = threading.Condition()
+        self.buffer = deque()          # (seq, sender_ts, arrival, payload)
+        self.last_seq = None           # last seq handed out by read()
+        self.clock_offset = None       # min(arrival - sender_ts), absorbs clock skew
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+
+        self.stats_data = {
+            "frames_received": 0,
+            "frames_played": 0,
+            "frames_dropped": 0,
+            "frames_lost": 0,           # sequence numbers that never arrived
+            "streams": 0,
+            "reconnects": 0,
+            "latency_ms": 0.0,
+            "jitter_ms": 0.0,
+        }
+        self._highest_seq = None
+        self._last_transit = None
+        self._last_arrival = None
+
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.thread.start()
+        self.opened.wait(timeout)
+
+    # ============================================================
+    # cv2.VideoCapture-like API
+    # ============================================================
+
+    def isOpened(self):
+        return self.active and self.connected
+
+    def read(self, image=None):
+        """Return the next frame once its playout time has come"""
+        deadline = time.time() + self.timeout
+        with self.lock:
+            while self.active:
+                item = self._next_ready()
+                if item is not None:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False, None
+                self.lock.wait(min(remaining, max(self.jitter / 4, 0.005)))
+            else:
+                return False, None
+
+        seq, sender_ts, arrival, payload = item
+        # decode only what is actually played, skipped frames cost nothing
+        frame = self._decode(payload, image)
+        if frame is None:
+            return False, None
+
+        self.height, self.width = frame.shape[:2]
+        self.stats_data["frames_played"] += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.active = False
+        with self.lock:
+            self.lock.notify_all()
+        if self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=self.timeout + 1)
+
+    def stats(self):
+        """Packet loss, latency and buffer stats"""
+        with self.lock:
+            data = dict(self.stats_data)
+            data["buffered"] = len(self.buffer)
+        data["connected"] = self.connected
+        data["fps"] = round(self.fps, 1)
+        expected = data["frames_received"] + data["frames_lost"]
+        data["loss_rate"] = data["frames_lost"] / expected if expected else 0.0
+        return data
+
+    # ============================================================
+    # Jitter buffer
+    # ============================================================
+
+    def _next_ready(self):
+        if not self.buffer:
+            return None
+
+        if self.latest_only:
+            item = self.buffer.pop()
+            self.stats_data["frames_dropped"] += len(self.buffer)
+            self.buffer.clear()
+            self.last_seq = item[0]
+            return item
+
+        seq, sender_ts, arrival, payload = self.buffer[0]
+        if sender_ts is not None and self.clock_offset is not None:
+            playout = sender_ts + self.clock_offset + self.jitter
+        else:
+            playout = arrival + self.jitter
+        if time.time() < playout:
+            return None
+
+        self.last_seq = seq
+        return self.buffer.popleft()
+
+    def _push(self, seq, sender_ts, payload):
+        arrival = time.time()
+        with self.lock:
+            self.stats_data["frames_received"] += 1
+
+            if sender_ts is not None:
+                transit = arrival - sender_ts
+                if self.clock_offset is None or transit < self.clock_offset:
+                    self.clock_offset = transit
+                # latency is only meaningful when both clocks agree (localhost / NTP)
+                self.stats_data["latency_ms"] += 0.1 * (transit * 1000 - self.stats_data["latency_ms"])
+                # RFC 3550 interarrival jitter
+                if self._last_transit is not None:
+                    d = abs(transit - self._last_transit) * 1000
+                    self.stats_data["jitter_ms"] += (d - self.stats_data["jitter_ms"]) / 16
+                self._last_transit = transit
+
+            if self._last_arrival is not None:
+                dt = arrival - self._last_arrival
+                if dt > 0:
+                    self.fps += 0.1 * (1.0 / dt - self.fps)
+            self._last_arrival = arrival
+
+            if (self.last_seq is not None and seq is not None
+                    and seq < self.last_seq - REORDER_WINDOW):
+                print(f"[{self.url}] sequence restarted at {seq}, new stream")
+                self._new_stream()
+
+            # late frame: we already played something newer
+            if self.last_seq is not None and seq is not None and seq <= self.last_seq:
+                self.stats_data["frames_dropped"] += 1
+                return
+
+            # keep the buffer ordered by sequence number
+            item = (seq, sender_ts, arrival, payload)
+            if seq is None or not self.buffer or self.buffer[-1][0] < seq:
+                self.buffer.append(item)
+            else:
+                pos = len(self.buffer)
+                while pos > 0 and self.buffer[pos - 1][0] > seq:
+                    pos -= 1
+                self.buffer.insert(pos, item)
+
+            while len(self.buffer) > self.max_buffer:
+                self.buffer.popleft()
+                self.stats_data["frames_dropped"] += 1
+
+            self.lock.notify_all()
+
+    def _count_sequence(self, seq):
+        """Track gaps in the sender's frame sequence numbers"""
+        with self.lock:
+            if (self._highest_seq is None or seq > self._highest_seq + 1000
+                    or seq < self._highest_seq - REORDER_WINDOW):
+                self._highest_seq = seq     # first frame or a restarted sender
+                return
+            if seq > self._highest_seq:
+                self.stats_data["frames_lost"] += seq - self._highest_seq - 1
+                self._highest_seq = seq
+
+    def _new_stream(self):
+        """Forget the previous stream's numbering and timing (lock held)"""
+        self.stats_data["streams"] += 1
+        self.stats_data["frames_dropped"] += len(self.buffer)
+        self.buffer.clear()
+        self.last_seq = None
+        self._highest_seq = None
+        self.clock_offset = None
+        self._last_transit = None
+        self._last_arrival = None
+
+    def _set_connected(self):
+        if not self.connected:
+            self.connected = True
+            with self.lock:
+                self._new_stream()
+            self.opened.set()
+
+    def _decode(self, payload, image=None):
+        if isinstance(payload, np.ndarray):
+            frame = payload  # already decoded by the FFMPEG backend
+        else:
+            frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None and image is not None and image.shape == frame.shape:
+            image[...] = frame
+            return image
+        return frame
+
+    # ============================================================
+    # Receiving + reconnect
+    # ============================================================
+
+    def _receive_loop(self):
+        backoff = self.reconnect_min
+        first = True
+        while self.active:
+            if not first:
+                self.stats_data["reconnects"] += 1
+                print(f"[{self.url}] reconnecting in {backoff:.1f}s")
+                self._sleep(backoff)
+                backoff = min(backoff * 2, self.reconnect_max)
+            first = False
+
+            try:
+                if self.scheme == "mjpeg+udp":
+                    got_frames = self._receive_udp()
+                elif self.scheme == "mjpeg+tcp":
+                    got_frames = self._receive_tcp()
+                else:
+                    got_frames = self._receive_ffmpeg()
+            except OSError as e:
+                print(f"[{self.url}] connection error: {e}")
+                got_frames = False
+            self.connected = False
+            # the constructor stops waiting once the first attempt failed
+            self.opened.set()
+
+            if got_frames:
+                backoff = self.reconnect_min
+
+    def _sleep(self, seconds):
+        end = time.time() + seconds
+        while self.active and time.time() < end:
+            time.sleep(0.05)
+
+    def _receive_udp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind((self.host, self.port))
+        sock.settimeout(0.2)
+
+        chunks = {}  # seq -> [sender_ts, count, {index: data}]
+        got_frames = False
+        last_packet = time.time()
+        try:
+            while self.active:
+                try:
+                    packet, _ = sock.recvfrom(65536)
+                except socket.timeout:
+                    if time.time() - last_packet > self.timeout:
+                        if got_frames:
+                            print(f"[{self.url}] stream stalled")
+                        return got_frames
+                    continue
+
+                last_packet = time.time()
+                self._set_connected()
+                if len(packet) < HEADER.size:
+                    continue
+                magic, seq, sender_ts, index, count, length = HEADER.unpack_from(packet)
+                if magic != MAGIC:
+                    continue
+
+                entry = chunks.setdefault(seq, [sender_ts, count, {}])
+                entry[2][index] = packet[HEADER.size:HEADER.size + length]
+                if len(entry[2]) == count:
+                    del chunks[seq]
+                    payload = b"".join(entry[2][i] for i in range(count))
+                    self._push(seq, sender_ts, payload)
+                    self._count_sequence(seq)
+                    got_frames = True
+                    # forget incomplete frames that can no longer complete
+                    for old in [s for s in chunks if s < seq - 2]:
+                        del chunks[old]
+        finally:
+            sock.close()
+        return got_frames
+
+    def _receive_tcp(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        got_frames = False
+        try:
+            self._set_connected()
+            while self.active:
+                header = self._recv_exact(sock, HEADER.size)
+                if header is None:
+                    break
+                magic, seq, sender_ts, index, count, length = HEADER.unpack(header)
+                if magic != MAGIC:
+                    print(f"[{self.url}] bad frame header, dropping connection")
+                    break
+                payload = self._recv_exact(sock, length)
+                if payload is None:
+                    break
+                self._push(seq, sender_ts, payload)
+                self._count_sequence(seq)
+                got_frames = True
+        except socket.timeout:
+            print(f"[{self.url}] stream stalled")
+        finally:
+            sock.close()
+        return got_frames
+
+    def _recv_exact(self, sock, size):
+        data = bytearray()
+        while len(data) < size:
+            if not self.active:
+                return None
+            part = sock.recv(size - len(data))
+            if not part:
+                return None
+            data.extend(part)
+        return bytes(data)
+
+    def _receive_ffmpeg(self):
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            print(f"[{self.url}] could not open stream")
+            return False
+
+        got_frames = False
+        seq = 0
+        try:
+            self._set_connected()
+            while self.active:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                seq += 1
+                self._push(seq, None, frame)
+                got_frames = True
+        finally:
+            cap.release()
+        return got_frames
+
+
+if __name__ == "__main__":
+    # Quick viewer: python NetworkSource.py mjpeg+udp://0.0.0.0:5600 [--latest]
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python NetworkSource.py URL [--latest] [--jitter MS]")
+        sys.exit(1)
+
+    jitter = 60
+    if "--jitter" in sys.argv:
+        jitter = int(sys.argv[sys.argv.index("--jitter") + 1])
+    source = NetworkSource(sys.argv[1], jitter_ms=jitter, latest_only="--latest" in sys.argv)
+    last_report = time.time()
+    try:
+        while True:
+            ret, frame = source.read()
+            if ret and "--show" in sys.argv:
+                cv2.imshow(sys.argv[1], frame)
+                if cv2.waitKey(1) == 27:
+                    break
+            if time.time() - last_report > 1.0:
+                last_report = time.time()
+                print(source.stats())
+    except KeyboardInterrupt:
+        pass
+    source.release()
@@ -1,23 +1,55 @@
 # ObjectDetectionWorker.py
 import cv2
-import numpy as np
+import os
 import time
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
+from CrabDetector import CrabDetector
+from MotionGate import GatedDetector
+from CrabTracker import CrabTracker
+from FrameImage import DisplayBuffers
+from DetectionStore import DetectionStore, DetectionRecorder
+from Enhancer import Enhancer
+from PipelineStats import PIPELINE
+from PrefetchReader import PrefetchReader
 
 class ObjectDetectionWorker(QThread):
     image_data = pyqtSignal(QImage)
+    # detect() result of every frame, emitted before the frame's image_data
+    # (if it is shown), so the newest result is the one to draw on it
+    detections = pyqtSignal(object)
 
-    def __init__(self, source=0):
+    def __init__(self, source=0, detect_every=1, enhance=False, detect_threads=1):
         """
         source: int (camera index) or str (file path)
+        detect_every: run the detector on every Nth frame and track the crabs
+        in between (only full passes, detect_every=1, go into the store)
+        enhance: murky-water enhancement before detection and display
+        detect_threads: segment each frame in parallel bands (4K sources)
         """
         super().__init__()
         self.source = source
         self.thread_active = True
+        # static scenes (hovering) reuse the last result
+        self.detector = GatedDetector(CrabDetector(threads=detect_threads))
+        self.store = DetectionStore()
+        # stable crab ids and the unique total on top of the detections
+        self.tracker = CrabTracker(self.detector, detect_every)
+        # frames the GUI hasn't drawn yet, shown as BGR without conversion
+        self.display = DisplayBuffers()
+        self.enhancer = Enhancer() if enhance else None
+        # detection goes on while the view is hidden, only the display stops
+        self.visible = True
+        # set when QualityGovernor lowered detection quality: the pass
+        # doesn't match the stored parameters any more and isn't saved
+        self.degraded = False
 
     def run(self):
-        cap = cv2.VideoCapture(self.source)
+        # display lives in the GUI thread: queued behind the GUI's slots, so it
+        # runs once the frame was drawn
+        self.image_data.connect(self.display.displayed)
+        # files and image folders are decoded ahead on another thread
+        cap = cv2.VideoCapture(self.source) if isinstance(self.source, int) else PrefetchReader(self.source)
         if not cap.isOpened():
             print(f"Error: Cannot open source {self.source}")
             return
@@ -28,62 +60,100 @@ class ObjectDetectionWorker(QThread):
         else:
             fps = cap.get(cv2.CAP_PROP_FPS)
             delay = 1.0 / fps if fps > 0 else 0.03  # video playback
-            time.sleep(delay)
+        next_time = time.time()
+
+        # Files analyzed before are replayed from the detection store
+        cached = recorder = None
+        if isinstance(self.source, str) and os.path.isfile(self.source):
+            cached = self.store.load(self.source, self.params)
+            if cached is None:
+                # batch_detect's pass, every frame detected without the gate
+                cached = self.store.load(self.source, self.exact_params)
+            if cached is not None:
+                print(f"Using stored detections for {self.source}")
+            elif self.tracker.detect_every == 1:
+                recorder = DetectionRecorder()
+        frame_index = 0
+        finished = False
 
         while self.thread_active:
             ret, frame = cap.read()
             if not ret:
+                finished = True
                 break  # end of video
 
-            # Process frame
-            result = self.process_frame(frame)
-
-            # Convert to QImage
-            rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb.shape
-            bytes_per_line = ch * w
-            qimg = QImage(rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.image_data.emit(qimg)
-
-            # Wait to match video FPS
+            if self.enhancer is not None:
+                frame = self.enhancer.apply(frame)
+                PIPELINE.add("od enhance", self.enhancer.last)
+
+            # Process frame, the GUI draws the result on top of the frame
+            if cached is not None and frame_index < len(cached):
+                result = self.tracker.update(frame, cached.result(frame_index))
+            elif recorder is not None and self.degraded:
+                print("Detection quality reduced under load, this pass won't be stored")
+                recorder = None
+                with PIPELINE.timed("od detect+track"):
+                    result = self.tracker.update(frame)
+            elif recorder is not None:
+                detected = self.process_frame(frame)
+                recorder.add(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, detected)
+                result = self.tracker.update(frame, detected)
+            else:
+                with PIPELINE.timed("od detect+track"):
+                    result = self.tracker.update(frame)
+            frame_index += 1
+
+            # every result goes out (counts, overlay); the QImage over the
+            # frame itself is skipped while the GUI is behind or hidden
+            self.detections.emit(result)
+            qimg = self.display.image(frame) if self.visible else None
+            if qimg is not None:
+                self.image_data.emit(qimg)
+
+            # Wait to match video FPS (what detection took counts towards it)
             if delay > 0:
-                time.sleep(delay)
+                next_time = max(next_time + delay, time.time())
+                time.sleep(max(next_time - time.time(), 0))
 
         cap.release()
+        if self.detector.frames:
+            print(self.detector.summary())
+        if self.tracker.frames:
+            print(self.tracker.summary())
+        if self.enhancer is not None:
+            print(self.enhancer.summary())
+        if recorder is not None and finished:
+            # only complete passes are stored
+            self.store.save(self.source, self.params, recorder)
+
+    @property
+    def params(self):
+        """What the stored detections depend on"""
+        if self.enhancer is None:
+            return self.detector.params
+        return dict(self.detector.params, enhance=self.enhancer.params)
+
+    @property
+    def exact_params(self):
+        """The same without the motion gate (a detection on every frame)"""
+        if self.enhancer is None:
+            return self.detector.detector.params
+        return dict(self.detector.detector.params, enhance=self.enhancer.params)
+
+    def set_detect_every(self, n):
+        """QualityGovernor knob: track between detections on every nth frame"""
+        self.tracker.detect_every = max(1, n)
+        self.degraded = self.degraded or n > 1
+
+    def set_detect_scale(self, scale):
+        """QualityGovernor knob: detection processing scale"""
+        self.detector.detector.set_scale(scale)
+        self.degraded = self.degraded or scale < 1.0
 
     def process_frame(self, frame):
-        """Detect green crabs and annotate frame"""
-        result = frame.copy()
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-        # Green color range
-        lower_green = np.array([25, 30, 20])
-        upper_green = np.array([95, 255, 255])
-        mask = cv2.inRange(hsv, lower_green, upper_green)
-
-        # Morphology
-        kernel_small = np.ones((5,5), np.uint8)
-        kernel_large = np.ones((7,7), np.uint8)
-        mask_clean = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel_large, iterations=2)
-        mask_clean = cv2.morphologyEx(mask_clean, cv2.MORPH_CLOSE, kernel_small, iterations=2)
-
-        # Contours
-        contours, _ = cv2.findContours(mask_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        min_area = 500
-        max_area = 50000
-        valid_crabs = [c for c in contours if min_area < cv2.contourArea(c) < max_area]
-
-        # Draw bounding boxes
-        for i, c in enumerate(valid_crabs, 1):
-            x, y, w, h = cv2.boundingRect(c)
-            cv2.rectangle(result, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(result, f'Crab {i}', (x, y-10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            cv2.drawContours(result, [c], -1, (255, 0, 0), 2)
-
-        cv2.putText(result, f'Count: {len(valid_crabs)}', (20, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-        return result
+        """Detect green crabs, returns boxes/contours/labels/count"""
+        with PIPELINE.timed("od detect"):
+            return self.detector.detect(frame)
 
     def stop(self):
         self.thread_active = False
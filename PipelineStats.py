@@ -0,0 +1,63 @@
+# PipelineStats.py - Where the time per frame goes, stage by stage
+#
+# Every stage (capture, enhance, detect, display, ...) reports how long it
+# took for each frame. The stats keep the last `window` seconds per stage and
+# give rate, mean/max time and load (the share of one core the stage uses).
+# PIPELINE is the instance shared by the workers of one process; stage names
+# carry the camera name when there is more than one camera.
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PipelineStats:
+    def __init__(self, window=5.0):
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}      # name -> deque of (time, seconds)
+        self.order = []       # first-seen order, for printing
+
+    def add(self, stage, seconds, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            samples = self.stages.get(stage)
+            if samples is None:
+                samples = self.stages[stage] = deque()
+                self.order.append(stage)
+            samples.append((now, seconds))
+            while samples and samples[0][0] < now - self.window:
+                samples.popleft()
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """{stage: {"fps", "ms", "max_ms", "load"}} over the last window"""
+        now = time.time()
+        result = {}
+        with self.lock:
+            for stage in self.order:
+                times = [s for t, s in self.stages[stage] if t >= now - self.window]
+                if not times:
+                    continue
+                result[stage] = {
+                    "fps": len(times) / self.window,
+                    "ms": 1000 * sum(times) / len(times),
+                    "max_ms": 1000 * max(times),
+                    "load": sum(times) / self.window,
+                }
+        return result
+
+    def summary(self):
+        parts = [f"{stage} {s['fps']:.0f} fps {s['ms']:.1f} ms ({100 * s['load']:.0f}%)"
+                 for stage, s in self.snapshot().items()]
+        return " | ".join(parts) if parts else "no pipeline data"
+
+
+PIPELINE = PipelineStats()
@@ -0,0 +1,158 @@
+# PrefetchReader.py - Decode ahead of the detection loop
+#
+# The playback workers used to call cap.read() and detect on the same thread,
+# so the decoder sat idle while detection ran and the other way round.
+# PrefetchReader is a drop-in for cv2.VideoCapture on files: a decode thread
+# keeps a bounded queue of upcoming frames filled (decoding releases the GIL),
+# so read() usually returns at once and detection overlaps with decoding the
+# next frames. A folder of images (or a glob pattern) is decoded by a small
+# thread pool, in order, instead of through VideoCapture one file at a time.
+#
+# get(CAP_PROP_POS_MSEC / CAP_PROP_POS_FRAMES) answers for the frame read()
+# returned last, not for where the decode thread is.
+import glob
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def image_paths(source):
+    """Sorted image files of a folder or a glob pattern"""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def is_image_set(source):
+    return isinstance(source, str) and (os.path.isdir(source) or any(c in source for c in "*?["))
+
+
+class PrefetchReader:
+    def __init__(self, source, queue_size=8, threads=None):
+        """
+        source: video file, image folder or glob pattern ("dive/*.jpg")
+        queue_size: frames decoded ahead
+        threads: decoders for image sets (default: one per core)
+        """
+        self.source = source
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.active = True
+        self.ended = False
+        self.frames = 0             # frames returned by read()
+        self.pos_msec = 0.0
+        self.wait_time = 0.0        # read() waiting for the decoder
+
+        if is_image_set(source):
+            paths = image_paths(source)
+            self.opened = bool(paths)
+            self.props = {cv2.CAP_PROP_FPS: 0.0, cv2.CAP_PROP_FRAME_COUNT: float(len(paths))}
+            work = lambda: self._decode_images(paths, threads or os.cpu_count() or 1)
+        else:
+            cap = cv2.VideoCapture(source)
+            self.opened = cap.isOpened()
+            self.props = {prop: cap.get(prop) for prop in (cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_COUNT,
+                                                           cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)}
+            work = lambda: self._decode_video(cap)
+        self.thread = threading.Thread(target=work, daemon=True, name="prefetch")
+        if self.opened:
+            self.thread.start()
+
+    # ============================================================
+    # VideoCapture interface
+    # ============================================================
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened or self.ended:
+            return False, None
+        start = time.perf_counter()
+        item = self.queue.get()
+        self.wait_time += time.perf_counter() - start
+        if item is None:
+            self.ended = True
+            return False, None
+        frame, self.pos_msec = item
+        self.frames += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.pos_msec
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames)
+        return self.props.get(prop, 0.0)
+
+    def release(self):
+        self.active = False
+        # unblock a decoder waiting for room
+        while self.thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.thread.join(timeout=0.05)
+
+    # ============================================================
+    # Decode thread
+    # ============================================================
+
+    def _put(self, item):
+        """Blocks while the queue is full; False once released"""
+        while self.active:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_video(self, cap):
+        try:
+            while self.active:
+                ret, frame = cap.read()
+                if not ret or not self._put((frame, cap.get(cv2.CAP_PROP_POS_MSEC))):
+                    break
+        finally:
+            cap.release()
+            self._put(None)
+
+    def _decode_images(self, paths, threads):
+        interval = 1000.0 / 30.0   # positions as if played at 30 fps
+        with ThreadPoolExecutor(threads, thread_name_prefix="prefetch-decode") as pool:
+            pending = deque()
+            index = 0
+            try:
+                while self.active and (pending or index < len(paths)):
+                    # keep every decoder busy; the queue bounds how far ahead
+                    while index < len(paths) and len(pending) < threads:
+                        pending.append((index, pool.submit(cv2.imread, paths[index])))
+                        index += 1
+                    i, future = pending.popleft()
+                    frame = future.result()
+                    if frame is None:
+                        print(f"Cannot read {paths[i]}")
+                        continue
+                    if not self._put((frame, i * interval)):
+                        break
+            finally:
+                for _, future in pending:
+                    future.cancel()
+                self._put(None)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "wait_ms": 1000 * self.wait_time / self.frames if self.frames else 0.0,
+            "queued": self.queue.qsize(),
+        }
@@ -0,0 +1,302 @@
+# ProcessCapture.py - Capture each camera in its own process
+#
+# CaptureProcess reads the camera, records and converts frames outside the GUI
+# process (and its GIL) and publishes them into a SharedFrameRing.
+# SharedCameraWorker is the GUI-side counterpart of CameraWorker: it maps the
+# ring and copies each frame out of its slot (checking afterwards that the
+# writer didn't come round to the slot meanwhile), so the display owns what it
+# shows and nothing points into the ring once it is unmapped.
+# DetectorProcess maps the same ring and runs detection in yet another process.
+import multiprocessing as mp
+import os
+import queue
+from datetime import datetime
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from NetworkSource import source_name
+from CaptureCore import CaptureCore
+from FramePool import FramePool, frame_array, release_frame
+from FrameImage import DisplayBuffers
+from RawCapture import RawRecorder, start_transcode
+from SharedFrameRing import SharedFrameRing
+
+
+def capture_main(source, ring_name, commands, stop_event, to_rgb=True, status=None, saved=None):
+    """Entry point of the capture process; saved gets the path of every snapshot written"""
+    ring = SharedFrameRing(ring_name)
+    too_large = []
+
+    def publish(frame, timestamp):
+        # preprocess straight into the shared slot, no intermediate array
+        frame = frame_array(frame)
+        try:
+            slot = ring.begin_write(frame.shape)
+        except ValueError as e:
+            # the camera switched to a resolution beyond the ring: skip
+            # frames (recording goes on), tell the GUI once per size
+            if frame.shape not in too_large:
+                too_large.append(frame.shape)
+                print(e)
+                if status is not None:
+                    status.put(f"{core.name}: {frame.shape[1]}x{frame.shape[0]} too large for the display")
+            return
+        if to_rgb:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=slot)
+        else:
+            slot[...] = frame
+        ring.commit(timestamp)
+
+    core = CaptureCore(source, on_frame=publish,
+                       on_status=status.put if status is not None else None)
+    transcodes = []
+    fourcc = "XVID"     # codec of the current recording, raw files are compressed to it
+    core.start()
+    try:
+        while not stop_event.is_set() and core.thread.is_alive():
+            # commands from the GUI: snapshots and recording
+            try:
+                cmd = commands.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if cmd[0] == "snapshot":
+                if core.snapshot(cmd[1]) and saved is not None:
+                    saved.put(cmd[1])
+            elif cmd[0] == "record":
+                core.start_recording(*cmd[1:])
+                fourcc = cmd[5]
+            elif cmd[0] == "stop_record":
+                recorder = core.stop_recording()
+                if isinstance(recorder, RawRecorder):
+                    # compress lossless recordings while this process lives
+                    transcodes.append(start_transcode(recorder.paths, fourcc))
+    finally:
+        recorder = core.stop_recording()
+        if isinstance(recorder, RawRecorder):
+            transcodes.append(start_transcode(recorder.paths, fourcc))
+        core.stop()
+        # the transcode threads are daemons and die with this process
+        for thread in transcodes:
+            thread.join()
+        ring.close_stream()
+        ring.close()
+
+
+def detector_main(in_ring_name, out_ring_name, detect, stop_event, rgb_input=True):
+    """Entry point of the detector process: ring in, annotated ring out"""
+    src = SharedFrameRing(in_ring_name)
+    dst = SharedFrameRing(out_ring_name)
+    last_seq = -1
+    try:
+        while not stop_event.is_set():
+            item = src.wait_next(last_seq, timeout=0.5)
+            if item is None:
+                if src.closed:
+                    break
+                continue
+            seq, ts, frame = item
+            last_seq = seq
+
+            bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if rgb_input else frame
+            if not src.is_valid(seq):
+                continue  # overwritten while we were converting, skip it
+            result = detect(bgr)
+            out = dst.begin_write(result.shape)
+            if rgb_input:
+                cv2.cvtColor(result, cv2.COLOR_BGR2RGB, dst=out)
+            else:
+                out[...] = result   # same layout as the input ring
+            dst.commit(ts)  # keep the capture timestamp for latency
+    finally:
+        dst.close_stream()
+        src.close()
+        dst.close()
+
+
+class CaptureProcess:
+    """Owns the ring and the process that fills it"""
+
+    def __init__(self, source=0, slots=8, max_shape=(1080, 1920, 3), to_rgb=True):
+        """to_rgb: convert in the capture process (Qt shows RGB888 cheaper than BGR888)"""
+        self.source = source
+        self.to_rgb = to_rgb
+        self.ring = SharedFrameRing(create=True, slots=slots, max_shape=max_shape)
+        self.commands = mp.Queue()
+        self.status = mp.Queue()
+        self.saved = mp.Queue()
+        self.stop_event = mp.Event()
+        self.process = mp.Process(target=capture_main, daemon=True,
+                                  args=(source, self.ring.name, self.commands, self.stop_event, self.to_rgb,
+                                        self.status, self.saved))
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def send(self, *cmd):
+        self.commands.put(cmd)
+
+    def stop(self, timeout=3):
+        """timeout: how long the process may take to exit, None to wait for
+        raw recordings to be compressed"""
+        self.stop_event.set()
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+        self.ring.unlink()
+
+
+class DetectorProcess:
+    """Runs detect(frame_bgr) -> annotated_bgr on frames of a CaptureProcess"""
+
+    def __init__(self, capture, detect, slots=4):
+        self.ring = SharedFrameRing(create=True, slots=slots, max_shape=capture.ring.max_shape)
+        self.stop_event = mp.Event()
+        self.process = mp.Process(target=detector_main, daemon=True,
+                                  args=(capture.ring.name, self.ring.name, detect, self.stop_event,
+                                        capture.to_rgb))
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+        self.ring.unlink()
+
+
+class SharedCameraWorker(QThread):
+    """Drop-in replacement for CameraWorker backed by a capture process"""
+    image_data = pyqtSignal(QImage)
+    file_saved = pyqtSignal(str)
+    status_changed = pyqtSignal(str)
+
+    # Recording settings, as in CameraWorker
+    record_fourcc = "XVID"
+    record_container = "avi"
+    record_fps = 20.0
+    segment_seconds = 60
+
+    def __init__(self, camera_index=0, max_shape=(1080, 1920, 3)):
+        super().__init__()
+        self.camera_index = camera_index
+        self.thread_active = True
+        self.is_frozen = False
+        self.is_recording = False
+        self.capture = CaptureProcess(camera_index, max_shape=max_shape)
+        self.last_seq = -1
+        self.pool = None          # frames copied out of the ring
+        # frames the GUI hasn't drawn yet
+        self.display = DisplayBuffers()
+        # DisplayFanout that scales frames for each label (image_data isn't emitted then)
+        self.fanout = None
+
+        self.image_folder = "captured_images"
+        self.video_folder = "recorded_videos"
+        os.makedirs(self.image_folder, exist_ok=True)
+        os.makedirs(self.video_folder, exist_ok=True)
+
+    def run(self):
+        # display lives in the GUI thread: queued behind the GUI's slots, so it
+        # runs once the frame was drawn
+        self.image_data.connect(self.display.displayed)
+        self.capture.start()
+        ring = self.capture.ring
+
+        while self.thread_active:
+            try:
+                while True:
+                    self.status_changed.emit(self.capture.status.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                while True:
+                    filepath = self.capture.saved.get_nowait()
+                    self.file_saved.emit(filepath)
+                    print(f"Frame saved: {filepath}")
+            except queue.Empty:
+                pass
+
+            item = ring.wait_next(self.last_seq, timeout=0.5)
+            if item is None:
+                if ring.closed:
+                    break
+                continue
+            seq, ts, frame = item
+            self.last_seq = seq
+            if self.is_frozen:
+                continue
+
+            copy = self.copy_frame(ring, seq, frame)
+            if copy is None:
+                continue
+            try:
+                if self.fanout is not None:
+                    self.fanout.submit(copy, rgb=self.capture.to_rgb)
+                else:
+                    qimg = self.display.image(copy, rgb=self.capture.to_rgb)
+                    if qimg is not None:
+                        self.image_data.emit(qimg)
+            finally:
+                release_frame(copy)
+
+    def copy_frame(self, ring, seq, frame):
+        """Pooled copy of a ring slot, None if the writer overwrote it while
+        it was copied (or every copy is still in use)"""
+        if self.pool is None or self.pool.shape != frame.shape:
+            self.pool = FramePool(frame.shape, size=4, max_size=8)
+        copy = self.pool.acquire()
+        if copy is None:
+            return None
+        np.copyto(copy.array, frame)
+        if not ring.is_valid(seq):
+            release_frame(copy)
+            return None
+        return copy
+
+    def toggle_freeze(self):
+        """Freeze or unfreeze the camera feed"""
+        self.is_frozen = not self.is_frozen
+
+    def capture_frame(self):
+        """Ask the capture process to save its next frame; file_saved follows
+        once it is written"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"cam{source_name(self.camera_index)}_capture_{timestamp}.jpg"
+        filepath = os.path.join(self.image_folder, filename)
+        self.capture.send("snapshot", filepath)
+
+    def toggle_recording(self):
+        """Start or stop video recording in the capture process"""
+        if not self.is_recording:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            prefix = f"cam{source_name(self.camera_index)}_video_{timestamp}"
+            # folder, prefix, fps, segment_seconds, fourcc, container
+            self.capture.send("record", self.video_folder, prefix, self.record_fps, self.segment_seconds,
+                              self.record_fourcc, self.record_container)
+            filepath = os.path.join(self.video_folder, f"{prefix}_000.{self.record_container}")
+            self.is_recording = True
+            print(f"Recording started: {filepath}")
+            return filepath
+        self.capture.send("stop_record")
+        self.is_recording = False
+        print("Recording stopped")
+        return None
+
+    def stop(self):
+        self.thread_active = False
+        self.quit()
+        self.wait()
+        if self.record_container == "raw":
+            print("Stopping capture process, raw recordings are compressed first...")
+            self.capture.stop(timeout=None)
+        else:
+            self.capture.stop()
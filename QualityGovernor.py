@@ -0,0 +1,187 @@
+# QualityGovernor.py - Gives up low-priority quality when the machine is overloaded
+#
+# On an overloaded topside laptop everything used to slow down together:
+# live detection, the preview and recording. Once a second the governor looks
+# at CPU headroom (whole machine) and at the stage timings in PIPELINE
+# against their budgets, and moves one knob one step:
+#   overloaded (CPU above `high` or a stage over its budget) for `hold`
+#   checks in a row      -> degrade the first knob of the policy that can
+#   relaxed (CPU below `low` and every stage under `relax` x its budget) for
+#   `recover` checks     -> restore the last knob that was degraded
+# and waits `cooldown` seconds before the next change, so the two thresholds
+# plus the counters keep it from flapping. Recording and the main preview are
+# never knobs, they keep their frame rate.
+#
+# A knob is a ladder of values, full quality first, and a function that
+# applies a value (it only sets attributes, from the governor's thread).
+# Every decision is printed, kept in `decisions` and appended to log_path.
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from PipelineStats import PIPELINE
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class CpuMeter:
+    """Busy fraction of the whole machine since the last call"""
+
+    def __init__(self):
+        self.last = self._read()
+
+    def _read(self):
+        if psutil is not None:
+            psutil.cpu_percent()    # starts psutil's own interval
+            return None
+        try:
+            with open("/proc/stat") as f:
+                fields = [float(v) for v in f.readline().split()[1:]]
+            idle = fields[3] + (fields[4] if len(fields) > 4 else 0.0)
+            return ("proc", sum(fields), idle)
+        except OSError:
+            # no system-wide counter: this process's share of all cores
+            return ("process", time.time() * (os.cpu_count() or 1), time.process_time())
+
+    def busy(self):
+        if psutil is not None:
+            return psutil.cpu_percent() / 100.0
+        now = self._read()
+        kind, total, value = now
+        d_total = total - self.last[1]
+        d_value = value - self.last[2]
+        self.last = now
+        if d_total <= 0:
+            return 0.0
+        if kind == "proc":
+            return 1.0 - d_value / d_total
+        return d_value / d_total
+
+
+class Knob:
+    def __init__(self, name, levels, apply):
+        """levels: values from full quality down, apply(value) sets one"""
+        self.name = name
+        self.levels = list(levels)
+        self.apply = apply
+        self.level = 0
+
+    @property
+    def value(self):
+        return self.levels[self.level]
+
+    def step(self, delta):
+        self.level = min(max(self.level + delta, 0), len(self.levels) - 1)
+        self.apply(self.value)
+        return self.value
+
+
+class QualityGovernor:
+    def __init__(self, knobs, budgets=None, stats=PIPELINE, interval=1.0, high=0.85, low=0.60,
+                 relax=0.7, hold=2, recover=5, cooldown=3.0, log_path=None):
+        """
+        knobs: Knobs in the order they are degraded (least important first)
+        budgets: {stage: max mean ms} for stages in stats, e.g. {"od detect": 60}
+        """
+        self.knobs = list(knobs)
+        self.budgets = budgets or {}
+        self.stats = stats
+        self.interval = interval
+        self.high = high
+        self.low = low
+        self.relax = relax
+        self.hold = hold
+        self.recover = recover
+        self.cooldown = cooldown
+        self.log_path = log_path
+
+        self.cpu = CpuMeter()
+        self.degraded = []             # knobs in the order they were degraded
+        self.over = 0                  # consecutive overloaded checks
+        self.under = 0                 # consecutive relaxed checks
+        self.last_change = 0.0
+        self.last_check = {}
+        self.decisions = deque(maxlen=200)
+        self.active = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True, name="quality-governor")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.active = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def run(self):
+        while self.active:
+            time.sleep(self.interval)
+            self.check()
+
+    def value(self, name):
+        """Current value of a knob, for workers created after a decision"""
+        for knob in self.knobs:
+            if knob.name == name:
+                return knob.value
+        raise KeyError(name)
+
+    # ============================================================
+    # Decisions
+    # ============================================================
+
+    def check(self, now=None):
+        now = time.time() if now is None else now
+        cpu = self.cpu.busy()
+        stages = self.stats.snapshot()
+        over_budget = [f"{stage} {stages[stage]['ms']:.0f}/{budget:.0f} ms"
+                       for stage, budget in self.budgets.items()
+                       if stage in stages and stages[stage]["ms"] > budget]
+        near_budget = any(stages[stage]["ms"] > self.relax * budget
+                          for stage, budget in self.budgets.items() if stage in stages)
+        overloaded = cpu > self.high or bool(over_budget)
+        relaxed = cpu < self.low and not near_budget
+        self.over = self.over + 1 if overloaded else 0
+        self.under = self.under + 1 if relaxed else 0
+        self.last_check = {"cpu": cpu, "over_budget": over_budget, "overloaded": overloaded, "relaxed": relaxed}
+
+        if now - self.last_change < self.cooldown:
+            return None
+        reason = ", ".join([f"CPU {100 * cpu:.0f}%"] + over_budget)
+        if self.over >= self.hold:
+            knob = next((k for k in self.knobs if k.level < len(k.levels) - 1), None)
+            if knob is not None:
+                return self._change(knob, +1, "degrade", reason, now)
+        elif self.under >= self.recover and self.degraded:
+            return self._change(self.degraded[-1], -1, "restore", reason, now)
+        return None
+
+    def _change(self, knob, delta, action, reason, now):
+        old = knob.value
+        new = knob.step(delta)
+        if delta > 0:
+            self.degraded.append(knob)
+        else:
+            self.degraded.pop()
+        self.over = self.under = 0
+        self.last_change = now
+        decision = {"time": now, "action": action, "knob": knob.name, "from": old, "to": new, "reason": reason}
+        self.decisions.append(decision)
+        line = f"Quality {action}: {knob.name} {old} -> {new} ({reason})"
+        print(line)
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(f"{datetime.fromtimestamp(now):%Y-%m-%d %H:%M:%S} {line}\n")
+        return decision
+
+    def summary(self):
+        levels = ", ".join(f"{k.name} {k.value}" for k in self.knobs)
+        cpu = self.last_check.get("cpu")
+        load = f"CPU {100 * cpu:.0f}%, " if cpu is not None else ""
+        return f"Quality: {load}{levels} ({len(self.decisions)} decisions)"
@@ -0,0 +1,311 @@
+# RawCapture.py - Lossless recording into preallocated memory-mapped files
+#
+# mp4v/XVID encoding can't keep up with fast cameras, and it isn't lossless.
+# RawRecorder (container "raw" in CaptureCore.start_recording) copies every
+# frame as it is into a fixed-size slot of a memory-mapped file:
+#
+#   0       magic "ROVRAW1\0", uint64 frames written (updated after each frame)
+#   16      uint32 length + JSON header (width, height, channels, slots, fps)
+#   4096    timestamp table, one float64 capture timestamp per slot
+#   ...     slots, width * height * channels bytes each, 4096-aligned
+#
+# The whole file is allocated when the first frame arrives
+# (segment_seconds * fps slots), so writing is a memcpy into the page cache;
+# a full file rolls over to the next one like the video segments do. Frames
+# are not duplicated or dropped to hold a frame rate: every captured frame is
+# kept with its own timestamp. The frame counter is only advanced once the
+# slot is written, so a reader (or a file left by a crash) never sees a torn
+# frame.
+#
+# RawReader gives random access without decoding: reader[i] is a NumPy view of
+# slot i, reader.at(ts) the frame nearest a timestamp. transcode() turns a raw
+# file into a compressed video plus the same sidecar index the segmented
+# recorder writes; start_transcode() runs it in the background.
+#   python RawCapture.py recorded_videos/cam0_video_001.raw out.mp4
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from FramePool import FrameQueue, frame_array, release_frame
+
+MAGIC = b"ROVRAW1\0"
+HEADER_SIZE = 4096
+ALIGN = 4096
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def layout(width, height, channels, slots):
+    """(slot size, offset of the table, offset of the first slot, file size)"""
+    slot_size = width * height * channels
+    table = HEADER_SIZE
+    first = _aligned(table + 8 * slots)
+    return slot_size, table, first, first + slot_size * slots
+
+
+class RawFile:
+    """One preallocated raw file, written slot by slot"""
+
+    def __init__(self, path, shape, slots, fps):
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        self.path = path
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.slot_size, table, self.first, size = layout(width, height, channels, slots)
+        header = json.dumps({"width": width, "height": height, "channels": channels,
+                             "slots": slots, "fps": fps, "dtype": "uint8"}).encode()
+        if 16 + 4 + len(header) > HEADER_SIZE:
+            raise ValueError("raw header too long")
+
+        self.mm = np.memmap(path, np.uint8, "w+", shape=(size,))
+        self.mm[:16] = np.frombuffer(MAGIC + struct.pack("<Q", 0), np.uint8)
+        self.mm[16:20] = np.frombuffer(struct.pack("<I", len(header)), np.uint8)
+        self.mm[20:20 + len(header)] = np.frombuffer(header, np.uint8)
+        self.count = self.mm[8:16].view(np.uint64)
+        self.timestamps = self.mm[table:table + 8 * slots].view(np.float64)
+        self.frames = self.mm[self.first:].reshape((slots,) + self.shape)
+        self.written = 0
+
+    @property
+    def full(self):
+        return self.written >= self.slots
+
+    def add(self, frame, ts):
+        self.frames[self.written] = frame
+        self.timestamps[self.written] = ts
+        self.written += 1
+        self.count[0] = self.written    # the frame is complete, publish it
+
+    def close(self):
+        self.mm.flush()
+        del self.count, self.timestamps, self.frames
+        self.mm._mmap.close()
+        self.mm = None
+        # unused slots at the end aren't kept
+        with open(self.path, "r+b") as f:
+            f.truncate(self.first + self.slot_size * self.written)
+
+
+class RawRecorder:
+    """Same interface as SegmentedRecorder (start/write/stop, segment_path, stats)"""
+
+    def __init__(self, folder, prefix, fps=30.0, segment_seconds=60, queue_mb=256, on_segment=None):
+        """
+        fps, segment_seconds: size each file for segment_seconds at fps
+        queue_mb: memory the frames waiting for the writer may hold
+        on_segment(path, index): called from the writer thread for each new file
+        """
+        self.folder = folder
+        self.prefix = prefix
+        self.fps = float(fps)
+        self.slots = max(1, int(round(segment_seconds * self.fps)))
+        self.on_segment = on_segment
+        self.queue = FrameQueue(queue_mb * 1024 * 1024)
+        self.thread = None
+        self.recording = False
+        self.lock = threading.Lock()      # recording + queue, for write() vs stop()
+        self.file = None
+        self.segment = -1
+        self.paths = []
+        self.write_time = 0.0
+        self.stats = {"frames_in": 0, "written": 0, "queue_full": 0, "segments": 0, "write_ms": 0.0}
+        os.makedirs(folder, exist_ok=True)
+
+    def segment_path(self, index):
+        return os.path.join(self.folder, f"{self.prefix}_{index:03d}.raw")
+
+    def start(self):
+        self.recording = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        """Queue a frame, never blocks; a PooledFrame hands one reference over"""
+        # under the lock, so no frame is queued behind stop()'s end marker
+        with self.lock:
+            if self.recording and self.queue.put(frame, time.time() if timestamp is None else timestamp):
+                return True
+            if self.recording:
+                self.stats["queue_full"] += 1
+        release_frame(frame)
+        return False
+
+    def stop(self):
+        with self.lock:
+            if not self.recording:
+                return
+            self.recording = False
+            self.queue.close()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, ts = item
+            self.stats["frames_in"] += 1
+            try:
+                self._add(frame_array(frame), ts)
+            except Exception as e:
+                print(f"Recording error: {e}")
+            finally:
+                release_frame(frame)
+        self._close()
+
+    def _add(self, frame, ts):
+        start = time.perf_counter()
+        if self.file is None or self.file.full or self.file.shape != frame.shape:
+            self._open(frame.shape)
+        self.file.add(frame, ts)
+        self.stats["written"] += 1
+        self.write_time += time.perf_counter() - start
+        self.stats["write_ms"] = 1000 * self.write_time / self.stats["written"]
+
+    def _open(self, shape):
+        self._close()
+        self.segment += 1
+        path = self.segment_path(self.segment)
+        self.file = RawFile(path, shape, self.slots, self.fps)
+        self.paths.append(path)
+        self.stats["segments"] += 1
+        if self.on_segment is not None:
+            self.on_segment(path, self.segment)
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class RawReader:
+    """Random access to the frames of a raw file, no decoding"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mm = np.memmap(path, np.uint8, "r")
+        if bytes(self.mm[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a raw capture")
+        length = struct.unpack("<I", bytes(self.mm[16:20]))[0]
+        self.header = json.loads(bytes(self.mm[20:20 + length]).decode())
+        width, height, channels = self.header["width"], self.header["height"], self.header["channels"]
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.fps = self.header["fps"]
+        self.slot_size, table, self.first, _ = layout(width, height, channels, self.header["slots"])
+        self.table = table
+        self.count = self.mm[8:16].view(np.uint64)
+
+    def __len__(self):
+        # a file still being written grows, a truncated one stops at its size
+        complete = (len(self.mm) - self.first) // self.slot_size
+        return int(min(self.count[0], complete))
+
+    def __getitem__(self, index):
+        """Frame `index` as a read-only view into the file"""
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(index)
+        start = self.first + index * self.slot_size
+        return self.mm[start:start + self.slot_size].reshape(self.shape)
+
+    @property
+    def timestamps(self):
+        return self.mm[self.table:self.table + 8 * len(self)].view(np.float64)
+
+    def timestamp(self, index):
+        return float(self.timestamps[index])
+
+    def index_at(self, ts):
+        """Index of the frame captured closest to ts"""
+        stamps = self.timestamps
+        i = int(np.searchsorted(stamps, ts))
+        if i > 0 and (i == len(stamps) or ts - stamps[i - 1] <= stamps[i] - ts):
+            i -= 1
+        return i
+
+    def at(self, ts):
+        return self[self.index_at(ts)]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.mm._mmap.close()
+
+
+# ============================================================
+# Transcoding
+# ============================================================
+
+def transcode(raw_path, out_path=None, fourcc="mp4v", fps=None):
+    """
+    Compress a raw file into a video (at its measured frame rate unless fps is
+    given) with a sidecar <video>.csv of capture timestamps, in the format of
+    SegmentedRecorder's index. Returns the video path.
+    """
+    reader = RawReader(raw_path)
+    n = len(reader)
+    if out_path is None:
+        out_path = os.path.splitext(raw_path)[0] + ".mp4"
+    stamps = reader.timestamps
+    if fps is None:
+        span = float(stamps[-1] - stamps[0]) if n > 1 else 0.0
+        fps = (n - 1) / span if span > 0 else reader.fps
+    h, w = reader.shape[:2]
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+    with open(os.path.splitext(out_path)[0] + ".csv", "w") as index:
+        index.write(f"# fps={fps} size={w}x{h} fourcc={fourcc} source={os.path.basename(raw_path)}\n")
+        index.write("out_frame,capture_ts,source_frame,action\n")
+        for i in range(n):
+            frame = reader[i]
+            writer.write(frame if frame.ndim == 3 else cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+            index.write(f"{i},{stamps[i]:.6f},{i + 1},write\n")
+        index.write("# closed\n")
+    writer.release()
+    reader.close()
+    return out_path
+
+
+def start_transcode(raw_paths, fourcc="mp4v", delete_raw=False, on_done=None):
+    """Transcode raw files one after the other on a background thread;
+    on_done(video_path) after each one"""
+    def work():
+        for path in raw_paths:
+            start = time.time()
+            try:
+                video = transcode(path, fourcc=fourcc)
+            except Exception as e:
+                print(f"Transcoding {path} failed: {e}")
+                continue
+            print(f"Transcoded {path} -> {video} in {time.time() - start:.1f} s")
+            if delete_raw:
+                os.remove(path)
+            if on_done is not None:
+                on_done(video)
+
+    thread = threading.Thread(target=work, daemon=True, name="raw-transcode")
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcode a raw capture to a compressed video")
+    parser.add_argument("raw")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--fourcc", default="mp4v")
+    parser.add_argument("--fps", type=float)
+    args = parser.parse_args()
+    print(f"Written {transcode(args.raw, args.output, args.fourcc, args.fps)}")
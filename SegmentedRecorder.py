@@ -0,0 +1,194 @@
+# SegmentedRecorder.py - Fixed-length, timestamp-accurate video segments
+#
+# Frames are handed over with their capture timestamp and written by a
+# background thread, so encoding and segment rollover never block capture.
+# The output runs at a constant frame rate that follows wall time: when the
+# camera delivers fewer frames the previous one is duplicated, when it
+# delivers more, frames are dropped.
+#
+# Every segment gets a sidecar <segment>.csv with one row per input frame:
+#   out_frame, capture_ts, source_frame, action (write / dup / drop)
+# A segment whose index ends with "# closed" was finalized cleanly; after a
+# crash only the segment being written is lost.
+import os
+import threading
+import time
+
+import cv2
+
+from FramePool import FrameQueue, frame_array, release_frame
+
+
+class SegmentedRecorder:
+    def __init__(self, folder, prefix, fps=30.0, segment_seconds=60, fourcc="mp4v",
+                 container="mp4", max_gap_seconds=5.0, queue_mb=64, on_segment=None):
+        """
+        fps: output frame rate, frames are duplicated/dropped to hold it
+        segment_seconds: length of each file in wall-clock seconds
+        fourcc, container: e.g. "mp4v"/"mp4", "XVID"/"avi", "MJPG"/"avi"
+        max_gap_seconds: longer gaps (camera lost) start a new segment instead
+                         of filling the gap with duplicates
+        queue_mb: memory the frames waiting for the writer may hold, frames
+                  beyond it are dropped (64 MB is ~10 frames at 1080p)
+        on_segment(path, index): called from the writer thread for each new file
+        """
+        self.folder = folder
+        self.prefix = prefix
+        self.fps = float(fps)
+        self.segment_frames = max(1, int(round(segment_seconds * self.fps)))
+        self.fourcc = fourcc
+        self.container = container
+        self.max_gap = max_gap_seconds
+        self.on_segment = on_segment
+
+        self.queue = FrameQueue(queue_mb * 1024 * 1024)
+        self.thread = None
+        self.recording = False
+        self.lock = threading.Lock()      # recording + queue, for write() vs stop()
+
+        self.writer = None
+        self.index_file = None
+        self.segment = -1
+        self.segment_count = 0     # frames in the current segment
+        self.timeline_start = None
+        self.out_frames = 0        # frames written since timeline_start
+        self.last_frame = None
+        self.last_frame_ts = None
+        self.last_ts = None
+        self.source_frames = 0
+
+        self.stats = {"frames_in": 0, "written": 0, "duplicated": 0, "dropped": 0,
+                      "queue_full": 0, "segments": 0}
+
+        os.makedirs(folder, exist_ok=True)
+
+    def segment_path(self, index):
+        return os.path.join(self.folder, f"{self.prefix}_{index:03d}.{self.container}")
+
+    def start(self):
+        self.recording = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        """
+        Queue a frame, never blocks; the frame must not be modified afterwards.
+        A PooledFrame hands one reference over to the recorder.
+        """
+        # under the lock, so no frame is queued behind stop()'s end marker
+        with self.lock:
+            if self.recording and self.queue.put(frame, time.time() if timestamp is None else timestamp):
+                return True
+            if self.recording:
+                self.stats["queue_full"] += 1
+        release_frame(frame)
+        return False
+
+    def stop(self):
+        """Flush queued frames and close the last segment"""
+        with self.lock:
+            if not self.recording:
+                return
+            self.recording = False
+            self.queue.close()
+        self.thread.join()
+
+    # ============================================================
+    # Writer thread
+    # ============================================================
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, ts = item
+            self.stats["frames_in"] += 1
+            self.source_frames += 1
+            try:
+                self._add(frame, ts)
+            except Exception as e:
+                print(f"Recording error: {e}")
+        self._close_segment()
+        release_frame(self.last_frame)
+        self.last_frame = None
+
+    def _add(self, frame, ts):
+        if self.timeline_start is None or (self.last_ts is not None and ts - self.last_ts > self.max_gap):
+            # first frame, or the camera was gone for a while: new timeline
+            self._close_segment()
+            self.timeline_start = ts
+            self.out_frames = 0
+            release_frame(self.last_frame)
+            self.last_frame = None
+
+        self.last_ts = ts
+        # frames the output should contain up to and including this one
+        due = int((ts - self.timeline_start) * self.fps) + 1
+
+        if self.out_frames >= due:
+            self._log(-1, ts, "drop")
+            self.stats["dropped"] += 1
+            release_frame(frame)
+            return
+
+        # fill missing slots with the previous frame
+        while self.last_frame is not None and self.out_frames < due - 1:
+            self._emit(self.last_frame, self.last_frame_ts, "dup")
+            self.stats["duplicated"] += 1
+
+        release_frame(self.last_frame)
+        self.last_frame = frame
+        self.last_frame_ts = ts
+        self._emit(frame, ts, "write")
+        self.stats["written"] += 1
+
+    def _emit(self, frame, ts, action):
+        frame = frame_array(frame)
+        if self.writer is None or self.segment_count >= self.segment_frames:
+            self._open_segment(frame)
+        self.writer.write(frame)
+        self._log(self.segment_count, ts, action)
+        self.segment_count += 1
+        self.out_frames += 1
+
+    def _log(self, out_frame, ts, action):
+        if self.index_file is not None:
+            self.index_file.write(f"{out_frame},{ts:.6f},{self.source_frames},{action}\n")
+
+    def _open_segment(self, frame):
+        self._close_segment()
+        self.segment += 1
+        h, w = frame.shape[:2]
+        path = self.segment_path(self.segment)
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+        # line buffered so the index survives a crash
+        self.index_file = open(os.path.splitext(path)[0] + ".csv", "w", buffering=1)
+        self.index_file.write(f"# fps={self.fps} size={w}x{h} fourcc={self.fourcc}\n")
+        self.index_file.write("out_frame,capture_ts,source_frame,action\n")
+        self.segment_count = 0
+        self.stats["segments"] += 1
+        if self.on_segment is not None:
+            self.on_segment(path, self.segment)
+
+    def _close_segment(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.index_file is not None:
+            self.index_file.write("# closed\n")
+            self.index_file.close()
+            self.index_file = None
+
+
+def read_index(path):
+    """Read a segment's sidecar index -> list of (out_frame, capture_ts, source_frame, action)"""
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#") or line.startswith("out_frame"):
+                continue
+            out_frame, ts, source_frame, action = line.strip().split(",")
+            rows.append((int(out_frame), float(ts), int(source_frame), action))
+    return rows
@@ -0,0 +1,177 @@
+# SharedFrameRing.py - Shared-memory ring of preallocated frame slots
+#
+# One writer (a capture process) publishes frames into a fixed number of slots,
+# readers in other processes map the same memory and get NumPy views of the
+# frames, so nothing is pickled or copied between processes.
+#
+# Every slot carries a sequence number. The writer sets it to -1 while it is
+# filling the slot and to the new sequence number when done; readers check
+# the number again after using a frame to know it wasn't overwritten meanwhile.
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HEADER_DTYPE = np.dtype([
+    ("latest", "i8"),
+    ("slots", "i8"),
+    ("max_h", "i4"),
+    ("max_w", "i4"),
+    ("max_c", "i4"),
+    ("closed", "i4"),
+])
+SLOT_DTYPE = np.dtype([
+    ("seq", "i8"),
+    ("ts", "f8"),
+    ("h", "i4"),
+    ("w", "i4"),
+    ("c", "i4"),
+    ("pad", "i4"),
+])
+ALIGN = 64
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class SharedFrameRing:
+    def __init__(self, name=None, create=False, slots=8, max_shape=(1080, 1920, 3)):
+        """
+        create=True allocates a new ring (the owner must call unlink() at the end),
+        create=False attaches to an existing ring by name.
+        """
+        self.owner = create
+        if create:
+            max_h, max_w, max_c = max_shape
+            self.slot_bytes = _align(max_h * max_w * max_c)
+            size = self._data_offset(slots) + slots * self.slot_bytes
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.header = np.ndarray((), HEADER_DTYPE, self.shm.buf, 0)
+            self.header["latest"] = -1
+            self.header["slots"] = slots
+            self.header["max_h"], self.header["max_w"], self.header["max_c"] = max_h, max_w, max_c
+            self.header["closed"] = 0
+        else:
+            # attaching from a child process shares the parent's resource
+            # tracker, so the owner stays the one that unlinks the ring
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((), HEADER_DTYPE, self.shm.buf, 0)
+            slots = int(self.header["slots"])
+            self.slot_bytes = _align(int(self.header["max_h"]) * int(self.header["max_w"]) * int(self.header["max_c"]))
+
+        self.name = self.shm.name
+        self.slots = slots
+        self.meta = np.ndarray((slots,), SLOT_DTYPE, self.shm.buf, _align(HEADER_DTYPE.itemsize))
+        if create:
+            self.meta["seq"] = -1
+        offset = self._data_offset(slots)
+        self.data = [np.ndarray((self.slot_bytes,), np.uint8, self.shm.buf, offset + i * self.slot_bytes)
+                     for i in range(slots)]
+        self._writing = None
+
+    @staticmethod
+    def _data_offset(slots):
+        return _align(HEADER_DTYPE.itemsize) + _align(slots * SLOT_DTYPE.itemsize)
+
+    @property
+    def max_shape(self):
+        return int(self.header["max_h"]), int(self.header["max_w"]), int(self.header["max_c"])
+
+    # ============================================================
+    # Writer side
+    # ============================================================
+
+    def begin_write(self, shape):
+        """Reserve the next slot and return a view to write the frame into"""
+        h, w = shape[:2]
+        c = shape[2] if len(shape) > 2 else 1
+        max_h, max_w, max_c = self.max_shape
+        if h > max_h or w > max_w or c > max_c:
+            raise ValueError(f"frame {shape} does not fit ring slots {self.max_shape}")
+
+        seq = int(self.header["latest"]) + 1
+        index = seq % self.slots
+        self.meta[index]["seq"] = -1  # readers: slot is being written
+        self._writing = (seq, index, h, w, c)
+        return self.data[index][:h * w * c].reshape((h, w, c) if len(shape) > 2 else (h, w))
+
+    def commit(self, timestamp=None):
+        """Publish the slot filled after begin_write()"""
+        seq, index, h, w, c = self._writing
+        slot = self.meta[index]
+        slot["ts"] = time.time() if timestamp is None else timestamp
+        slot["h"], slot["w"], slot["c"] = h, w, c
+        slot["seq"] = seq
+        self.header["latest"] = seq
+        self._writing = None
+        return seq
+
+    def publish(self, frame, timestamp=None):
+        """Copy a frame into the next slot (one memcpy, no pickling)"""
+        np.copyto(self.begin_write(frame.shape), frame)
+        return self.commit(timestamp)
+
+    def close_stream(self):
+        self.header["closed"] = 1
+
+    # ============================================================
+    # Reader side
+    # ============================================================
+
+    @property
+    def latest_seq(self):
+        return int(self.header["latest"])
+
+    @property
+    def closed(self):
+        return bool(self.header["closed"])
+
+    def get(self, seq):
+        """Zero-copy view of frame seq, or None if it is gone or not written yet"""
+        if seq < 0:
+            return None
+        index = seq % self.slots
+        slot = self.meta[index]
+        if int(slot["seq"]) != seq:
+            return None
+        h, w, c = int(slot["h"]), int(slot["w"]), int(slot["c"])
+        ts = float(slot["ts"])
+        frame = self.data[index][:h * w * c].reshape((h, w, c) if c > 1 else (h, w))
+        return seq, ts, frame
+
+    def latest(self):
+        return self.get(self.latest_seq)
+
+    def is_valid(self, seq):
+        """True if frame seq hasn't been overwritten since it was read"""
+        return int(self.meta[seq % self.slots]["seq"]) == seq
+
+    def wait_next(self, last_seq, timeout=1.0, poll=0.001):
+        """Wait for a frame newer than last_seq and return (seq, ts, view)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            seq = self.latest_seq
+            if seq > last_seq:
+                item = self.get(seq)
+                if item is not None:
+                    return item
+            elif self.closed:
+                return None
+            time.sleep(poll)
+        return None
+
+    def close(self):
+        # drop our views before closing the mapping
+        self.header = None
+        self.meta = None
+        self.data = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a consumer still holds a view, the mapping goes away with the process
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
@@ -0,0 +1,182 @@
+# StallMonitor.py - Finds out what blocks the GUI thread
+#
+# StallMonitor measures event-loop latency with a heartbeat QTimer. A watchdog
+# thread notices when the heartbeat stops for longer than `threshold_ms` and
+# samples the GUI thread's stack (sys._current_frames) for as long as the
+# stall lasts. When the loop recovers, the stall and its most common stacks are
+# printed and appended to stalls.log.
+#
+# SamplingProfiler samples every thread for a few seconds and writes the
+# stacks in "collapsed" format (one "thread;frame;frame count" line per stack,
+# the input of flamegraph.pl / speedscope) to attach to bug reports.
+#
+# install_stall_monitor(window) sets both up, Ctrl+Shift+P records a profile.
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QKeySequence
+
+
+def stack_of(frame, limit=40):
+    """Collapsed stack (outermost first) of a frame"""
+    names = [f"{os.path.basename(fs.filename)}:{fs.name}:{fs.lineno}"
+             for fs in traceback.extract_stack(frame, limit=limit)]
+    return ";".join(names)
+
+
+def thread_names():
+    return {t.ident: t.name for t in threading.enumerate()}
+
+
+class StallMonitor(QObject):
+    def __init__(self, threshold_ms=250, interval_ms=50, sample_ms=10, log_path="stalls.log"):
+        """Create in the GUI thread, it is the thread that gets watched"""
+        super().__init__()
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.sample_interval = sample_ms / 1000.0
+        self.log_path = log_path
+        self.gui_thread = threading.get_ident()
+
+        self.last_beat = time.perf_counter()
+        self.latencies = collections.deque(maxlen=1200)   # last minute at 50 ms
+        self.stalls = 0
+        self.active = True
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._beat)
+        self.timer.start(interval_ms)
+
+        self.thread = threading.Thread(target=self._watch, daemon=True, name="stall-watchdog")
+        self.thread.start()
+
+    def _beat(self):
+        now = time.perf_counter()
+        # how much later than asked the event loop got around to the timer
+        self.latencies.append(max(now - self.last_beat - self.interval, 0.0))
+        self.last_beat = now
+
+    def stats(self):
+        """Event loop latency in ms over the last minute"""
+        if not self.latencies:
+            return {"mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "stalls": self.stalls}
+        values = sorted(self.latencies)
+        return {
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p99_ms": 1000 * values[int(0.99 * (len(values) - 1))],
+            "max_ms": 1000 * values[-1],
+            "stalls": self.stalls,
+        }
+
+    def stop(self):
+        self.active = False
+        self.timer.stop()
+        self.thread.join(timeout=1)
+
+    # ============================================================
+    # Watchdog
+    # ============================================================
+
+    def _watch(self):
+        samples = collections.Counter()
+        stall_start = None
+        while self.active:
+            time.sleep(self.sample_interval)
+            blocked = time.perf_counter() - self.last_beat
+            if blocked > self.threshold + self.interval:
+                if stall_start is None:
+                    stall_start = self.last_beat + self.interval
+                frame = sys._current_frames().get(self.gui_thread)
+                if frame is not None:
+                    samples[stack_of(frame)] += 1
+                del frame
+            elif stall_start is not None:
+                self._report(self.last_beat - stall_start, samples)
+                samples = collections.Counter()
+                stall_start = None
+
+    def _report(self, seconds, samples):
+        self.stalls += 1
+        total = sum(samples.values()) or 1
+        lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S} GUI thread blocked for {1000 * seconds:.0f} ms"]
+        for stack, count in samples.most_common(3):
+            lines.append(f"  {100 * count / total:3.0f}% of samples:")
+            lines.extend(f"    {frame}" for frame in stack.split(";")[-12:])
+        text = "\n".join(lines)
+        print(text)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(text + "\n")
+            except OSError as e:
+                print(f"Cannot write {self.log_path}: {e}")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads for `seconds` and saves them collapsed"""
+
+    def __init__(self, seconds=10.0, interval_ms=5, folder="profiles", on_done=None):
+        self.seconds = seconds
+        self.interval = interval_ms / 1000.0
+        self.folder = folder
+        self.on_done = on_done
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return False
+        self.thread = threading.Thread(target=self.run, daemon=True, name="sampling-profiler")
+        self.thread.start()
+        return True
+
+    def run(self):
+        me = threading.get_ident()
+        counts = collections.Counter()
+        samples = 0
+        end = time.perf_counter() + self.seconds
+        while time.perf_counter() < end:
+            names = thread_names()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, f"thread-{ident}").replace(";", "_").replace(" ", "_")
+                counts[f"{name};{stack_of(frame)}"] += 1
+            frame = None  # don't keep the last thread's frames alive
+            samples += 1
+            time.sleep(self.interval)
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"profile_{datetime.now():%Y%m%d_%H%M%S}.txt")
+        with open(path, "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"Profile saved: {path} ({samples} samples)")
+        if self.on_done is not None:
+            self.on_done(path)
+        return path
+
+
+def install_stall_monitor(window, threshold_ms=250, hotkey="Ctrl+Shift+P", profile_seconds=10.0):
+    """Watch the GUI thread of `window` and bind the profiler hotkey"""
+    from PyQt5.QtWidgets import QShortcut
+
+    window.stall_monitor = StallMonitor(threshold_ms)
+    window.profiler = SamplingProfiler(profile_seconds, on_done=lambda path: print(f"Attach {path} to the bug report"))
+
+    def record():
+        if window.profiler.start():
+            window.statusBar().showMessage(f"Recording a {profile_seconds:.0f}s profile of all threads...", int(profile_seconds * 1000))
+
+    window.profile_shortcut = QShortcut(QKeySequence(hotkey), window)
+    window.profile_shortcut.activated.connect(record)
+    return window.stall_monitor
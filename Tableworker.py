@@ -1,30 +1,27 @@
 # table_worker.py
-import random
 from PyQt5.QtCore import QThread, pyqtSignal
-import time
+from TelemetryCore import TelemetryCore
 
 class TableWorker(QThread):
     # Emit a ready-to-display table payload
     data_ready = pyqtSignal(list)  # Emit list of lists
+    # Alarms that started/cleared in the last batch, and all active ones
+    alarms_changed = pyqtSignal(list, list)
 
-    def __init__(self, update_ms=1000):
+    fields = TelemetryCore.fields
+
+    def __init__(self, update_ms=1000, sample_ms=100, rules=None, log_path=None):
         super().__init__()
         self.update_interval = update_ms / 1000.0  # convert ms -> seconds
-        self.running = True
         self.sensor_labels = ["Sensor 1", "Sensor 2", "Sensor 3"]
+        # sampling, alarms and logging run without the GUI too (headless.py)
+        self.core = TelemetryCore(self.sensor_labels, sample_ms, rules, log_path)
+        self.alarms = self.core.alarms
 
     def run(self):
-        while self.running:
-            readings = []
-            for name in self.sensor_labels:
-                depth = round(random.uniform(0, 100), 2)
-                temp = round(random.uniform(10, 30), 1)
-                battery = int(random.uniform(20, 100))
-                readings.append([depth, temp, battery])  # emit as list
-            self.data_ready.emit(readings)
-            time.sleep(self.update_interval)
+        self.core.run(self.update_interval, self.data_ready.emit, self.alarms_changed.emit)
 
     def stop(self):
-        self.running = False
+        self.core.stop()
         self.quit()
         self.wait()
@@ -0,0 +1,79 @@
+# TelemetryCore.py - Sensor sampling, alarm evaluation and CSV logging
+#
+# TableWorker shows this in the GUI; the headless runtime uses it directly.
+# Sensors are still simulated (random walks) until the real telemetry link
+# is wired in; read_sensors() is the only place that has to change.
+import csv
+import random
+import time
+
+from AlarmEngine import AlarmEngine, DEFAULT_RULES
+
+
+class TelemetryCore:
+    fields = ["depth", "temperature", "battery"]
+
+    def __init__(self, sensor_labels=("Sensor 1", "Sensor 2", "Sensor 3"), sample_ms=100,
+                 rules=None, log_path=None):
+        self.sensor_labels = list(sensor_labels)
+        self.sample_interval = sample_ms / 1000.0
+        self.active = True
+
+        # one channel per sensor value, e.g. "Sensor 1/depth"
+        self.channels = [f"{name}/{field}" for name in self.sensor_labels for field in self.fields]
+        self.alarms = AlarmEngine(self.channels, DEFAULT_RULES if rules is None else rules)
+
+        # simulated sensors drift instead of jumping around
+        self.state = [[random.uniform(0, 50), random.uniform(15, 25), random.uniform(80, 100)]
+                      for _ in self.sensor_labels]
+
+        self.log_file = None
+        self.log = None
+        if log_path:
+            self.log_file = open(log_path, "a", newline="")
+            self.log = csv.writer(self.log_file)
+            if self.log_file.tell() == 0:
+                self.log.writerow(["time"] + self.channels)
+
+    def read_sensors(self):
+        readings = []
+        for values in self.state:
+            values[0] = min(max(values[0] + random.uniform(-0.3, 0.3), 0), 100)
+            values[1] = min(max(values[1] + random.uniform(-0.05, 0.05), 10), 30)
+            values[2] = max(values[2] - random.uniform(0, 0.01), 0)
+            readings.append([round(values[0], 2), round(values[1], 1), int(values[2])])
+        return readings
+
+    def run(self, update_interval=1.0, on_update=None, on_alarms=None):
+        """
+        Sample until stop(). Every update_interval the batch goes through the
+        alarm rules at once and on_update(readings) / on_alarms(changes, active)
+        are called.
+        """
+        next_update = time.time()
+        times, batch = [], []
+        while self.active:
+            readings = self.read_sensors()
+            times.append(time.time())
+            batch.append([value for row in readings for value in row])
+
+            if times[-1] >= next_update:
+                # evaluate all alarm rules over the whole batch at once
+                changes = self.alarms.push(times, batch)
+                if self.log is not None:
+                    self.log.writerows([t] + row for t, row in zip(times, batch))
+                    self.log_file.flush()
+                times, batch = [], []
+                if changes and on_alarms is not None:
+                    on_alarms(changes, self.alarms.active_alarms())
+                if on_update is not None:
+                    on_update(readings)
+                next_update += update_interval
+            time.sleep(self.sample_interval)
+
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = self.log = None
+
+    def stop(self):
+        self.active = False
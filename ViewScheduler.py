@@ -0,0 +1,95 @@
+# ViewScheduler.py - Which views the operator can actually see
+#
+# All workers start in the window's __init__ and used to render at full rate
+# even with their tab in the background or the window minimized. The
+# scheduler watches registered widgets - switching tabs sends Hide/Show to
+# every widget on the pages, minimizing changes the window state - and calls
+# each view's callbacks with True/False when its visibility changes.
+#
+# Callbacks only flip flags. Capture, recording, telemetry sampling, logging
+# and alarms keep running; what stops is the work done only to put pixels on
+# screen (scaling, colour conversion, plotting, filling tables). A view that
+# comes back is told in the same event-loop pass and redrawn from the newest
+# data.
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+
+class ScheduledView:
+    def __init__(self, widget):
+        self.widget = widget
+        self.callbacks = []
+        self.visible = None
+        self.hidden_since = None
+        self.hidden_time = 0.0      # seconds spent hidden, for stats()
+
+
+class ViewScheduler(QObject):
+    EVENTS = (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange)
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.views = {}             # name -> ScheduledView
+        self.pending = False
+        self.changes = 0
+        window.installEventFilter(self)
+
+    def register(self, name, widget, callback):
+        """
+        callback(visible) runs on the GUI thread, right away with the current
+        state and then on every change. Several callbacks can share a name.
+        """
+        view = self.views.get(name)
+        if view is None:
+            view = self.views[name] = ScheduledView(widget)
+            widget.installEventFilter(self)
+            self._set(name, view, self._is_visible(widget), log=False)
+        view.callbacks.append(callback)
+        callback(view.visible)
+        return callback
+
+    def visible(self, name):
+        return self.views[name].visible
+
+    def _is_visible(self, widget):
+        return widget.isVisible() and not self.window.isMinimized()
+
+    # ============================================================
+    # GUI thread
+    # ============================================================
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.EVENTS and not self.pending:
+            # a tab switch hides/shows every child, check once after all of them
+            self.pending = True
+            QTimer.singleShot(0, self.update)
+        return False
+
+    def update(self):
+        self.pending = False
+        for name, view in self.views.items():
+            visible = self._is_visible(view.widget)
+            if visible != view.visible:
+                self._set(name, view, visible)
+                for callback in view.callbacks:
+                    callback(visible)
+
+    def _set(self, name, view, visible, log=True):
+        now = time.time()
+        if visible and view.hidden_since is not None:
+            view.hidden_time += now - view.hidden_since
+            view.hidden_since = None
+        elif not visible and view.hidden_since is None:
+            view.hidden_since = now
+        view.visible = visible
+        if log:
+            self.changes += 1
+            print(f"View {name}: {'shown' if visible else 'hidden'}")
+
+    def stats(self):
+        now = time.time()
+        return {name: {"visible": view.visible,
+                       "hidden_s": view.hidden_time + (now - view.hidden_since if view.hidden_since else 0.0)}
+                for name, view in self.views.items()}
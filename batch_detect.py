@@ -0,0 +1,270 @@
+# batch_detect.py - Run crab detection over whole folders of media, on all cores
+#
+#   python batch_detect.py                          # files/ and recorded_videos/
+#   python batch_detect.py "dives/2025-*/*.mp4" --workers 8 --out report
+#
+# With at least as many videos as workers, every worker decodes whole files
+# (largest first). With fewer, one big file still has to keep every core
+# busy: videos are cut into time ranges (--chunk seconds at most, at least one
+# per worker) and every worker decodes its own. Seeking is inexact for many
+# codecs, so a worker seeks a little before its range (--preroll), tells the
+# frames apart by their timestamp (CAP_PROP_POS_MSEC) and skips the ones
+# before the range and from its end on, which belong to the neighbours. The
+# frames are numbered here in timestamp order; a range that couldn't be read
+# from before its start to its end (or timestamps that don't increase) marks
+# the file incomplete. Images are processed in small groups. Every work item
+# runs the CrabDetector of ObjectDetectionWorker on every frame, in its own
+# process with OpenCV limited to one thread. The motion gate is left out: its
+# state would differ at every range boundary, and without it the result
+# doesn't depend on the split.
+#
+# Writes <out>/frames.csv (one row per frame), <out>/summary.csv and
+# <out>/summary.json (one entry per file). Video results with every frame up
+# to the end of the file go into the DetectionStore under the ungated
+# detector's parameters; the detection tab replays them when it has no pass
+# of its own.
+import argparse
+import csv
+import glob
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+
+from CrabDetector import CrabDetector
+from DetectionStore import DetectionRecorder, DetectionStore
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+
+def find_media(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        paths.extend(p for p in sorted(glob.glob(pattern))
+                     if p.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS))
+    return list(dict.fromkeys(paths))
+
+
+def make_tasks(paths, workers, chunk_seconds, preroll, image_group=32):
+    """
+    (kind, path(s), range, options) work items: image groups, then whole
+    videos or time ranges of videos, (start, end) in ms with the last one
+    open-ended
+    """
+    images = [p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS)]
+    videos = [p for p in paths if not p.lower().endswith(IMAGE_EXTENSIONS)]
+    tasks = [("images", images[i:i + image_group], None, None) for i in range(0, len(images), image_group)]
+    for path in sorted(videos, key=os.path.getsize, reverse=True):
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # only an estimate, the last range reads to the end whatever it says
+        duration = max(cap.get(cv2.CAP_PROP_FRAME_COUNT), 0) / fps
+        cap.release()
+        pieces = max(workers, int(math.ceil(duration / chunk_seconds)))
+        if len(videos) >= workers or duration < pieces * 2 * preroll:
+            tasks.append(("file", path, None, fps))
+            continue
+        bounds = [1000.0 * duration * i / pieces for i in range(pieces)] + [math.inf]
+        for start, end in zip(bounds, bounds[1:]):
+            tasks.append(("range", path, (start, end), (fps, 1000.0 * preroll)))
+    return tasks
+
+
+def init_worker():
+    cv2.setNumThreads(1)  # parallelism comes from the processes
+
+
+def compact(result):
+    # labels are derived from the order, no need to pickle them back
+    return {"count": result["count"], "boxes": result["boxes"],
+            "contours": result["contours"], "shape": result["shape"]}
+
+
+def read_range(path, start, end, preroll, detector):
+    """
+    Detect on the frames with start <= timestamp < end (ms) ->
+    ([(path, timestamp, None, result)], covered, ended). covered: read from
+    before start (or the beginning of the file) up to end or the end of the
+    file with increasing timestamps; ended: the file ended in the range.
+    """
+    back = preroll
+    while True:
+        cap = cv2.VideoCapture(path)
+        seek = max(start - back, 0.0)
+        if seek > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, seek)
+        ret, frame = cap.read()
+        ts = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if seek == 0 or not ret or ts <= start:
+            break
+        cap.release()   # landed inside the range, go further back
+        back *= 4
+
+    out, last, covered = [], -1.0, ret
+    while ret and ts < end:
+        if ts <= last:
+            covered = False   # no usable timestamps, the frames can't be placed
+        last = ts
+        if ts >= start:
+            out.append((path, ts, None, compact(detector.detect(frame))))
+        ret, frame = cap.read()
+        ts = cap.get(cv2.CAP_PROP_POS_MSEC)
+    cap.release()
+    return out, covered, not ret
+
+
+def run_task(task):
+    """
+    Detect on one work item -> ([(path, frame, time, result)], busy, read).
+    read is (path, frames) for a whole video read to its end here, and
+    (path, start, covered, ended) for a range, whose rows have the timestamp
+    in place of the frame number
+    """
+    kind, path, span, options = task
+    detector = CrabDetector()
+    out = []
+    t0 = time.perf_counter()
+    if kind == "images":
+        for image_path in path:
+            image = cv2.imread(image_path)
+            if image is not None:
+                out.append((image_path, 0, 0.0, compact(detector.detect(image))))
+        return out, time.perf_counter() - t0, None
+
+    if kind == "range":
+        fps, preroll = options
+        out, covered, ended = read_range(path, span[0], span[1], preroll, detector)
+        return out, time.perf_counter() - t0, (path, span[0], covered, ended)
+
+    cap = cv2.VideoCapture(path)
+    fps = options
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        out.append((path, len(out), len(out) / fps, compact(detector.detect(frame))))
+    cap.release()
+    return out, time.perf_counter() - t0, (path, len(out))
+
+
+def number_ranges(rows, ranges, fps):
+    """
+    Rows of a video read in ranges, numbered in timestamp order ->
+    (rows, frames); frames is -1 unless the ranges covered the whole file
+    """
+    rows = sorted(rows, key=lambda r: r[1])
+    rows = [(path, i, i / fps, result) for i, (path, _, _, result) in enumerate(rows)]
+    ended = False
+    for _, covered, end in sorted(ranges):
+        if ended:
+            continue      # past the end of the file, nothing to read
+        if not covered:
+            return rows, -1
+        ended = end
+    return rows, len(rows) if ended else -1
+
+
+def summarize(path, rows):
+    counts = [r["count"] for _, _, _, r in rows]
+    return {
+        "file": path,
+        "frames": len(counts),
+        "max_count": max(counts) if counts else 0,
+        "mean_count": sum(counts) / len(counts) if counts else 0.0,
+        "crab_frames": sum(counts),
+        "seconds": rows[-1][2] if rows else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch crab detection over media folders")
+    parser.add_argument("inputs", nargs="*", default=["files", "recorded_videos"],
+                        help="folders or glob patterns")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk", type=float, default=60.0,
+                        help="seconds of video per work item at most (fewer videos than workers)")
+    parser.add_argument("--preroll", type=float, default=1.0,
+                        help="seconds decoded before a range, for inexact seeking")
+    parser.add_argument("--out", default="batch_results")
+    parser.add_argument("--no-store", action="store_true", help="don't fill the detection store")
+    args = parser.parse_args()
+
+    paths = find_media(args.inputs)
+    if not paths:
+        print("No media found")
+        raise SystemExit(1)
+    # the frame count in the header is only for the ETA
+    total = 0
+    for path in paths:
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            total += 1
+        else:
+            cap = cv2.VideoCapture(path)
+            total += max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+            cap.release()
+    print(f"{len(paths)} files, ~{total} frames on {args.workers} workers")
+
+    tasks = make_tasks(paths, args.workers, args.chunk, args.preroll)
+    fps = {task[1]: task[3][0] for task in tasks if task[0] == "range"}
+    decoded = {}
+    ranges = {}
+    per_file = {}
+    done = 0
+    busy = 0.0
+    start = time.time()
+    with mp.Pool(args.workers, initializer=init_worker) as pool:
+        for rows, task_busy, read in pool.imap_unordered(run_task, tasks):
+            if read is not None and len(read) == 2:
+                decoded[read[0]] = read[1]
+            elif read is not None:
+                ranges.setdefault(read[0], []).append(read[1:])
+            for row in rows:
+                per_file.setdefault(row[0], []).append(row)
+            done += len(rows)
+            busy += task_busy
+            elapsed = time.time() - start
+            rate = done / elapsed if elapsed > 0 else 0
+            eta = (total - done) / rate if rate > 0 and total > done else 0
+            print(f"\r{done}/{total} frames  {rate:7.1f} fps  ETA {eta:5.0f}s", end="", flush=True)
+    elapsed = time.time() - start
+    print(f"\rdone: {done} frames in {elapsed:.1f}s ({done / elapsed:.1f} fps, "
+          f"{busy / elapsed:.1f} cores busy)")
+    for path in ranges:
+        per_file[path], decoded[path] = number_ranges(per_file.get(path, []), ranges[path], fps[path])
+
+    os.makedirs(args.out, exist_ok=True)
+    store = DetectionStore()
+    summaries = []
+    with open(os.path.join(args.out, "frames.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "frame", "time", "count", "boxes"])
+        for path in paths:
+            rows = sorted(per_file.get(path, []), key=lambda r: r[1])
+            for _, frame, t, result in rows:
+                boxes = ";".join("%d,%d,%d,%d" % box for box in result["boxes"])
+                writer.writerow([path, frame, f"{t:.3f}", result["count"], boxes])
+            summaries.append(summarize(path, rows))
+
+            if not args.no_store and rows and path.lower().endswith(VIDEO_EXTENSIONS):
+                # only a pass over every frame of the file is stored
+                if [r[1] for r in rows] != list(range(decoded.get(path, -1))):
+                    print(f"{path}: frames missing, not stored")
+                    continue
+                recorder = DetectionRecorder()
+                for _, _, t, result in rows:
+                    recorder.add(t, result)
+                store.save(path, CrabDetector().params, recorder)
+
+    with open(os.path.join(args.out, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summaries[0]))
+        writer.writeheader()
+        writer.writerows(summaries)
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summaries, f, indent=2)
+    print(f"Results in {args.out}/")
@@ -0,0 +1,47 @@
+# bench_alarms.py - Cost of the alarm engine with many rules at a high sample rate
+#
+#   python benchmarks/bench_alarms.py --rules 300 --hz 100 --batch 10
+#
+# Feeds random telemetry for 9 channels and evaluates every rule once per
+# batch. Prints the time per evaluation and the CPU share it would take.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from AlarmEngine import AlarmEngine
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=300)
+    parser.add_argument("--hz", type=float, default=100)
+    parser.add_argument("--batch", type=int, default=10, help="samples per evaluation")
+    parser.add_argument("--seconds", type=float, default=120, help="simulated telemetry")
+    args = parser.parse_args()
+
+    channels = [f"Sensor {i}/{f}" for i in range(1, 4) for f in ("depth", "temperature", "battery")]
+    rules = [{"name": f"rule {j}", "channel": random.choice(channels),
+              "kind": random.choice(["threshold", "average", "rate", "time_to_empty"]),
+              "window": random.choice([1, 5, 10, 30, 60]), "op": random.choice([">", "<"]),
+              "limit": random.uniform(0, 100)} for j in range(args.rules)]
+    engine = AlarmEngine(channels, rules, capacity=int(args.hz * 64))
+
+    samples = int(args.seconds * args.hz)
+    times = np.arange(samples) / args.hz
+    values = np.cumsum(np.random.randn(samples, len(channels)), axis=0)
+
+    events = 0
+    start = time.perf_counter()
+    for i in range(0, samples, args.batch):
+        events += len(engine.push(times[i:i + args.batch], values[i:i + args.batch]))
+    elapsed = time.perf_counter() - start
+
+    evaluations = (samples + args.batch - 1) // args.batch
+    print(f"{len(engine.rules)} rules, {args.hz:.0f} Hz, batches of {args.batch}: "
+          f"{1e6 * elapsed / evaluations:.0f} us per evaluation, "
+          f"{100 * elapsed / args.seconds:.2f}% of one core, {events} alarm changes")
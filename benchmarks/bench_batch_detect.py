@@ -0,0 +1,75 @@
+# bench_batch_detect.py - batch_detect throughput against the number of workers
+#
+#   python benchmarks/bench_batch_detect.py                  # synthetic 720p videos
+#   python benchmarks/bench_batch_detect.py --videos a.mp4 b.mp4 --workers 1 2 4 8
+#
+# Runs batch_detect.py as the command line would, once per worker count and
+# mode: "files" with at least as many videos as workers (every worker decodes
+# its own files) and "ranges" with a single video (every worker decodes its
+# own time range of it). Reports frames per second and the
+# speed-up over one worker, and checks that every run wrote the same
+# per-frame results.
+import argparse
+import csv
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+
+from bench_tracker import transect
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def make_videos(folder, count, frames, shape=(720, 1280)):
+    first = os.path.join(folder, "transect0.avi")
+    writer = cv2.VideoWriter(first, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (shape[1], shape[0]))
+    for frame, _ in transect(frames, shape=shape):
+        writer.write(frame)
+    writer.release()
+    videos = [first]
+    for i in range(1, count):
+        videos.append(os.path.join(folder, f"transect{i}.avi"))
+        shutil.copy(first, videos[-1])
+    return videos
+
+
+def run(videos, workers, out):
+    text = subprocess.run([sys.executable, os.path.join(ROOT, "batch_detect.py"), *videos,
+                           "--workers", str(workers), "--out", out, "--no-store"],
+                          capture_output=True, text=True, check=True).stdout
+    fps = float(re.search(r"done: \d+ frames in [\d.]+s \(([\d.]+) fps", text).group(1))
+    with open(os.path.join(out, "frames.csv")) as f:
+        rows = [row[1:] for row in csv.reader(f)]   # without the file name
+    return fps, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", nargs="+")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    temp = tempfile.mkdtemp()
+    videos = args.videos or make_videos(temp, max(args.workers), args.frames)
+    reference = None
+    for mode, inputs in (("files", videos), ("ranges", videos[:1])):
+        base = None
+        for workers in args.workers:
+            fps, rows = run(inputs, workers, os.path.join(temp, f"{mode}{workers}"))
+            base = base or fps
+            if reference is None:
+                reference = rows[:args.frames + 1]
+            same = rows[:len(reference)] == reference
+            used = "files" if len(inputs) >= workers else "ranges"
+            print(f"{mode:6s} {workers:2d} workers ({used}): {fps:7.1f} fps  x{fps / base:.2f}"
+                  f"  {'same results' if same else 'RESULTS DIFFER'}")
+    shutil.rmtree(temp)
@@ -0,0 +1,93 @@
+# bench_bgr_display.py - Per-frame cost of getting a BGR camera frame on screen
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_bgr_display.py
+#
+# Compares the display paths a camera worker can use for one frame:
+#   copy      cvtColor into a new RGB array + RGB888 QImage (the original workers)
+#   pooled    cvtColor into a pooled RGB buffer + RGB888 QImage (FramePool path)
+#   bgr       QImage straight over the BGR buffer (Format_BGR888)
+#   bgrx      widened into a pooled BGRX buffer, Format_RGB32 (FrameImage default)
+# "worker" is the capture-thread side, "gui" is QPixmap.fromImage plus painting
+# the label, both in milliseconds per frame.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from FrameImage import BGR_NATIVE, DisplayBuffers, rgb_qimage
+from FramePool import FramePool
+
+
+def copy_path(frame, state):
+    return rgb_qimage(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def pooled_path(frame, state):
+    pool = state.setdefault("pool", FramePool(frame.shape, size=2))
+    rgb = pool.acquire()
+    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb.array)
+    state["last"] = rgb
+    return rgb_qimage(rgb.array)
+
+
+def bgr_path(frame, state):
+    display = state.setdefault("display", DisplayBuffers(direct=True))
+    return display.image(frame)
+
+
+def bgrx_path(frame, state):
+    display = state.setdefault("display", DisplayBuffers())
+    return display.image(frame)
+
+
+def done(state):
+    """What the GUI's 'drawn' slot does for each path"""
+    if "last" in state:
+        state.pop("last").release()
+    if "display" in state:
+        state["display"].displayed()
+
+
+def measure(path, frames, label, count):
+    state = {}
+    worker = gui = 0.0
+    for i in range(count):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        qimg = path(frame, state)
+        middle = time.perf_counter()
+        label.setPixmap(QPixmap.fromImage(qimg))
+        label.repaint()
+        done(state)
+        end = time.perf_counter()
+        worker += middle - start
+        gui += end - middle
+    return 1000 * worker / count, 1000 * gui / count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    label = QLabel()
+    label.setScaledContents(True)
+    label.resize(960, 540)
+    label.show()
+    frames = [np.random.randint(0, 255, (args.height, args.width, 3), np.uint8) for _ in range(4)]
+
+    print(f"Format_BGR888 available: {BGR_NATIVE}")
+    for name, path in (("copy", copy_path), ("pooled", pooled_path), ("bgr", bgr_path), ("bgrx", bgrx_path)):
+        measure(path, frames, label, 10)   # warm up
+        worker, gui = measure(path, frames, label, args.frames)
+        print(f"{name:7s} worker {worker:6.2f} ms/frame   gui {gui:6.2f} ms/frame   total {worker + gui:6.2f}")
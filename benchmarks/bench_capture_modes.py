@@ -0,0 +1,133 @@
+# bench_capture_modes.py - Threaded capture vs capture process + shared memory
+#
+#   python benchmarks/bench_capture_modes.py video.mp4 --seconds 10 --gui-load-ms 8
+#
+# The video is replayed by stream_server.py on localhost so both modes read a
+# paced "camera". --gui-load-ms burns that much Python time per displayed frame
+# in the consumer to stand in for the Qt event loop holding the GIL.
+# Reports frames delivered, age of each frame when the consumer picks it up
+# and total CPU time.
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from NetworkSource import open_capture
+from ProcessCapture import CaptureProcess
+from stream_server import StreamServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def cpu_seconds():
+    """CPU time of this process plus finished child processes"""
+    if resource is None:
+        t = os.times()
+        return t.user + t.system
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def gui_work(ms):
+    """Pure Python busy loop, holds the GIL like slow Qt slots do"""
+    end = time.perf_counter() + ms / 1000.0
+    x = 0
+    while time.perf_counter() < end:
+        x += 1
+    return x
+
+
+def run_threaded(url, seconds, gui_load_ms):
+    latest = {"frame": None, "ts": 0.0, "seq": 0}
+    lock = threading.Lock()
+    active = True
+
+    def capture():
+        cap = open_capture(url)
+        while active:
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            ts = time.time()
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with lock:
+                latest["frame"], latest["ts"] = rgb, ts
+                latest["seq"] += 1
+        cap.release()
+
+    thread = threading.Thread(target=capture, daemon=True)
+    thread.start()
+    latencies, last_seq = [], 0
+    end = time.time() + seconds
+    while time.time() < end:
+        with lock:
+            seq, ts, frame = latest["seq"], latest["ts"], latest["frame"]
+        if seq == last_seq:
+            time.sleep(0.001)
+            continue
+        last_seq = seq
+        float(np.mean(frame[::64, ::64]))  # touch the frame
+        latencies.append(time.time() - ts)
+        gui_work(gui_load_ms)
+    active = False
+    thread.join()
+    return latencies
+
+
+def run_process(url, seconds, gui_load_ms):
+    capture = CaptureProcess(url, max_shape=(1080, 1920, 3)).start()
+    ring = capture.ring
+    latencies, last_seq = [], -1
+    end = time.time() + seconds
+    while time.time() < end:
+        item = ring.wait_next(last_seq, timeout=0.5)
+        if item is None:
+            continue
+        seq, ts, frame = item
+        last_seq = seq
+        float(np.mean(frame[::64, ::64]))  # zero-copy view into shared memory
+        latencies.append(time.time() - ts)
+        gui_work(gui_load_ms)
+    capture.stop()
+    return latencies
+
+
+def report(name, latencies, cpu, seconds):
+    if not latencies:
+        print(f"{name:10s} no frames")
+        return
+    lat = np.array(latencies) * 1000
+    print(f"{name:10s} frames={len(lat):5d} fps={len(lat) / seconds:6.1f} "
+          f"latency p50={np.percentile(lat, 50):6.1f}ms p95={np.percentile(lat, 95):6.1f}ms "
+          f"cpu={cpu:6.2f}s ({100 * cpu / seconds:5.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--gui-load-ms", type=float, default=8)
+    parser.add_argument("--port", type=int, default=5650)
+    args = parser.parse_args()
+
+    for i, (name, fn) in enumerate((("threaded", run_threaded), ("process", run_process))):
+        port = args.port + i
+        server = StreamServer(args.video, "udp", "127.0.0.1", port).start()
+        url = f"mjpeg+udp://127.0.0.1:{port}"
+        time.sleep(0.5)
+        start_cpu = cpu_seconds()
+        latencies = fn(url, args.seconds, args.gui_load_ms)
+        server.stop()
+        report(name, latencies, cpu_seconds() - start_cpu, args.seconds)
@@ -0,0 +1,112 @@
+# bench_display_fanout.py - GUI-thread cost of showing one camera in four labels
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_display_fanout.py --seconds 5
+#
+# "before" is main.py's old x(): the full-resolution QImage converted to a
+# QPixmap for each of the four labels and scaled by QLabel while painting.
+# "after" submits the frame to a DisplayFanout (main view at every frame,
+# thumbnails at 10 fps). Reports GUI-thread milliseconds per camera frame
+# (slots + repaint) and the fan-out thread's scaling time.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from DisplayFanout import DisplayFanout
+
+
+def make_labels():
+    labels = []
+    for w, h in ((960, 540), (320, 180), (320, 180), (320, 180)):
+        label = QLabel()
+        label.setScaledContents(True)
+        label.resize(w, h)
+        label.show()
+        labels.append(label)
+    return labels
+
+
+def before(app, frames, labels, seconds):
+    gui = 0.0
+    shown = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        frame = frames[shown % len(frames)]
+        start = time.perf_counter()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)   # was done in the capture thread
+        h, w, ch = rgb.shape
+        qimg = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
+        gui_start = time.perf_counter()
+        for label in labels:
+            label.setPixmap(QPixmap.fromImage(qimg))
+        for label in labels:
+            label.repaint()
+        gui += time.perf_counter() - gui_start
+        shown += 1
+        app.processEvents()
+        wait(start)
+    return shown, gui
+
+
+def after(app, frames, labels, seconds):
+    fanout = DisplayFanout(labels, [None, 10, 10, 10])
+    gui = [0.0]
+    show = fanout._show
+
+    def timed_show(index, qimg):
+        start = time.perf_counter()
+        show(index, qimg)
+        fanout.views[index].label.repaint()
+        gui[0] += time.perf_counter() - start
+    fanout._show = timed_show
+    fanout.frame_ready.disconnect()
+    fanout.frame_ready.connect(timed_show)
+    fanout.start()
+
+    shown = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        start = time.perf_counter()
+        fanout.submit(frames[shown % len(frames)])
+        shown += 1
+        # spin the event loop for the rest of the frame
+        while time.perf_counter() - start < 1 / 30.0:
+            app.processEvents()
+            time.sleep(0.001)
+    app.processEvents()
+    stats = fanout.stats()
+    fanout.stop()
+    return shown, gui[0], stats
+
+
+def wait(start):
+    sleep = 1 / 30.0 - (time.perf_counter() - start)
+    if sleep > 0:
+        time.sleep(sleep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    frames = [np.random.randint(0, 255, (args.height, args.width, 3), np.uint8) for _ in range(4)]
+    labels = make_labels()
+
+    n, gui = before(app, frames, labels, args.seconds)
+    print(f"before: {n} frames, GUI thread {1000 * gui / n:6.2f} ms/frame")
+
+    n, gui, stats = after(app, frames, labels, args.seconds)
+    views = ", ".join(f"{v['size'][0]}x{v['size'][1]} shown {v['shown']}" for v in stats["views"])
+    print(f"after:  {n} frames, GUI thread {1000 * gui / n:6.2f} ms/frame, "
+          f"scaling thread {stats['scale_ms']:.2f} ms/frame, dropped {stats['dropped']} ({views})")
@@ -0,0 +1,135 @@
+# bench_frame_pool.py - CameraWorker memory churn and CPU, before/after the frame pool
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_frame_pool.py --seconds 5
+#
+# Runs the original CameraWorker loop (copy + fresh RGB array per frame, busy
+# spinning while frozen) and the pooled one against the same fake 1080p camera,
+# first live and then frozen. Reports CPU use and the peak of traced NumPy
+# allocations (frame-sized arrays allocated and freed per frame show up there;
+# with the pool it stays at zero).
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+import CaptureCore
+from CameraDisplay import CameraWorker
+
+
+class FakeCamera:
+    """Paced camera that hands out a new array per read like most drivers"""
+
+    def __init__(self, shape=(1080, 1920, 3), fps=30):
+        self.frame = np.random.randint(0, 255, shape, np.uint8)
+        self.delay = 1.0 / fps
+        self.next_time = time.time()
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        self.next_time += self.delay
+        sleep = self.next_time - time.time()
+        if sleep > 0:
+            time.sleep(sleep)
+        if image is not None and image.shape == self.frame.shape:
+            np.copyto(image, self.frame)
+            return True, image
+        return True, self.frame.copy()
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        pass
+
+
+class LegacyCameraWorker(CameraWorker):
+    """CameraWorker.run as it was before the frame pool"""
+
+    def __init__(self, camera_index=0):
+        super().__init__(camera_index)
+        self.thread_active = True
+        self.current_frame = None
+
+    def run(self):
+        cap = CaptureCore.open_capture(self.camera_index)
+        while self.thread_active:
+            if not self.is_frozen:
+                ret, frame = cap.read()
+                if not ret:
+                    continue
+                self.current_frame = frame.copy()
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                h, w, ch = rgb.shape
+                qimg = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
+                self.image_data.emit(qimg)
+            else:
+                if self.frozen_frame is not None:
+                    rgb = cv2.cvtColor(self.frozen_frame, cv2.COLOR_BGR2RGB)
+                    h, w, ch = rgb.shape
+                    qimg = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
+                    self.image_data.emit(qimg)
+        cap.release()
+
+    def toggle_freeze(self):
+        self.is_frozen = not self.is_frozen
+        if self.is_frozen and self.current_frame is not None:
+            self.frozen_frame = self.current_frame.copy()
+
+    def stop(self):
+        self.thread_active = False
+        self.wait()
+
+
+def measure(app, worker, shown, seconds, frozen):
+    if not worker.isRunning():
+        worker.start()
+        spin(app, 1.0)  # warm up
+    if frozen:
+        worker.toggle_freeze()
+
+    tracemalloc.start()
+    shown[0] = 0
+    cpu, wall = time.process_time(), time.time()
+    spin(app, seconds)
+    cpu, wall = time.process_time() - cpu, time.time() - wall
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return shown[0], 100 * cpu / wall, peak
+
+
+def spin(app, seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        app.processEvents()
+        time.sleep(0.002)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    CaptureCore.open_capture = lambda source, api=None: FakeCamera((args.height, args.width, 3))
+
+    for name, cls in (("before", LegacyCameraWorker), ("after", CameraWorker)):
+        worker = cls(0)
+        shown = [0]
+        worker.image_data.connect(lambda img: (QPixmap.fromImage(img), shown.__setitem__(0, shown[0] + 1)))
+        for frozen in (False, True):
+            frames, cpu, peak = measure(app, worker, shown, args.seconds, frozen)
+            mode = "frozen" if frozen else "live"
+            print(f"{name:6s} {mode:6s} frames={frames:5d} cpu={cpu:5.1f}% traced_peak={peak / 1e6:7.1f}MB")
+        worker.stop()
@@ -0,0 +1,77 @@
+# bench_motion_gate.py - Detection cost and accuracy with and without the motion gate
+#
+#   python benchmarks/bench_motion_gate.py --video dive.mp4
+#   python benchmarks/bench_motion_gate.py            # synthetic hover/move clip
+#
+# Runs the full detector on every frame (reference) and the GatedDetector as
+# ObjectDetectionWorker/objectW use it, then reports the skip rate, time per
+# frame and how often the reused result differs from the full detection.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from CrabDetector import CrabDetector
+from MotionGate import GatedDetector, MotionGate
+
+
+def synthetic_clip(frames=600, shape=(720, 1280)):
+    """ROV hovering (sensor noise only) with a few stretches of movement"""
+    rng = np.random.default_rng(1)
+    background = np.full(shape + (3,), (90, 60, 40), np.uint8)
+    crabs = [(200, 300), (600, 400), (900, 200)]
+    for i in range(frames):
+        moving = (i // 100) % 3 == 2          # every third 100-frame stretch moves
+        offset = (i % 100) * 4 if moving else 0
+        frame = background.copy()
+        for x, y in crabs:
+            cv2.rectangle(frame, (x + offset, y), (x + offset + 70, y + 50), (40, 160, 60), -1)
+        noise = rng.integers(0, 6, frame.shape, dtype=np.uint8)
+        yield cv2.add(frame, noise)
+
+
+def video_frames(path):
+    cap = cv2.VideoCapture(path)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+    cap.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video")
+    parser.add_argument("--refresh-every", type=int, default=15)
+    parser.add_argument("--changed-fraction", type=float, default=0.005)
+    args = parser.parse_args()
+
+    frames = list(video_frames(args.video) if args.video else synthetic_clip())
+    detector = CrabDetector()
+
+    start = time.perf_counter()
+    reference = [detector.detect(f)["count"] for f in frames]
+    full_ms = 1000 * (time.perf_counter() - start) / len(frames)
+
+    gated = GatedDetector(CrabDetector(), MotionGate(refresh_every=args.refresh_every,
+                                                      changed_fraction=args.changed_fraction),
+                          audit_every=0)
+    start = time.perf_counter()
+    counts = [gated.detect(f)["count"] for f in frames]
+    gated_ms = 1000 * (time.perf_counter() - start) / len(frames)
+
+    wrong = sum(a != b for a, b in zip(counts, reference))
+    error = sum(abs(a - b) for a, b in zip(counts, reference)) / len(frames)
+    stats = gated.stats()
+    print(f"frames: {len(frames)}")
+    print(f"full detection: {full_ms:6.2f} ms/frame")
+    print(f"motion gated:   {gated_ms:6.2f} ms/frame (gate {stats['gate_ms']:.2f} ms), "
+          f"skipped {100 * stats['skip_rate']:.1f}%")
+    print(f"accuracy: count differs on {wrong} frames ({100 * wrong / len(frames):.1f}%), "
+          f"mean count error {error:.3f}")
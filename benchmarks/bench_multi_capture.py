@@ -0,0 +1,70 @@
+# bench_multi_capture.py - Aligned sets from three cameras running at different rates
+#
+#   python benchmarks/bench_multi_capture.py --seconds 10
+#   python benchmarks/bench_multi_capture.py --videos left.mp4 right.mp4 down.mp4
+#
+# Video files stand in for the cameras, each played in real time at its own
+# frame rate (synthetic ones at 30, 25 and 15 fps by default). Runs the
+# "drop" and the "duplicate" policy and reports per-camera rate, set rate,
+# skew within the sets and how many sets were dropped or filled with
+# duplicates. A consumer checks that every set is within the tolerance.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from MultiCapture import MultiCapture, file_camera
+
+
+def make_video(path, fps, seconds=4, shape=(360, 640)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (shape[1], shape[0]))
+    for i in range(int(fps * seconds)):
+        frame = np.full(shape + (3,), 40, np.uint8)
+        cv2.putText(frame, f"{fps:.0f} fps #{i}", (20, 180), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", nargs="+")
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--tolerance", type=float, default=0.025)
+    args = parser.parse_args()
+
+    temp = None
+    videos = args.videos
+    if not videos:
+        temp = tempfile.mkdtemp()
+        videos = [make_video(os.path.join(temp, f"cam{fps}.avi"), fps) for fps in (30, 25, 15)]
+
+    for missing in ("drop", "duplicate"):
+        worst = [0.0]
+
+        def check(frameset):
+            worst[0] = max(worst[0], max(abs(t - frameset["time"]) for name, t in frameset["stamps"].items()
+                                         if name not in frameset["duplicated"]))
+
+        multi = MultiCapture(args.tolerance, missing, on_set=check)
+        for i, video in enumerate(videos):
+            multi.add(file_camera(video), name=f"cam{i}")
+        multi.start()
+        time.sleep(1.0)   # cameras open
+        start_sets = multi.sets
+        time.sleep(args.seconds)
+        sets = multi.sets - start_sets
+        multi.stop()
+        print(f"{missing}: {sets / args.seconds:.1f} sets/s, furthest fresh frame "
+              f"{1000 * worst[0]:.1f} ms from its anchor (tolerance {1000 * args.tolerance:.0f} ms)")
+        print(f"  {multi.summary()}")
+
+    if temp is not None:
+        shutil.rmtree(temp)
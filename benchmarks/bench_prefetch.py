@@ -0,0 +1,103 @@
+# bench_prefetch.py - Detection playback: decode in line vs decode ahead
+#
+#   python benchmarks/bench_prefetch.py                    # synthetic recording
+#   python benchmarks/bench_prefetch.py --video dive.mp4 --images captured_images
+#
+# "sequential" is the old worker loop (cap.read() then detect on one thread),
+# "prefetch" reads through PrefetchReader. Both run flat out, then "paced"
+# plays the video at its own frame rate the old way (sleep a full frame
+# period after detecting) and the new way (sleep for what is left of it).
+# Image folders compare VideoCapture on one file after the other with the
+# parallel folder decode. Reports end-to-end frames per second.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+
+from bench_tracker import transect
+from CrabDetector import CrabDetector
+from PrefetchReader import PrefetchReader, image_paths
+
+
+def make_recording(folder, frames, shape=(1080, 1920)):
+    video = os.path.join(folder, "transect.mp4")
+    images = os.path.join(folder, "images")
+    os.makedirs(images)
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"mp4v"), 30.0, (shape[1], shape[0]))
+    for i, (frame, _) in enumerate(transect(frames, shape=shape)):
+        writer.write(frame)
+        if i < 60:
+            cv2.imwrite(os.path.join(images, f"{i:04d}.jpg"), frame)
+    writer.release()
+    return video, images
+
+
+def play(cap, detector, delay=0.0, pace="none"):
+    frames = 0
+    start = next_time = time.time()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        detector.detect(frame)
+        frames += 1
+        if pace == "old":
+            time.sleep(delay)
+        elif pace == "new":
+            next_time = max(next_time + delay, time.time())
+            time.sleep(max(next_time - time.time(), 0))
+    cap.release()
+    return frames / (time.time() - start)
+
+
+def images_one_by_one(folder):
+    class Files:
+        def __init__(self):
+            self.paths = image_paths(folder)
+
+        def read(self):
+            if not self.paths:
+                return False, None
+            cap = cv2.VideoCapture(self.paths.pop(0))
+            ret, frame = cap.read()
+            cap.release()
+            return ret, frame
+
+        def release(self):
+            pass
+    return Files()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video")
+    parser.add_argument("--images")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    temp = None
+    video, images = args.video, args.images
+    if video is None:
+        temp = tempfile.mkdtemp()
+        video, images = make_recording(temp, args.frames)
+    detector = CrabDetector()
+    fps = cv2.VideoCapture(video).get(cv2.CAP_PROP_FPS) or 30.0
+    print(f"{video}: {fps:.0f} fps source, {os.cpu_count()} cores")
+
+    print(f"sequential      {play(cv2.VideoCapture(video), detector):6.1f} fps")
+    print(f"prefetch        {play(PrefetchReader(video), detector):6.1f} fps")
+    print(f"paced, old loop {play(cv2.VideoCapture(video), detector, 1 / fps, 'old'):6.1f} fps")
+    print(f"paced, prefetch {play(PrefetchReader(video), detector, 1 / fps, 'new'):6.1f} fps")
+    if images:
+        print(f"images one by one  {play(images_one_by_one(images), detector):6.1f} fps")
+        print(f"images prefetched  {play(PrefetchReader(images), detector):6.1f} fps")
+
+    if temp is not None:
+        shutil.rmtree(temp)
@@ -0,0 +1,71 @@
+# bench_pyramid.py - Detection speed and accuracy at different processing scales
+#
+#   python benchmarks/bench_pyramid.py                     # synthetic 1080p frames
+#   python benchmarks/bench_pyramid.py --video dive.mp4 --frames 200
+#
+# Full-resolution detection (scale 1.0) is the reference. For every scale,
+# with and without full-resolution refinement, reports ms/frame, how often
+# the count matches the reference and the mean IoU of matched boxes.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from CrabDetector import CrabDetector
+from tune_detector import iou
+
+
+def synthetic_frames(n=60, shape=(1080, 1920)):
+    rng = np.random.default_rng(2)
+    for _ in range(n):
+        frame = np.full(shape + (3,), (90, 60, 40), np.uint8)
+        for _ in range(rng.integers(2, 8)):
+            w, h = rng.integers(30, 160, 2)
+            x, y = rng.integers(0, shape[1] - w), rng.integers(0, shape[0] - h)
+            cv2.ellipse(frame, (int(x + w // 2), int(y + h // 2)), (int(w // 2), int(h // 2)),
+                        float(rng.integers(0, 180)), 0, 360, (40, 160, 60), -1)
+        yield cv2.add(frame, rng.integers(0, 25, frame.shape, dtype=np.uint8))
+
+
+def video_frames(path, n):
+    cap = cv2.VideoCapture(path)
+    while n > 0:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        n -= 1
+        yield frame
+    cap.release()
+
+
+def mean_iou(boxes, reference):
+    scores = [max((iou(b, r) for r in reference), default=0.0) for b in boxes]
+    return sum(scores) / len(scores) if scores else 1.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--scales", default="1.0,0.75,0.5,0.33,0.25")
+    args = parser.parse_args()
+
+    frames = list(video_frames(args.video, args.frames) if args.video else synthetic_frames(args.frames))
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    reference = [CrabDetector().detect(f)["boxes"] for f in frames]
+
+    for scale in (float(s) for s in args.scales.split(",")):
+        for refine in ((False,) if scale >= 1.0 else (False, True)):
+            detector = CrabDetector({"scale": scale, "refine": refine})
+            start = time.perf_counter()
+            results = [detector.detect(f)["boxes"] for f in frames]
+            ms = 1000 * (time.perf_counter() - start) / len(frames)
+            same = sum(len(r) == len(ref) for r, ref in zip(results, reference))
+            overlap = np.mean([mean_iou(r, ref) for r, ref in zip(results, reference)])
+            print(f"scale {scale:4.2f}{' +refine' if refine else '        '}  {ms:7.2f} ms/frame  "
+                  f"count match {100 * same / len(frames):5.1f}%  box IoU {overlap:.3f}")
@@ -0,0 +1,70 @@
+# bench_raw_capture.py - Writer cost per frame: raw memory-mapped slots vs encoders
+#
+#   python benchmarks/bench_raw_capture.py --frames 120 --out /tmp/rawbench
+#
+# Feeds the same 1080p frames straight to the recorders' writer code (no
+# queue, no capture) and reports milliseconds per frame and the frame rate
+# one writer thread can sustain, then random access into the raw file.
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from RawCapture import RawFile, RawReader
+
+
+def frames_like_video(n, shape):
+    # a moving gradient plus noise: compresses like footage, not like noise
+    yy, xx = np.mgrid[0:shape[0], 0:shape[1]]
+    rng = np.random.default_rng(1)
+    for i in range(n):
+        base = ((xx + 4 * i) % 256).astype(np.uint8)
+        frame = np.dstack([base, (yy % 256).astype(np.uint8), 255 - base])
+        yield cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--out", default="raw_bench")
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    frames = list(frames_like_video(args.frames, shape))
+    os.makedirs(args.out, exist_ok=True)
+
+    for name, fourcc, ext in (("mp4v", "mp4v", "mp4"), ("XVID", "XVID", "avi"), ("MJPG", "MJPG", "avi")):
+        path = os.path.join(args.out, f"bench.{ext}")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 30.0, (args.width, args.height))
+        start = time.perf_counter()
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+        ms = 1000 * (time.perf_counter() - start) / len(frames)
+        print(f"{name:5s} {ms:7.2f} ms/frame  {1000 / ms:6.1f} fps  {os.path.getsize(path) / 2 ** 20:7.1f} MB")
+
+    path = os.path.join(args.out, "bench.raw")
+    start = time.perf_counter()
+    raw = RawFile(path, shape, len(frames), 30.0)
+    for i, frame in enumerate(frames):
+        raw.add(frame, i / 30.0)
+    raw.close()
+    ms = 1000 * (time.perf_counter() - start) / len(frames)
+    print(f"raw   {ms:7.2f} ms/frame  {1000 / ms:6.1f} fps  {os.path.getsize(path) / 2 ** 20:7.1f} MB")
+
+    reader = RawReader(path)
+    order = np.random.default_rng(0).permutation(len(reader))
+    start = time.perf_counter()
+    same = all(np.array_equal(reader[int(i)], frames[int(i)]) for i in order)
+    ms = 1000 * (time.perf_counter() - start) / len(order)
+    print(f"raw random access {ms:.2f} ms/frame (with compare), lossless {same}")
+    reader.close()
+    shutil.rmtree(args.out)
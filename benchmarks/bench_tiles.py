@@ -0,0 +1,56 @@
+# bench_tiles.py - Tile-parallel detection on high-resolution frames
+#
+#   python benchmarks/bench_tiles.py                       # synthetic 4K frames
+#   python benchmarks/bench_tiles.py --video survey.mp4 --frames 60
+#
+# Runs CrabDetector with 1, 2, 4 and 8 threads (bands segmented on a thread
+# pool, contours found once on the stitched mask) and reports ms/frame, the
+# speed-up over one thread and whether masks and detections are identical
+# to the single-pass result. --cv-threads sets OpenCV's own thread count,
+# which competes with the pool for the same cores.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+
+from bench_pyramid import synthetic_frames, video_frames
+from CrabDetector import CrabDetector
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--cv-threads", type=int)
+    args = parser.parse_args()
+
+    if args.cv_threads is not None:
+        cv2.setNumThreads(args.cv_threads)
+    frames = list(video_frames(args.video, args.frames) if args.video
+                  else synthetic_frames(args.frames, shape=(2160, 3840)))
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"{os.cpu_count()} cores, OpenCV threads {cv2.getNumThreads()}")
+
+    single = CrabDetector({"scale": args.scale})
+    reference = [single.detect(f) for f in frames]
+    base = None
+    for threads in (int(t) for t in args.threads.split(",")):
+        detector = CrabDetector({"scale": args.scale}, threads=threads)
+        detector.detect(frames[0])   # starts the pool
+        start = time.perf_counter()
+        results = [detector.detect(f) for f in frames]
+        ms = 1000 * (time.perf_counter() - start) / len(frames)
+        base = base or ms
+        same_mask = all(np.array_equal(detector.mask(f), single.segment(f)) for f in frames[:3])
+        same = all(r["count"] == ref["count"] and r["boxes"] == ref["boxes"]
+                   for r, ref in zip(results, reference))
+        print(f"{threads} threads  {ms:8.2f} ms/frame  speed-up {base / ms:4.2f}x  "
+              f"mask identical {same_mask}  detections identical {same}")
@@ -0,0 +1,80 @@
+# bench_tracker.py - Unique-crab counts and detection cost of the tracker
+#
+#   python benchmarks/bench_tracker.py
+#
+# Synthetic transect: crabs enter, cross the frame at different speeds and
+# leave, so the true number of individuals is known. Compares the per-frame
+# maximum count (what the old "Count:" gave), and the tracker's unique total
+# and ID switches with detection on every frame and every Nth frame.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+
+from CrabDetector import CrabDetector
+from CrabTracker import CrabTracker, box_iou
+
+
+def transect(frames=600, shape=(720, 1280), crabs=25, seed=3):
+    """Yields (frame, [(crab_index, box)]) for crabs swimming across the view"""
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.integers(0, frames - 150, crabs))
+    speeds = rng.uniform(3, 9, crabs)
+    rows = rng.integers(40, shape[0] - 100, crabs)
+    sizes = rng.integers(40, 70, (crabs, 2))
+    texture = rng.integers(0, 40, shape + (3,), dtype=np.uint8)
+    for i in range(frames):
+        frame = cv2.add(np.full(shape + (3,), (90, 60, 40), np.uint8), texture)
+        truth = []
+        for k in range(crabs):
+            x = int((i - starts[k]) * speeds[k]) - sizes[k][0]
+            if i < starts[k] or x > shape[1]:
+                continue
+            y = int(rows[k] + 15 * np.sin(i / 20.0 + k))
+            w, h = sizes[k]
+            cv2.ellipse(frame, (x + w // 2, y + h // 2), (w // 2, h // 2), 0, 0, 360, (40, 160, 60), -1)
+            cv2.circle(frame, (x + w // 3, y + h // 3), 4, (20, 90, 30), -1)   # texture for the flow
+            truth.append((k, (x, y, w, h)))
+        yield frame, truth
+
+
+def id_switches(history):
+    """Times a true crab's matched track id changed"""
+    last, switches = {}, 0
+    for truth, result in history:
+        for k, box in truth:
+            best = max(zip(result["ids"], result["boxes"]), key=lambda e: box_iou(box, e[1]), default=None)
+            if best is None or box_iou(box, best[1]) < 0.3:
+                continue
+            if k in last and last[k] != best[0]:
+                switches += 1
+            last[k] = best[0]
+    return switches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--crabs", type=int, default=25)
+    args = parser.parse_args()
+
+    clip = list(transect(args.frames, crabs=args.crabs))
+    truth_total = len({k for _, truth in clip for k, _ in truth})
+    max_count = max(CrabDetector().count(f) for f, _ in clip[::5])
+    print(f"{len(clip)} frames, {truth_total} crabs crossed; max per-frame count {max_count}")
+
+    for every in (1, 2, 3, 5, 10):
+        tracker = CrabTracker(CrabDetector(), detect_every=every)
+        history = []
+        start = time.perf_counter()
+        for frame, truth in clip:
+            history.append((truth, tracker.update(frame)))
+        ms = 1000 * (time.perf_counter() - start) / len(clip)
+        print(f"detect every {every:2d}: unique {tracker.unique:3d} (truth {truth_total}), "
+              f"id switches {id_switches(history):3d}, {ms:6.2f} ms/frame, "
+              f"detection on {100 * tracker.detections_run / len(clip):3.0f}% of frames")
@@ -0,0 +1,97 @@
+# bench_view_scheduler.py - CPU used by the live view with its tab shown and hidden
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/bench_view_scheduler.py --seconds 5
+#
+# A tab widget holds the four camera labels of main.py on one page and an
+# empty page next to it. A 30 fps "camera" thread submits 1080p frames to a
+# DisplayFanout. The same run is done with the camera page shown, with the
+# other page shown and with the window minimized, and reports process CPU
+# time per second of wall time (1.0 = one core busy) plus how many images
+# each camera view drew.
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication, QGridLayout, QLabel, QMainWindow, QTabWidget, QWidget
+
+from DisplayFanout import DisplayFanout
+from ViewScheduler import ViewScheduler
+
+
+def make_window():
+    window = QMainWindow()
+    tabs = QTabWidget()
+    window.setCentralWidget(tabs)
+    camera_page = QWidget()
+    grid = QGridLayout(camera_page)
+    labels = []
+    for i, (row, col, span) in enumerate(((0, 0, 3), (1, 0, 1), (1, 1, 1), (1, 2, 1))):
+        label = QLabel()
+        label.setScaledContents(True)
+        label.setMinimumSize(960 if i == 0 else 320, 540 if i == 0 else 180)
+        grid.addWidget(label, row, col, 1, span)
+        labels.append(label)
+    tabs.addTab(camera_page, "Camera")
+    tabs.addTab(QWidget(), "Table")
+    window.resize(1000, 800)
+    return window, tabs, labels
+
+
+def camera(fanout, frames, running):
+    n = 0
+    while running.is_set():
+        start = time.perf_counter()
+        fanout.submit(frames[n % len(frames)])
+        n += 1
+        time.sleep(max(1 / 30.0 - (time.perf_counter() - start), 0))
+
+
+def measure(app, fanout, seconds):
+    shown = [v.shown for v in fanout.views]
+    cpu, wall = time.process_time(), time.time()
+    while time.time() - wall < seconds:
+        app.processEvents()
+        time.sleep(0.002)
+    cpu, wall = time.process_time() - cpu, time.time() - wall
+    return cpu / wall, [v.shown - s for v, s in zip(fanout.views, shown)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    window, tabs, labels = make_window()
+    fanout = DisplayFanout(labels, [None, 10, 10, 10])
+    views = ViewScheduler(window)
+    for i, label in enumerate(labels):
+        views.register(f"camera {i}", label, lambda visible, i=i: fanout.set_visible(i, visible))
+    window.show()
+    app.processEvents()
+
+    frames = [np.random.randint(0, 255, (1080, 1920, 3), np.uint8) for _ in range(4)]
+    running = threading.Event()
+    running.set()
+    fanout.start()
+    thread = threading.Thread(target=camera, args=(fanout, frames, running), daemon=True)
+    thread.start()
+
+    for name, switch in (("camera tab", lambda: tabs.setCurrentIndex(0)),
+                         ("other tab", lambda: tabs.setCurrentIndex(1)),
+                         ("camera tab", lambda: tabs.setCurrentIndex(0)),
+                         ("minimized", window.showMinimized),
+                         ("restored", window.showNormal)):
+        switch()
+        app.processEvents()
+        load, shown = measure(app, fanout, args.seconds)
+        print(f"{name:11s} CPU {load:5.2f} cores   camera views drew {shown}")
+
+    running.clear()
+    thread.join()
+    fanout.stop()
@@ -8,23 +8,37 @@ import os
 import sys
 from datetime import datetime
 from object import objectW
+from CaptureCore import CaptureCore
+from FrameImage import DisplayBuffers
 
 class cameraW(QThread):
     img = pyqtSignal(QtGui.QImage)
+    status = pyqtSignal(str)
+    # recording settings
+    record_fourcc = 'mp4v'
+    record_container = 'mp4'
+    segment_seconds = 60
     def __init__(self,index,fileList,scbutton,vButton,dButton,detectLabel):
         super().__init__()
-        self.active = True
         self.index = index
         self.fileList = fileList
         self.screenshotButton = scbutton
         self.scIndex = 1
         self.recording = False
-        self.video = None
         self.vIndex = 1
         self.recordButton = vButton
         self.detectButton = dButton
         self.detectLabel = detectLabel
         self.odW =None
+        self.detect_visible = True
+        # index can also be a network URL, e.g. "mjpeg+udp://0.0.0.0:5600"
+        # the core reopens the camera with backoff when it drops out
+        self.core = CaptureCore(self.index, cv2.CAP_DSHOW, on_frame=self.show,
+                                on_status=self.status.emit)
+        # DisplayFanout that scales frames for each label, instead of img
+        self.fanout = None
+        # frames emitted on img that the GUI hasn't drawn yet
+        self.display = DisplayBuffers()
 
         self.folder_path = "files"
         os.makedirs(self.folder_path,exist_ok=True)
@@ -37,28 +51,18 @@ class cameraW(QThread):
         self.detectButton.clicked.connect(self.objectdetect)
 
     def run(self):
-        self.cap = cv2.VideoCapture(self.index, cv2.CAP_DSHOW)
-
-        if not self.cap.isOpened():
-            print("Camera could not be opened")
+        # display lives in the GUI thread: queued behind the GUI's slots, so it
+        # runs once the frame was drawn
+        self.img.connect(self.display.displayed)
+        self.core.run()
+
+    def show(self, frame, timestamp):
+        if self.fanout is not None:
+            self.fanout.submit(frame)
             return
-            
-        while self.active:
-            ret, self.frame = self.cap.read()
-
-            if not ret:
-                print("Failed to grab frame")
-                continue
-
-            if self.recording and self.video is not None:
-                self.video.write(self.frame)
-
-            frame_rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame_rgb.shape
-            bytes_per_line = ch * w
-
-            qimage = QtGui.QImage(frame_rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
-
+        # BGR straight to Qt, the buffer is kept until the image was drawn
+        qimage = self.display.image(frame)
+        if qimage is not None:
             self.img.emit(qimage)
 
     def load_exisiting_files(self):
@@ -89,7 +93,7 @@ class cameraW(QThread):
         filename = f'{self.scIndex}_{timestamp}.png'
         print(filename)
         filepath = os.path.join(self.folder_path, filename)
-        cv2.imwrite(filepath,self.frame)
+        self.core.snapshot(filepath)
         self.load_exisiting_files()
         self.scIndex += 1
     
@@ -98,21 +102,17 @@ class cameraW(QThread):
         if self.recording:
             self.recordButton.setText('Stop recording')
             self.recordButton.setStyleSheet('QPushButton {background-color: red}')
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = 30.0
 
             format_string = "%Y_%m_%d_%H_%M_%S"
             timestamp = datetime.now().strftime(format_string)
-            filename = f'{self.vIndex}_{timestamp}.mp4'
-            filepath = os.path.join(self.folder_path, filename)
-            self.video = cv2.VideoWriter(filepath,fourcc,fps,(frame_width, frame_height))
+            # split into segments with a timestamp index next to each one (fps from the camera)
+            self.core.start_recording(self.folder_path, f'{self.vIndex}_{timestamp}', None,
+                                      self.segment_seconds, self.record_fourcc, self.record_container)
         else:
             self.recordButton.setText('Record')
             self.recordButton.setStyleSheet('')
             self.vIndex += 1
-            self.video.release()
+            self.core.stop_recording()
             self.load_exisiting_files()
 
     def objectdetect(self):
@@ -127,10 +127,16 @@ class cameraW(QThread):
             self.odW = None
 
         self.odW = objectW(filepath,self.detectLabel)
+        self.odW.visible = self.detect_visible
         self.odW.start()
 
+    def set_detect_visible(self, visible):
+        """ViewScheduler callback for the detection label"""
+        self.detect_visible = visible
+        if self.odW is not None:
+            self.odW.visible = visible
+
     def stop(self):
-        self.active = False
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
+        self.core.stop()
+        self.wait()
         self.quit()
\ No newline at end of file
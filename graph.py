@@ -3,6 +3,7 @@ from PyQt5.QtCore import QThread
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 import time
+import threading
 
 class canvas(FigureCanvasQTAgg):
     def __init__(self, parent=None, width=5, height=5, dpi=100):
@@ -19,29 +20,50 @@ class graphW(QThread):
         self.yl = []
         self.index = 1
         self.graph = graph
+        # the data keeps coming while the Graph tab is hidden, only drawing stops
+        self.visible = True
+        self.wake = threading.Event()
+        self.interval = 1   # seconds per point, QualityGovernor can raise it
 
         self.canva = canvas()
         self.graph.addWidget(self.canva)
 
+    def set_visible(self, visible):
+        self.visible = visible
+        if visible:
+            self.wake.set()   # redraw now, not at the next point
+
+    def set_interval(self, seconds):
+        self.interval = seconds
+
     def run(self):
+        next_point = time.time()
         while self.active:
-            self.xl.append(self.index)
-            self.yl.append(random.randint(1,100))
-            self.index += 1
+            if time.time() >= next_point:
+                next_point += self.interval
+                self.xl.append(self.index)
+                self.yl.append(random.randint(1,100))
+                self.index += 1
+
+                if len(self.xl) > 20:
+                    self.xl = self.xl[-20:]
+                    self.yl = self.yl[-20:]
 
-            if len(self.xl) > 20:
-                self.xl = self.xl[-20:]
-                self.yl = self.yl[-20:]
+            if self.visible:
+                self.draw()
 
-            self.canva.ax.clear()
-            self.canva.ax.plot(self.xl,self.yl,marker='o',color='r')
-            self.canva.ax.set_xlabel("x")
-            self.canva.ax.set_ylabel("y")
-            self.canva.ax.set_title("title")
-            self.canva.draw()
+            self.wake.wait(max(next_point - time.time(), 0))
+            self.wake.clear()
 
-            time.sleep(1)
+    def draw(self):
+        self.canva.ax.clear()
+        self.canva.ax.plot(self.xl,self.yl,marker='o',color='r')
+        self.canva.ax.set_xlabel("x")
+        self.canva.ax.set_ylabel("y")
+        self.canva.ax.set_title("title")
+        self.canva.draw()
 
     def stop(self):
         self.active = False
+        self.wake.set()
         self.quit()
\ No newline at end of file
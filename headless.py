@@ -0,0 +1,274 @@
+# headless.py - Run capture, recording, detection and telemetry without the GUI
+#
+#   python headless.py --camera 0 --record --detect --telemetry-log telemetry.csv
+#   python headless.py --camera video.mp4 --camera mjpeg+udp://0.0.0.0:5600 --detect --serve 5601
+#   python headless.py --camera "fake://?fps=60" --detect --detect-fps 0 --duration 30
+#
+# Each camera runs in its own CaptureCore thread at full speed, nothing is
+# rendered. With --serve the newest frames are published over TCP and the GUI
+# can attach as a viewer by opening "mjpeg+tcp://<host>:<port>" as its camera.
+import argparse
+import csv
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+from CaptureCore import CaptureCore
+from CrabDetector import CrabDetector
+from FramePool import frame_array, release_frame
+from NetworkSource import source_name
+from TelemetryCore import TelemetryCore
+from AlarmEngine import format_alarm, load_rules
+from Enhancer import Enhancer
+from PipelineStats import PIPELINE
+from QualityGovernor import QualityGovernor, Knob
+from RawCapture import RawRecorder, start_transcode
+
+
+def parse_source(text):
+    return int(text) if text.isdigit() else text
+
+
+class DetectionLoop:
+    """Detects on the newest frame of a camera, as fast as allowed by max_fps"""
+
+    def __init__(self, core, detector, max_fps=5.0, on_result=None):
+        self.core = core
+        self.detector = detector
+        self.set_max_fps(max_fps)
+        self.on_result = on_result
+        self.active = True
+        self.frames = 0
+        self.busy = 0.0
+        self.last_count = 0
+        self.thread = None
+
+    def set_max_fps(self, max_fps):
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.active = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def run(self):
+        last = None
+        next_time = time.time()
+        while self.active:
+            frame = self.core.current()
+            if frame is None or frame is last:
+                release_frame(frame)
+                time.sleep(0.005)
+                continue
+            release_frame(last)
+            last = frame
+
+            start = time.time()
+            result = self.detector.detect(frame_array(frame))
+            self.busy += time.time() - start
+            PIPELINE.add(f"{self.core.name} detect", time.time() - start)
+            self.frames += 1
+            self.last_count = result["count"]
+            if self.on_result is not None:
+                self.on_result(self.core.name, start, result)
+
+            next_time = max(next_time + self.min_interval, time.time())
+            time.sleep(max(next_time - time.time(), 0))
+        release_frame(last)
+
+
+class Runtime:
+    def __init__(self, args):
+        self.args = args
+        self.cores = []
+        self.detectors = []
+        self.telemetry = None
+        self.publisher = None
+        self.governor = None
+        self.detection_log = None
+        self.log_lock = threading.Lock()
+
+    def start(self):
+        args = self.args
+        if args.serve:
+            from stream_server import FramePublisher
+            self.publisher = FramePublisher(args.serve_host, args.serve, max_fps=args.serve_fps).start()
+
+        if args.detections_csv:
+            new = not os.path.exists(args.detections_csv)
+            self.detection_log = open(args.detections_csv, "a", newline="")
+            self.detection_writer = csv.writer(self.detection_log)
+            if new:
+                self.detection_writer.writerow(["time", "camera", "count", "boxes"])
+
+        for i, text in enumerate(args.camera or ["0"]):
+            source = parse_source(text)
+            on_frame = None
+            if self.publisher is not None and i == 0:
+                on_frame = self.publisher.publish  # viewers get the first camera
+            # index in the name, two fake:// or file sources can share a source_name
+            name = f"cam{i}_{source_name(source)}"
+            core = CaptureCore(source, on_frame=on_frame, name=name,
+                               on_status=print,
+                               on_file=lambda path, index: print(f"Recording: {path}"))
+            if args.enhance:
+                core.enhancer = Enhancer()
+            self.cores.append(core.start())
+            if args.record:
+                timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+                prefix = f"{name}_{timestamp}"
+                self._when_ready(core, lambda core=core, prefix=prefix: core.start_recording(
+                    args.out, prefix, None, args.segment_seconds, args.fourcc, args.container))
+            if args.detect:
+                detector = CrabDetector({"scale": args.detect_scale, "refine": args.refine},
+                                        threads=args.detect_threads)
+                loop = DetectionLoop(core, detector, args.detect_fps, self.log_detection)
+                self.detectors.append(loop.start())
+
+        if args.governor and self.detectors:
+            self.governor = self.make_governor().start()
+
+        if args.telemetry_log or args.alarms:
+            rules = load_rules(args.rules) if args.rules else None
+            self.telemetry = TelemetryCore(rules=rules, log_path=args.telemetry_log)
+            threading.Thread(target=self.telemetry.run, daemon=True,
+                             kwargs={"on_alarms": self.log_alarms}).start()
+
+    def make_governor(self):
+        """Under overload detection gets slower, then coarser; capture,
+        recording and serving keep their rate"""
+        args = self.args
+        fps = args.detect_fps
+        scale = args.detect_scale
+
+        def set_fps(value):
+            for det in self.detectors:
+                det.set_max_fps(value)
+
+        def set_scale(value):
+            for det in self.detectors:
+                det.detector.set_scale(value)
+
+        budgets = {}
+        if fps:
+            # a detection that takes longer than its slot can't keep the rate
+            budgets = {f"{det.core.name} detect": 1000.0 / fps for det in self.detectors}
+        return QualityGovernor([
+            Knob("detect fps", [fps, fps / 2, fps / 4] if fps else [0, 10, 5], set_fps),
+            Knob("detect scale", [scale, scale * 0.75, scale * 0.5], set_scale),
+        ], budgets, log_path=args.governor_log)
+
+    def _when_ready(self, core, action):
+        # recording needs the camera's fps, so wait for the first frame
+        def wait():
+            while core.active and core.frames == 0:
+                time.sleep(0.05)
+            if core.active:
+                action()
+        threading.Thread(target=wait, daemon=True).start()
+
+    def log_detection(self, camera, timestamp, result):
+        if self.detection_log is None:
+            return
+        boxes = ";".join("%d,%d,%d,%d" % box for box in result["boxes"])
+        with self.log_lock:
+            self.detection_writer.writerow([f"{timestamp:.3f}", camera, result["count"], boxes])
+
+    def log_alarms(self, changes, active):
+        for alarm in changes:
+            state = "ALARM" if alarm["active"] else "cleared"
+            print(f"{state}: {format_alarm(alarm)}")
+
+    def print_stats(self, elapsed):
+        for i, core in enumerate(self.cores):
+            line = f"{core.name}: {core.frames / elapsed:6.1f} fps captured"
+            if core.recording:
+                line += ", recording"
+            if i < len(self.detectors):
+                det = self.detectors[i]
+                ms = 1000 * det.busy / det.frames if det.frames else 0
+                line += f", {det.frames / elapsed:5.1f} fps detected ({ms:.1f} ms), {det.last_count} crabs"
+            print(line)
+        print(f"Pipeline: {PIPELINE.summary()}")
+        if self.governor is not None:
+            print(self.governor.summary())
+
+    def stop(self):
+        if self.governor is not None:
+            self.governor.stop()
+        for det in self.detectors:
+            det.stop()
+        raw = []
+        for core in self.cores:
+            recorder = core.stop_recording()
+            if isinstance(recorder, RawRecorder):
+                raw += recorder.paths
+            core.stop()
+        if raw and self.args.transcode:
+            start_transcode(raw, self.args.fourcc, self.args.delete_raw).join()
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        if self.publisher is not None:
+            self.publisher.stop()
+        if self.detection_log is not None:
+            self.detection_log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ROV pipeline without the GUI")
+    parser.add_argument("--camera", action="append",
+                        help="camera index, video file or network URL (repeatable, default 0)")
+    parser.add_argument("--record", action="store_true", help="record every camera")
+    parser.add_argument("--out", default="files", help="recording folder")
+    parser.add_argument("--segment-seconds", type=float, default=60)
+    parser.add_argument("--fourcc", default="mp4v")
+    parser.add_argument("--container", default="mp4", help='"raw": lossless memory-mapped files (RawCapture)')
+    parser.add_argument("--transcode", action="store_true", help="compress raw recordings with --fourcc at exit")
+    parser.add_argument("--delete-raw", action="store_true", help="remove raw files once transcoded")
+    parser.add_argument("--detect", action="store_true", help="run crab detection on every camera")
+    parser.add_argument("--detect-fps", type=float, default=5.0, help="0 = as fast as possible")
+    parser.add_argument("--detect-scale", type=float, default=1.0,
+                        help="processing scale for detection, e.g. 0.5 at 1080p")
+    parser.add_argument("--detect-threads", type=int, default=1,
+                        help="segment frames in parallel bands, same results (4K cameras)")
+    parser.add_argument("--refine", action="store_true", help="full-resolution outlines at --detect-scale < 1")
+    parser.add_argument("--governor", action="store_true",
+                        help="lower detection rate, then resolution, while the machine is overloaded")
+    parser.add_argument("--governor-log", help="append the governor's decisions to this file")
+    parser.add_argument("--enhance", action="store_true",
+                        help="murky-water enhancement before detection and serving (recordings stay raw)")
+    parser.add_argument("--detections-csv", help="append detections to this CSV file")
+    parser.add_argument("--telemetry-log", help="append telemetry samples to this CSV file")
+    parser.add_argument("--alarms", action="store_true", help="evaluate telemetry alarms without logging")
+    parser.add_argument("--rules", help="alarm rules JSON file")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="publish the first camera for GUI viewers")
+    parser.add_argument("--serve-host", default="0.0.0.0")
+    parser.add_argument("--serve-fps", type=float, default=15)
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = until Ctrl+C)")
+    parser.add_argument("--stats-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    runtime = Runtime(args)
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *a: stop.set())
+    signal.signal(signal.SIGTERM, lambda *a: stop.set())
+
+    runtime.start()
+    start = time.time()
+    next_stats = start + args.stats_interval
+    while not stop.is_set():
+        if args.duration and time.time() - start >= args.duration:
+            break
+        stop.wait(0.2)
+        if args.stats_interval and time.time() >= next_stats:
+            runtime.print_stats(time.time() - start)
+            next_stats += args.stats_interval
+    runtime.stop()
+    runtime.print_stats(time.time() - start)
@@ -7,11 +7,20 @@ from matplotlib.figure import Figure
 import cv2
 import os
 import sys
+from datetime import datetime
 
 from camera import cameraW
 from graph import graphW
 from timer import timerW
 from table import tableW
+from StallMonitor import install_stall_monitor
+from DisplayFanout import camera_fanouts
+from ViewScheduler import ViewScheduler
+from QualityGovernor import QualityGovernor, Knob
+
+# Cameras for camLeft, camRight and camDown, e.g. ROV_SIDE_CAMERAS="1,2,3"
+# (indexes, URLs or video files); labels without one show the main camera
+SIDE_CAMERAS = [s for s in os.environ.get("ROV_SIDE_CAMERAS", "").split(",") if s.strip()]
 
 class mainWindow(QMainWindow):
     def __init__(self):
@@ -22,19 +31,64 @@ class mainWindow(QMainWindow):
         self.mainWorker = cameraW(0,self.listWidget,self.screenshot,self.record,self.objectdetect,self.Object_Label)
         self.gworker = graphW(self.graph)
         self.tableWorker = tableW(self.Table_2,self.calc)
-        self.mainWorker.img.connect(lambda img: self.x(img))
+        labels = [self.mainDisplay, self.camLeft, self.camRight, self.camDown]
+        # each label gets the frame at its own size, thumbnails at 10 fps;
+        # side cameras are captured on their own threads and lined up with
+        # the main one, the screenshot button saves the aligned set too
+        self.fanouts, self.label_views, self.multi = camera_fanouts(labels, SIDE_CAMERAS)
+        if self.multi is not None:
+            self.multi.attach(self.mainWorker.core)
+            self.screenshot.clicked.connect(self.snapshot_set)
+        self.fanout = self.fanouts[0]
+        self.mainWorker.fanout = self.fanout
+        self.mainWorker.status.connect(lambda text: self.statusbar.showMessage(text))
         self.timerworker = timerW(self.taskLabel,self.missionLabel,self.startButton,self.resetButton)
 
+        for fanout in self.fanouts:
+            fanout.start()
         self.mainWorker.start()
+        if self.multi is not None:
+            self.multi.start()
         self.gworker.start()
         self.timerworker.start()
         self.tableWorker.start()
-    
-    def x(self,img):
-        self.mainDisplay.setPixmap(QtGui.QPixmap.fromImage(img))
-        self.camLeft.setPixmap(QtGui.QPixmap.fromImage(img))
-        self.camRight.setPixmap(QtGui.QPixmap.fromImage(img))
-        self.camDown.setPixmap(QtGui.QPixmap.fromImage(img))
+
+        # views on hidden tabs or in a minimized window aren't drawn
+        # (capture, recording and the mission timers keep running)
+        self.views = ViewScheduler(self)
+        for label, (fanout, index) in zip(labels, self.label_views):
+            self.views.register(label.objectName(), label,
+                                lambda visible, f=fanout, index=index: f.set_visible(index, visible))
+        self.views.register("graph", self.gworker.canva, self.gworker.set_visible)
+        self.views.register("detection", self.Object_Label, self.mainWorker.set_detect_visible)
+
+        # under CPU overload the thumbnails and the graph slow down first,
+        # the main view and recording keep their frame rate
+        self.governor = QualityGovernor([
+            Knob("graph interval", [1, 2, 5], self.gworker.set_interval),
+            Knob("thumbnail fps", [10, 5, 2],
+                 lambda fps: [fanout.set_fps(index, fps) for fanout, index in self.label_views[1:]]),
+        ], budgets={"display scale": 15}, log_path="quality.log").start()
+
+        # logs what blocks the GUI thread, Ctrl+Shift+P records a profile
+        install_stall_monitor(self)
+
+    def snapshot_set(self):
+        # after cameraW's own screenshot: one image per camera, same moment
+        prefix = f"set_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
+        if self.multi.snapshot(self.mainWorker.folder_path, prefix):
+            self.mainWorker.load_exisiting_files()
+
+    def closeEvent(self, event):
+        self.mainWorker.stop()
+        if self.multi is not None:
+            self.multi.stop()
+        for fanout in self.fanouts:
+            fanout.stop()
+        self.governor.stop()
+        self.gworker.stop()
+        self.stall_monitor.stop()
+        event.accept()
 
 
 if __name__ == "__main__":
@@ -2,23 +2,48 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QMainWindow
 from PyQt5.uic import loadUi
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal
+from PyQt5.QtGui import QImage
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 import time
 import cv2
 import os
 import sys
-import numpy as np
+from CrabDetector import CrabDetector
+from MotionGate import GatedDetector
+from CrabTracker import CrabTracker
+from DetectionStore import DetectionStore, DetectionRecorder
+from DetectionOverlay import overlay_pixmap
+from FrameImage import DisplayBuffers
+from PrefetchReader import PrefetchReader
 
 class objectW(QThread):
+    # frame and its detections; pixmaps and widgets are GUI-thread only, so
+    # the overlay is drawn in show_frame
+    frame_ready = pyqtSignal(QImage, object)
+
     def __init__(self, file,detectLabel):
         super().__init__()
         self.active = True
         self.file = file
         self.detectLabel = detectLabel
+        # static scenes (hovering) reuse the last result
+        self.detector = GatedDetector(CrabDetector())
+        self.store = DetectionStore()
+        # frames the GUI hasn't drawn yet, BGRX so the pixmap needs no conversion
+        self.display = DisplayBuffers()
+        # this object lives in the GUI thread, so the slot runs there
+        self.frame_ready.connect(self.show_frame)
+        self.tracker = CrabTracker(self.detector)
+        # detection goes on while the label is hidden, only drawing stops
+        self.visible = True
     
     def run(self):
-        cap = cv2.VideoCapture(self.file)
+        # display lives in the GUI thread: queued behind show_frame, so it runs
+        # once the frame was drawn
+        self.frame_ready.connect(self.display.displayed)
+        # files and image folders are decoded ahead on another thread
+        cap = cv2.VideoCapture(self.file) if isinstance(self.file, int) else PrefetchReader(self.file)
         if not cap.isOpened():
             return
         
@@ -31,56 +56,69 @@ class objectW(QThread):
             else:
                 delay = 0.03
         #     time.sleep(delay)
+        next_time = time.time()
+
+        # a file detected before is replayed from the detection store
+        cached = recorder = None
+        if isinstance(self.file, str) and os.path.isfile(self.file):
+            cached = self.store.load(self.file, self.detector.params)
+            if cached is None:
+                # batch_detect's pass, every frame detected without the gate
+                cached = self.store.load(self.file, self.detector.detector.params)
+            recorder = DetectionRecorder() if cached is None else None
+        frame_index = 0
+        finished = False
         
         while self.active:
             ret, frame = cap.read()
             if not ret:
+                finished = True
                 break  
 
-            result = self.detect(frame)
+            if cached is not None and frame_index < len(cached):
+                result = cached.result(frame_index)
+            else:
+                result = self.detect(frame)
+                if recorder is not None:
+                    recorder.add(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, result)
+            # ids and the unique total
+            result = self.tracker.update(frame, result)
+            frame_index += 1
 
-            rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb.shape
-            bytes_per_line = ch * w
+            if not self.visible:
+                next_time = self.pace(next_time, delay)
+                continue
 
-            qimage = QtGui.QImage(rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
-            self.detectLabel.setPixmap(QtGui.QPixmap.fromImage(qimage))
+            # skipped while the GUI is behind
+            qimage = self.display.image(frame)
+            if qimage is not None:
+                self.frame_ready.emit(qimage, result)
 
-            if delay > 0:
-                time.sleep(delay)
+            next_time = self.pace(next_time, delay)
 
         cap.release()
+        if self.detector.frames:
+            print(self.detector.summary())
+        if self.tracker.frames:
+            print(self.tracker.summary())
+        if recorder is not None and finished:
+            self.store.save(self.file, self.detector.params, recorder)
 
-    def detect(self,frame):
-        result = frame.copy()
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-        lower_green = np.array([25, 30, 20])
-        upper_green = np.array([95, 255, 255])
-        mask = cv2.inRange(hsv, lower_green, upper_green)
-
-        kernel_small = np.ones((5,5), np.uint8)
-        kernel_large = np.ones((7,7), np.uint8)
-        mask_clean = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel_large, iterations=2)
-        mask_clean = cv2.morphologyEx(mask_clean, cv2.MORPH_CLOSE, kernel_small, iterations=2)
+    def show_frame(self, qimage, result):
+        """GUI thread: detections drawn at label size instead of into the frame"""
+        self.detectLabel.setPixmap(overlay_pixmap(qimage, result, self.detectLabel.size()))
 
-        contours, _ = cv2.findContours(mask_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        min_area = 500
-        max_area = 50000
-        valid_crabs = [c for c in contours if min_area < cv2.contourArea(c) < max_area]
+    def pace(self, next_time, delay):
+        """Sleep for the rest of the frame period, detection time included"""
+        if delay > 0:
+            next_time = max(next_time + delay, time.time())
+            time.sleep(max(next_time - time.time(), 0))
+        return next_time
 
-        for i, c in enumerate(valid_crabs, 1):
-            x, y, w, h = cv2.boundingRect(c)
-            cv2.rectangle(result, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(result, f'Crab {i}', (x, y-10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            cv2.drawContours(result, [c], -1, (255, 0, 0), 2)
-
-        cv2.putText(result, f'Count: {len(valid_crabs)}', (20, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-        return result
+    def detect(self,frame):
+        return self.detector.detect(frame)
     
     def stop(self):
-        self.thread_active = False
+        self.active = False
         self.quit()
         self.wait()
\ No newline at end of file
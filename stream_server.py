@@ -0,0 +1,262 @@
+# stream_server.py - Replays a video file as a network camera on localhost
+#
+#   python stream_server.py video.mp4 --proto udp --port 5600
+#   python stream_server.py video.mp4 --proto tcp --port 5600 --loss 0.05
+#
+# then open "mjpeg+udp://0.0.0.0:5600" (or "mjpeg+tcp://127.0.0.1:5600") as a
+# camera source. Frames are JPEG encoded and sent with the framing that
+# NetworkSource expects. --loss and --jitter fake a bad tether for testing.
+#
+# FramePublisher serves live frames the same way, so the headless runtime can
+# feed a GUI running somewhere else (open "mjpeg+tcp://<host>:<port>").
+import argparse
+import random
+import socket
+import threading
+import time
+
+import cv2
+
+from FramePool import frame_array, release_frame, retain_frame
+from NetworkSource import HEADER, MAGIC, MAX_CHUNK
+
+
+def frame_packets(seq, payload, timestamp=None):
+    """Split one JPEG into framed packets"""
+    if timestamp is None:
+        timestamp = time.time()
+    chunks = [payload[i:i + MAX_CHUNK] for i in range(0, len(payload), MAX_CHUNK)] or [b""]
+    for index, chunk in enumerate(chunks):
+        yield HEADER.pack(MAGIC, seq, timestamp, index, len(chunks), len(chunk)) + chunk
+
+
+class StreamServer:
+    def __init__(self, video, proto="udp", host="127.0.0.1", port=5600,
+                 quality=80, loop=True, loss=0.0, jitter_ms=0, fps=None):
+        self.video = video
+        self.proto = proto
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.loop = loop
+        self.loss = loss
+        self.jitter = jitter_ms / 1000.0
+        self.fps = fps
+        self.active = True
+        self.seq = 0
+        self.frames_sent = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.active = False
+        if self.thread is not None:
+            self.thread.join(timeout=3)
+
+    def run(self):
+        if self.proto == "tcp":
+            self._serve_tcp()
+        else:
+            self._serve_udp()
+
+    def frames(self):
+        """Yield JPEG encoded frames from the video, paced to its frame rate"""
+        while self.active:
+            cap = cv2.VideoCapture(self.video)
+            if not cap.isOpened():
+                print(f"Error: Cannot open video {self.video}")
+                return
+            fps = self.fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+            delay = 1.0 / fps
+            next_time = time.time()
+
+            while self.active:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    continue
+
+                next_time += delay
+                sleep = next_time - time.time()
+                if sleep > 0:
+                    time.sleep(sleep)
+                else:
+                    next_time = time.time()
+                yield jpeg.tobytes()
+
+            cap.release()
+            if not self.loop:
+                return
+
+    def _packets(self, payload):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return frame_packets(self.seq, payload)
+
+    def _serve_udp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        print(f"Streaming {self.video} to udp://{self.host}:{self.port}")
+        try:
+            for payload in self.frames():
+                if self.loss and random.random() < self.loss:
+                    self.seq += 1  # pretend the frame was lost on the wire
+                    continue
+                if self.jitter:
+                    time.sleep(random.uniform(0, self.jitter))
+                for packet in self._packets(payload):
+                    sock.sendto(packet, (self.host, self.port))
+                self.frames_sent += 1
+        finally:
+            sock.close()
+
+    def _serve_tcp(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(1)
+        server.settimeout(0.5)
+        print(f"Serving {self.video} on tcp://{self.host}:{self.port}")
+
+        try:
+            while self.active:
+                try:
+                    client, addr = server.accept()
+                except socket.timeout:
+                    continue
+                print(f"Client connected: {addr[0]}:{addr[1]}")
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    for payload in self.frames():
+                        if self.loss and random.random() < self.loss:
+                            self.seq += 1
+                            continue
+                        if self.jitter:
+                            time.sleep(random.uniform(0, self.jitter))
+                        client.sendall(b"".join(self._packets(payload)))
+                        self.frames_sent += 1
+                except OSError:
+                    print("Client disconnected")
+                finally:
+                    client.close()
+        finally:
+            server.close()
+
+
+class FramePublisher:
+    """Serves live frames over TCP to any number of viewers, newest frame wins"""
+
+    def __init__(self, host="0.0.0.0", port=5600, quality=80, max_fps=15):
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.active = True
+        self.clients = []
+        self.seq = 0
+        self.frames_sent = 0
+        self.pending = None      # (frame, timestamp) waiting to be encoded
+        self.last_sent = 0.0
+        self.cond = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        for target in (self._accept, self._send):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self.active = False
+        with self.cond:
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=3)
+        for client in self.clients:
+            client.close()
+        self.clients = []
+        release_frame(self.pending[0] if self.pending else None)
+        self.pending = None
+
+    def publish(self, frame, timestamp=None):
+        """Called from the capture thread; never blocks on the network"""
+        if not self.clients or time.time() - self.last_sent < self.min_interval:
+            return
+        with self.cond:
+            if self.pending is not None:
+                release_frame(self.pending[0])  # viewers are behind, skip the older frame
+            self.pending = (retain_frame(frame), timestamp or time.time())
+            self.cond.notify()
+
+    def _accept(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(4)
+        server.settimeout(0.5)
+        print(f"Publishing frames on tcp://{self.host}:{self.port}")
+        try:
+            while self.active:
+                try:
+                    client, addr = server.accept()
+                except socket.timeout:
+                    continue
+                print(f"Viewer connected: {addr[0]}:{addr[1]}")
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.clients = self.clients + [client]
+        finally:
+            server.close()
+
+    def _send(self):
+        while self.active:
+            with self.cond:
+                while self.active and self.pending is None:
+                    self.cond.wait(0.5)
+                if not self.active:
+                    return
+                (frame, timestamp), self.pending = self.pending, None
+            self.last_sent = time.time()
+            try:
+                ok, jpeg = cv2.imencode(".jpg", frame_array(frame), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            finally:
+                release_frame(frame)
+            if not ok:
+                continue
+
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            data = b"".join(frame_packets(self.seq, jpeg.tobytes(), timestamp))
+            for client in self.clients:
+                try:
+                    client.sendall(data)
+                except OSError:
+                    print("Viewer disconnected")
+                    client.close()
+                    self.clients = [c for c in self.clients if c is not client]
+            self.frames_sent += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a video file as a network camera")
+    parser.add_argument("video")
+    parser.add_argument("--proto", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of frames to drop")
+    parser.add_argument("--jitter", type=int, default=0, help="max random send delay in ms")
+    parser.add_argument("--once", action="store_true", help="don't loop the video")
+    args = parser.parse_args()
+
+    server = StreamServer(args.video, args.proto, args.host, args.port, args.quality,
+                          loop=not args.once, loss=args.loss, jitter_ms=args.jitter, fps=args.fps)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
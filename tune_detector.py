@@ -0,0 +1,207 @@
+# tune_detector.py - Sweep CrabDetector parameters against labeled frames
+#
+#   python tune_detector.py frames/ --grid grid.json --out sweep.csv
+#
+# frames/ holds the images and a labels.json with the crabs in each one:
+#   {"frame_001.jpg": [[x, y, w, h], ...], "frame_002.jpg": 3, ...}
+# A number instead of boxes only counts towards the count error, which can't
+# tell a frame with one missed crab and one false positive from a perfect one:
+# precision/recall/F1 come from the frames with boxes only, and with no boxes
+# at all the combinations are ranked by count error instead.
+# grid.json maps parameter names (see CrabDetector.DEFAULT_PARAMS) to the
+# values to try; parameters that aren't listed keep their default:
+#   {"open_kernel": [5, 7, 9], "min_area": [300, 500, 800],
+#    "lower_green": [[25, 30, 20], [30, 40, 30]]}
+#
+# Every combination runs on its own worker process (all cores by default),
+# the frames are loaded once per worker. For each combination we report
+# precision/recall (a detection matches a labeled box at IoU >= --iou),
+# mean absolute count error and the detector's cost per frame, and mark the
+# combinations on the speed/accuracy Pareto front (accuracy is F1, or count
+# error without boxes).
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+
+from CrabDetector import CrabDetector, DEFAULT_PARAMS
+
+DEFAULT_GRID = {
+    "open_kernel": [5, 7, 9],
+    "open_iterations": [1, 2],
+    "close_kernel": [3, 5],
+    "min_area": [300, 500, 800],
+}
+
+# filled in each worker process by load_frames()
+_frames = []
+_iou = 0.5
+
+
+def load_labels(folder):
+    with open(os.path.join(folder, "labels.json")) as f:
+        labels = json.load(f)
+    items = []
+    for name, label in sorted(labels.items()):
+        if isinstance(label, (int, float)):
+            items.append((name, None, int(label)))
+        else:
+            items.append((name, [tuple(b) for b in label], len(label)))
+    return items
+
+
+def load_frames(folder, items, iou):
+    global _frames, _iou
+    cv2.setNumThreads(1)  # one combination per core, no nested threading
+    _iou = iou
+    _frames = []
+    for name, boxes, count in items:
+        image = cv2.imread(os.path.join(folder, name))
+        if image is None:
+            print(f"Warning: cannot read {name}, skipped")
+            continue
+        _frames.append((image, boxes, count))
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def match(detected, labeled, threshold):
+    """Greedy one-to-one matching by IoU, returns the number of true positives"""
+    pairs = sorted(((iou(d, l), i, j) for i, d in enumerate(detected) for j, l in enumerate(labeled)),
+                   reverse=True)
+    used_d, used_l = set(), set()
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i not in used_d and j not in used_l:
+            used_d.add(i)
+            used_l.add(j)
+    return len(used_d)
+
+
+def evaluate(params):
+    """Run one parameter combination over every frame (in a worker process)"""
+    detector = CrabDetector(params)
+    tp = fp = fn = 0
+    count_error = 0
+    busy = 0.0
+    for image, boxes, count in _frames:
+        start = time.perf_counter()
+        crabs = detector.find(image)
+        busy += time.perf_counter() - start
+
+        count_error += abs(len(crabs) - count)
+        if boxes is not None:
+            matched = match([cv2.boundingRect(c) for c in crabs], boxes, _iou)
+            tp += matched
+            fp += len(crabs) - matched
+            fn += len(boxes) - matched
+
+    n = max(len(_frames), 1)
+    if not any(boxes is not None for _, boxes, _ in _frames):
+        precision = recall = f1 = None
+    else:
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "params": params,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "count_error": count_error / n,
+        "ms_per_frame": 1000 * busy / n,
+    }
+
+
+def combinations(grid):
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        yield params
+
+
+def accuracy(result):
+    """F1, or minus the count error when no frame has boxes (higher is better)"""
+    return result["f1"] if result["f1"] is not None else -result["count_error"]
+
+
+def pareto_front(results):
+    """Results no other result beats on both accuracy and cost"""
+    front = []
+    for r in sorted(results, key=lambda r: (r["ms_per_frame"], -accuracy(r))):
+        if not front or accuracy(r) > accuracy(front[-1]):
+            front.append(r)
+    return front
+
+
+def scores(r):
+    if r["f1"] is None:
+        return f"err={r['count_error']:.2f}"
+    return f"P={r['precision']:.3f} R={r['recall']:.3f} F1={r['f1']:.3f} err={r['count_error']:.2f}"
+
+
+def describe(params, grid):
+    return " ".join(f"{name}={params[name]}" for name in sorted(grid))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the crab detector on labeled frames")
+    parser.add_argument("folder", help="folder with the frames and labels.json")
+    parser.add_argument("--grid", help="JSON file with the values to try per parameter")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed for a detection to count")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="sweep.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    items = load_labels(args.folder)
+    combos = list(combinations(grid))
+    print(f"{len(combos)} combinations x {len(items)} frames on {args.workers} workers")
+    if not any(boxes is not None for _, boxes, _ in items):
+        print("labels.json has counts only: ranking by count error, no precision/recall")
+
+    start = time.time()
+    results = []
+    with mp.Pool(args.workers, initializer=load_frames, initargs=(args.folder, items, args.iou)) as pool:
+        for i, result in enumerate(pool.imap_unordered(evaluate, combos), 1):
+            results.append(result)
+            print(f"\r{i}/{len(combos)}", end="", flush=True)
+    print(f"\rdone in {time.time() - start:.1f}s")
+
+    front = pareto_front(results)
+    on_front = {id(r) for r in front}
+    with open(args.out, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(sorted(grid) + ["precision", "recall", "f1", "count_error", "ms_per_frame", "pareto"])
+        for r in sorted(results, key=lambda r: -accuracy(r)):
+            writer.writerow([json.dumps(r["params"][name]) for name in sorted(grid)] +
+                            ["" if r[key] is None else f"{r[key]:.4f}" for key in ("precision", "recall", "f1")] +
+                            [f"{r['count_error']:.3f}", f"{r['ms_per_frame']:.2f}", int(id(r) in on_front)])
+    print(f"Results: {args.out}")
+
+    print("\nMost accurate:")
+    for r in sorted(results, key=lambda r: (-accuracy(r), r["ms_per_frame"]))[:args.top]:
+        print(f"  {scores(r)} {r['ms_per_frame']:6.2f} ms  {describe(r['params'], grid)}")
+    print("\nSpeed/accuracy Pareto front:")
+    for r in front:
+        print(f"  {scores(r)} {r['ms_per_frame']:6.2f} ms  {describe(r['params'], grid)}")